@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# 将 scripts 目录加入系统路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from data_cleaning import parse_dates, convert_date
+
+
+def make_dates(n_rows, n_unique=2000, seed=42):
+    """
+    生成混合格式的日期列（4/29/17 与 2017/4/29 两种写法）
+    """
+    rng = np.random.default_rng(seed)
+    start = date(2014, 1, 1)
+    pool = []
+    for i in range(n_unique):
+        d = start + timedelta(days=i)
+        if i % 2:
+            pool.append(f"{d.month}/{d.day}/{d.year % 100:02d}")
+        else:
+            pool.append(f"{d.year}/{d.month}/{d.day}")
+    pool = np.array(pool, dtype=object)
+    return pd.Series(pool[rng.integers(0, n_unique, n_rows)])
+
+
+def time_it(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(sizes, baseline_limit):
+    print(f"{'rows':>12} {'parse_dates(s)':>15} {'ns/row':>8} {'apply(s)':>10}")
+    for n in sizes:
+        dates = make_dates(n)
+        vectorized = time_it(parse_dates, dates)
+        # 逐行解析过慢，只在较小规模上对照
+        if n <= baseline_limit:
+            per_row = f"{time_it(dates.apply, convert_date):10.3f}"
+        else:
+            per_row = f"{'-':>10}"
+        print(f"{n:>12,} {vectorized:>15.3f} {vectorized / n * 1e9:>8.1f} {per_row}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="日期解析性能测试")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--baseline-limit', type=int, default=100_000,
+                        help="逐行convert_date对照的最大行数")
+    args = parser.parse_args()
+    run(args.sizes, args.baseline_limit)
@@ -0,0 +1,71 @@
+import os
+import sys
+import argparse
+import subprocess
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+
+HEAVY = ['sklearn', 'joblib', 'matplotlib', 'seaborn']
+# 各入口模块的导入预算：(耗时上限ms, 不允许在导入时加载的包)
+# 耗时包含解释器启动时导入的encodings/site等模块（约10ms），与机器相关，可用 --scale 整体放宽；
+# 不允许加载的包与机器无关，任何机器上都应满足
+BUDGETS = {
+    'cli': (80, ['numpy', 'pandas'] + HEAVY),
+    'configuration': (40, ['numpy', 'pandas'] + HEAVY),
+    'data_analysis': (700, HEAVY),
+    'analysis': (1000, HEAVY),
+    'main': (80, ['numpy', 'pandas'] + HEAVY),
+    'stages': (80, ['numpy', 'pandas'] + HEAVY),
+    'result_cache': (700, HEAVY),
+    'service': (250, ['numpy', 'pandas'] + HEAVY),  # asyncio本身约50ms
+}
+
+
+def import_time(module):
+    """
+    在新的解释器中用 -X importtime 导入module，返回 (总耗时ms, 加载的顶层包集合)
+    总耗时为输出中各模块自身耗时之和
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPTS_DIR, env=dict(os.environ, PYTHONPATH=SCRIPTS_DIR),
+        capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        packages.add(name.strip().split('.')[0])
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入口模块的导入耗时回归检查（python -X importtime）")
+    parser.add_argument('--modules', nargs='+', default=list(BUDGETS), choices=list(BUDGETS))
+    parser.add_argument('--repeat', type=int, default=5, help="每个模块导入的次数，取最小值")
+    parser.add_argument('--scale', type=float, default=1.0, help="耗时预算的放大倍数（较慢的机器上使用）")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<16} {'import(ms)':>11} {'budget(ms)':>11}  heavy packages")
+    for module in args.modules:
+        budget, forbidden = BUDGETS[module]
+        runs = [import_time(module) for _ in range(args.repeat)]
+        elapsed = min(ms for ms, _ in runs)
+        loaded = sorted(set(forbidden) & runs[0][1])
+        print(f"{module:<16} {elapsed:>11.1f} {budget * args.scale:>11.0f}  {', '.join(loaded) or '-'}")
+        if elapsed > budget * args.scale:
+            failures.append(f"{module}: 导入耗时 {elapsed:.1f}ms 超出预算 {budget * args.scale:.0f}ms")
+        if loaded:
+            failures.append(f"{module}: 导入时加载了 {', '.join(loaded)}")
+
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 将 scripts 目录加入系统路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from configuration import PROCESSED_DATA_PATH, VOCABULARY_PATH
+from data_analysis import load_data, ANALYSIS_COLUMNS
+from model import train_and_evaluate
+from predict import PricePredictor
+from vocabulary import load_vocabularies
+
+
+def run(batch_sizes, n_single):
+    df = load_data(PROCESSED_DATA_PATH, ANALYSIS_COLUMNS)
+    with tempfile.TemporaryDirectory() as model_dir:
+        train_and_evaluate(df, load_vocabularies(VOCABULARY_PATH), model_dir=model_dir)
+
+        start = time.perf_counter()
+        predictor = PricePredictor(model_dir)
+        print(f"加载模型并预计算查找表: {time.perf_counter() - start:.3f}s（{len(predictor.table)} 个组合）")
+
+        # 1. 批量预测吞吐
+        rng = np.random.default_rng(42)
+        print(f"{'batch':>10} {'seconds':>10} {'rows/s':>12}")
+        for n in batch_sizes:
+            records = df.iloc[rng.integers(0, len(df), n)][['City', 'Type', 'Date']]
+            start = time.perf_counter()
+            predictor.predict_batch(records)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>10,} {elapsed:>10.3f} {n / elapsed:>12,.0f}")
+
+        # 2. 单条请求延迟：模型直接预测 vs 查找表
+        rows = df.iloc[rng.integers(0, len(df), n_single)]
+        requests = list(zip(rows['City'], rows['Type'], rows['Date']))
+        start = time.perf_counter()
+        for city, type_, date in requests[:min(n_single, 200)]:
+            predictor.predict_batch([{'City': city, 'Type': type_, 'Date': date}])
+        model_latency = (time.perf_counter() - start) / min(n_single, 200)
+
+        months = [pd.Timestamp(date).month for _, _, date in requests]
+        start = time.perf_counter()
+        for (city, type_, _), month in zip(requests, months):
+            predictor.predict_one(city, type_, month=month)
+        lookup_latency = (time.perf_counter() - start) / n_single
+
+        print(f"单条延迟: 模型 {model_latency * 1e3:.3f} ms, 查找表 {lookup_latency * 1e6:.2f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="模型预测吞吐与延迟测试")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--single', type=int, default=100_000, help="单条请求次数")
+    args = parser.parse_args()
+    run(args.batch_sizes, args.single)
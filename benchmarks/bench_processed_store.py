@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 将 scripts 目录加入系统路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from column_store import write_store, store_path_for
+from data_analysis import load_data, ANALYSIS_COLUMNS
+
+
+def make_processed(n_rows, seed=42):
+    """
+    生成与processed_data.csv同结构的数据
+    """
+    rng = np.random.default_rng(seed)
+    cities = np.array([f"CITY {i}" for i in range(13)], dtype=object)
+    packages = np.array(['24 inch bins', '36 inch bins', '1/2 bushel cartons', 'each'], dtype=object)
+    low = rng.uniform(1, 300, n_rows).round(2)
+    high = low + rng.uniform(0, 30, n_rows).round(2)
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2014-09-01') + pd.to_timedelta(rng.integers(0, 1200, n_rows), unit='D'),
+        'City': cities[rng.integers(0, len(cities), n_rows)],
+        'Type': np.nan,
+        'Low Price': low,
+        'High Price': high,
+        'Package': packages[rng.integers(0, len(packages), n_rows)],
+        'Grade': np.zeros(n_rows, dtype=np.int8),
+        'Variety': rng.integers(0, 10, n_rows).astype(np.int8),
+        'Color': rng.integers(0, 3, n_rows).astype(np.int8),
+        'Origin': rng.integers(0, 11, n_rows).astype(np.int8),
+        'Package_L': rng.uniform(10, 1300, n_rows),
+        'Avg Price': (low + high) / 2,
+    })
+
+
+def time_it(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(sizes):
+    print(f"{'rows':>12} {'csv(s)':>10} {'store(s)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            csv_path = os.path.join(tmp, f"processed_{n}.csv")
+            df = make_processed(n)
+            df.to_csv(csv_path, index=False)
+            csv_time = time_it(pd.read_csv, csv_path)
+            write_store(df, store_path_for(csv_path))
+            store_time = time_it(load_data, csv_path, ANALYSIS_COLUMNS)
+            print(f"{n:>12,} {csv_time:>10.3f} {store_time:>10.3f} {csv_time / store_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="处理后数据读取性能测试：CSV vs 列式存储")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    args = parser.parse_args()
+    run(args.sizes)
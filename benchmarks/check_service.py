@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from generate_data import generate_raw
+from service import ReportService
+
+
+async def request(address, path, etag=None):
+    """
+    发送一个GET请求，返回 (状态码, 响应头, 响应体, 耗时秒)
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(*address)
+    lines = [f"GET {path} HTTP/1.1", f"Host: {address[0]}"] + ([f"If-None-Match: {etag}"] if etag else [])
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode('latin-1').split("\r\n")
+    headers = {key.lower(): value.strip() for key, _, value in (line.partition(":") for line in header_lines)}
+    return int(status_line.split()[1]), headers, body, time.perf_counter() - start
+
+
+async def wait_for_release(service, previous=None, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if service.current and service.current["release"] != previous:
+            return service.current["release"]
+        await asyncio.sleep(0.1)
+    raise TimeoutError("等待新版本发布超时")
+
+
+async def check(work_dir, rows):
+    """
+    在临时目录中运行服务：放入第一个文件等待发布，检查ETag和304；
+    再放入第二个文件，在重算期间持续请求报告，确认端点一直以旧版本应答，最后切换到新版本
+    """
+    raw_dir = os.path.join(work_dir, 'raw')
+    os.makedirs(raw_dir)
+    service = ReportService(raw_dir, os.path.join(work_dir, 'service'), workers=1, poll_seconds=0.2)
+    server = asyncio.create_task(service.serve(port=0))
+    while service.address is None:
+        await asyncio.sleep(0.05)
+    failures = []
+
+    code, _, _, _ = await request(service.address, '/report')
+    if code != 503:
+        failures.append(f"尚未发布版本时 /report 应返回503，实际为 {code}")
+
+    generate_raw(os.path.join(raw_dir, 'part1.csv'), rows, seed=1)
+    first = await wait_for_release(service)
+    code, headers, body, _ = await request(service.address, '/report')
+    etag = headers.get('etag')
+    if code != 200 or not etag or not body.startswith(b'{'):
+        failures.append(f"/report 应返回200和ETag，实际为 {code} {headers}")
+    code, _, _, _ = await request(service.address, '/report', etag)
+    if code != 304:
+        failures.append(f"If-None-Match 与ETag相同时应返回304，实际为 {code}")
+    for path in ('/cube', '/figures/price_distribution.png', '/status'):
+        code, _, _, _ = await request(service.address, path)
+        if code != 200:
+            failures.append(f"{path} 应返回200，实际为 {code}")
+
+    # 重算期间持续请求
+    generate_raw(os.path.join(raw_dir, 'part2.csv'), rows, seed=2)
+    latencies, codes = [], set()
+    while service.current["release"] == first:
+        code, headers, _, elapsed = await request(service.address, '/report', etag)
+        latencies.append(elapsed)
+        codes.add(code)
+        await asyncio.sleep(0.02)
+    second = service.current["release"]
+    code, headers, _, _ = await request(service.address, '/report', etag)
+    if codes - {304}:
+        failures.append(f"重算期间应一直返回旧版本（304），实际出现 {sorted(codes)}")
+    if code != 200 or headers.get('etag') == etag:
+        failures.append(f"新版本发布后 /report 应返回200和新的ETag，实际为 {code}")
+
+    server.cancel()
+    try:
+        await server
+    except asyncio.CancelledError:
+        pass
+
+    latencies.sort()
+    print(f"版本: {first} -> {second}（第二次构建 {service.current['build_seconds']:.1f}s）")
+    if latencies:
+        print(f"重算期间请求 {len(latencies)} 次，延迟中位数 {latencies[len(latencies) // 2] * 1000:.1f}ms，"
+              f"最大 {latencies[-1] * 1000:.1f}ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在临时目录中检查服务模式的发布、ETag和重算期间的可用性")
+    parser.add_argument('--rows', type=int, default=20_000, help="每个合成原始文件的行数")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='pumpkin_service_')
+    try:
+        failures = asyncio.run(check(work_dir, args.rows))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for failure in failures:
+        print(failure)
+    print("检查未通过" if failures else "检查通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
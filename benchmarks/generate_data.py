@@ -0,0 +1,137 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# 与 data/US-pumpkins.csv 完全一致的26列表头（最后两列无列名）
+HEADER = [
+    'City Name', 'Type', 'Package', 'Variety', 'Sub Variety', 'Grade', 'Date',
+    'Low Price', 'High Price', 'Mostly Low', 'Mostly High', 'Origin', 'Origin District',
+    'Item Size', 'Color', 'Environment', 'Unit of Sale', 'Quality', 'Condition',
+    'Appearance', 'Storage', 'Crop', 'Repack', 'Trans Mode', '', ''
+]
+
+# 取值及权重参考原始数据中的分布
+CITIES = {
+    'BOSTON': 352, 'COLUMBIA': 263, 'CHICAGO': 248, 'SAN FRANCISCO': 166, 'BALTIMORE': 153,
+    'DALLAS': 137, 'NEW YORK': 112, 'ST. LOUIS': 95, 'LOS ANGELES': 75, 'ATLANTA': 54,
+    'PHILADELPHIA': 57, 'DETROIT': 24, 'MIAMI': 21,
+}
+# 包装 -> (权重, 典型价格)
+PACKAGES = {
+    '36 inch bins': (663, 160), '24 inch bins': (551, 200), '1/2 bushel cartons': (234, 18),
+    '1 1/9 bushel cartons': (117, 20), '35 lb cartons': (42, 16), 'bushel cartons': (37, 17),
+    '40 lb cartons': (19, 17), '1 1/9 bushel crates': (17, 20), 'each': (17, 4),
+    'bins': (13, 150), '50 lb sacks': (11, 20), '50 lb cartons': (10, 22),
+    '22 lb cartons': (10, 14), 'bushel baskets': (10, 16), '20 lb cartons': (6, 12),
+}
+VARIETIES = {
+    'HOWDEN TYPE': 542, 'PIE TYPE': 468, 'MINIATURE': 310, 'FAIRYTALE': 132, 'CINDERELLA': 81,
+    'BIG MACK TYPE': 74, 'MIXED HEIRLOOM VARIETIES': 36, 'HOWDEN WHITE TYPE': 28,
+    'KNUCKLE HEAD': 25, 'BLUE TYPE': 21, '': 5,
+}
+ORIGINS = {
+    'PENNSYLVANIA': 250, 'MICHIGAN': 237, 'CALIFORNIA': 218, 'MASSACHUSETTS': 197,
+    'ILLINOIS': 156, 'TEXAS': 115, 'OHIO': 85, 'CANADA': 85, 'MARYLAND': 74,
+    'NORTH CAROLINA': 59, 'NEW YORK': 55, 'VIRGINIA': 40, 'NEW JERSEY': 32, 'DELAWARE': 30,
+    'MISSOURI': 28, 'TENNESSEE': 20, 'WASHINGTON': 18, 'COLORADO': 15, 'GEORGIA': 12,
+    'ALABAMA': 10, 'INDIANA': 8, 'VERMONT': 6, 'FLORIDA': 4, 'MEXICO': 2, '': 3,
+}
+COLORS = {'ORANGE': 916, '': 616, 'WHITE': 213, 'STRIPED': 12}
+ITEM_SIZES = {'sml': 363, 'med': 337, 'lge': 295, '': 279, 'xlge': 205, 'med-lge': 133, 'jbo': 80, 'exjbo': 65}
+TYPES = {'': 1712, 'Organic': 45}
+SUB_VARIETIES = {'': 1461, 'FLAT TYPE': 212, 'ROUND TYPE': 84}
+UNITS = {'': 1595, 'PER BIN': 98, 'EACH': 29, 'PER LB': 24, 'SHELLACKED': 11}
+
+
+def _choice(rng, weights, size):
+    values = np.array(list(weights), dtype=object)
+    p = np.array(list(weights.values()), dtype=float)
+    return rng.choice(values, size=size, p=p / p.sum())
+
+
+def _date_pool(start_year, end_year):
+    """
+    交易日（每周六）及其两种写法：4/29/17 与 2017/4/29
+    """
+    days = pd.date_range(f"{start_year}-01-01", f"{end_year}-12-31", freq='W-SAT')
+    # 南瓜行情集中在9~11月
+    weights = np.where(days.month.isin([9, 10, 11]), 10.0, 1.0)
+    short = np.array([f"{d.month}/{d.day}/{d.year % 100:02d}" for d in days], dtype=object)
+    long = np.array([f"{d.year}/{d.month}/{d.day}" for d in days], dtype=object)
+    return short, long, weights / weights.sum()
+
+
+def generate_chunk(rng, n_rows, cities, date_pool, long_date_share=0.3, bad_row_share=0.01):
+    short_dates, long_dates, date_weights = date_pool
+    date_idx = rng.choice(len(short_dates), size=n_rows, p=date_weights)
+    dates = np.where(rng.random(n_rows) < long_date_share, long_dates[date_idx], short_dates[date_idx])
+
+    packages = _choice(rng, {k: v[0] for k, v in PACKAGES.items()}, n_rows)
+    base = pd.Series(packages).map({k: v[1] for k, v in PACKAGES.items()}).to_numpy(dtype=float)
+    low = np.round(base * rng.lognormal(0, 0.35, n_rows), 2)
+    high = np.round(low * (1 + rng.uniform(0, 0.15, n_rows)), 2)
+    mostly = rng.random(n_rows) < 0.94
+
+    df = pd.DataFrame({
+        'City Name': _choice(rng, cities, n_rows),
+        'Type': _choice(rng, TYPES, n_rows),
+        'Package': packages,
+        'Variety': _choice(rng, VARIETIES, n_rows),
+        'Sub Variety': _choice(rng, SUB_VARIETIES, n_rows),
+        'Grade': '',
+        'Date': dates,
+        'Low Price': low,
+        'High Price': high,
+        'Mostly Low': np.where(mostly, low, np.nan),
+        'Mostly High': np.where(mostly, high, np.nan),
+        'Origin': _choice(rng, ORIGINS, n_rows),
+        'Origin District': '',
+        'Item Size': _choice(rng, ITEM_SIZES, n_rows),
+        'Color': _choice(rng, COLORS, n_rows),
+        'Environment': '', 'Unit of Sale': _choice(rng, UNITS, n_rows), 'Quality': '',
+        'Condition': '', 'Appearance': '', 'Storage': '', 'Crop': '',
+        'Repack': np.where(rng.random(n_rows) < 0.003, 'E', 'N'),
+        'Trans Mode': '', 'Unnamed1': '', 'Unnamed2': '',
+    })
+
+    # 少量缺价格、日期无效的行，覆盖清洗中的过滤逻辑
+    bad = rng.random(n_rows) < bad_row_share
+    df.loc[bad & (rng.random(n_rows) < 0.5), 'Low Price'] = np.nan
+    df.loc[bad & (rng.random(n_rows) >= 0.5), 'Date'] = 'N/A'
+    return df
+
+
+def generate_raw(path, n_rows, seed=42, chunk_rows=1_000_000, n_cities=None,
+                 start_year=2010, end_year=2024):
+    """
+    生成与US-pumpkins.csv同结构的原始数据文件，按块写出，内存占用与n_rows无关
+    n_cities大于13时追加合成城市，用于测试更高的城市基数
+    """
+    rng = np.random.default_rng(seed)
+    cities = dict(CITIES)
+    for i in range(len(cities), n_cities or 0):
+        cities[f"MARKET {i:03d}"] = 50
+    date_pool = _date_pool(start_year, end_year)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        f.write(','.join(HEADER) + '\n')
+        written = 0
+        while written < n_rows:
+            n = min(chunk_rows, n_rows - written)
+            generate_chunk(rng, n, cities, date_pool).to_csv(f, header=False, index=False, float_format='%g')
+            written += n
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成US-pumpkins格式的合成原始数据")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=100_000, help="行数，支持1万到5000万")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cities', type=int, default=None, help="城市数，默认使用原始数据中的13个")
+    args = parser.parse_args()
+    generate_raw(args.path, args.rows, args.seed, n_cities=args.cities)
+    print(f"已生成 {args.rows:,} 行: {args.path}")
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import platform
+import tempfile
+import multiprocessing as mp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'scripts')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baselines.json')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results', 'latest.json')
+
+# 将 scripts 目录加入系统路径
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def stage_clean(work_dir):
+    from data_cleaning import clean_data
+    from column_store import store_path_for
+    processed = os.path.join(work_dir, 'processed_data.csv')
+    return clean_data(os.path.join(work_dir, 'raw.csv'), processed, store_dir=store_path_for(processed))
+
+
+def stage_clean_chunked(work_dir):
+    from data_cleaning import clean_data
+    clean_data(os.path.join(work_dir, 'raw.csv'), os.path.join(work_dir, 'chunked', 'processed_data.csv'),
+               chunksize=100_000)
+
+
+def stage_analysis(work_dir):
+    from analysis import perform_analysis
+    perform_analysis(os.path.join(work_dir, 'processed_data.csv'),
+                     os.path.join(work_dir, 'reports', 'analysis_report.json'))
+
+
+def stage_analysis_approximate(work_dir):
+    from analysis import perform_approximate_analysis
+    perform_approximate_analysis(os.path.join(work_dir, 'processed_data.csv'),
+                                 os.path.join(work_dir, 'analysis_report.json'))
+
+
+def stage_forecast(work_dir):
+    from data_analysis import load_data
+    from forecast import forecast_markets, forecast_dir_for
+    from market_stats import MEASURE
+    processed = os.path.join(work_dir, 'processed_data.csv')
+    df = load_data(processed, ['Date', 'City', 'Variety', MEASURE])
+    forecast_markets(df, out_dir=forecast_dir_for(processed))
+    return df
+
+
+def stage_visualize(work_dir):
+    from data_analysis import load_data, ANALYSIS_COLUMNS
+    from visualization import visualize_data
+    df = load_data(os.path.join(work_dir, 'processed_data.csv'), ANALYSIS_COLUMNS)
+    visualize_data(os.path.join(work_dir, 'processed_data.csv'), os.path.join(work_dir, 'figures'), df=df)
+    return df
+
+
+def stage_train(work_dir):
+    from data_analysis import load_data, ANALYSIS_COLUMNS
+    from model import train_and_evaluate
+    from vocabulary import load_vocabularies
+    df = load_data(os.path.join(work_dir, 'processed_data.csv'), ANALYSIS_COLUMNS)
+    train_and_evaluate(df, vocabularies=load_vocabularies(os.path.join(work_dir, 'vocabularies.json')))
+    return df
+
+
+def stage_train_hist(work_dir):
+    from data_analysis import load_data, ANALYSIS_COLUMNS
+    from model import train_and_evaluate
+    from vocabulary import load_vocabularies
+    df = load_data(os.path.join(work_dir, 'processed_data.csv'), ANALYSIS_COLUMNS)
+    train_and_evaluate(df, vocabularies=load_vocabularies(os.path.join(work_dir, 'vocabularies.json')),
+                       engine='hist')
+    return df
+
+
+def stage_train_streaming(work_dir):
+    from column_store import iter_processed
+    from model import train_streaming
+    from vocabulary import load_vocabularies
+    chunks = iter_processed(os.path.join(work_dir, 'processed_data.csv'), ['Date', 'City', 'Type', 'Avg Price'])
+    train_streaming(chunks, vocabularies=load_vocabularies(os.path.join(work_dir, 'vocabularies.json')))
+
+
+# 按依赖顺序排列：后面的阶段读取clean的输出
+# 返回DataFrame的阶段额外记录该数据表在紧凑类型和原先类型（object/float64）下的内存占用
+STAGES = {
+    'clean': stage_clean,
+    'clean_chunked': stage_clean_chunked,
+    'analysis': stage_analysis,
+    'analysis_approximate': stage_analysis_approximate,
+    'forecast': stage_forecast,
+    'visualize': stage_visualize,
+    'train': stage_train,
+    'train_hist': stage_train_hist,
+    'train_streaming': stage_train_streaming,
+}
+
+
+def _child(stage, work_dir, conn):
+    # 在独立进程中运行，峰值内存只反映该阶段
+    import warnings
+    import matplotlib
+    matplotlib.use('Agg')
+    # 屏蔽被测代码的输出和字体警告，只保留计时表格
+    warnings.filterwarnings('ignore')
+    sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    frame = None
+    try:
+        frame = STAGES[stage](work_dir)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    result = {
+        "seconds": time.perf_counter() - start,
+        "cpu_seconds": time.process_time() - cpu_start,
+        # Linux下ru_maxrss单位为KB，macOS下为字节
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024 ** 2),
+        "error": error,
+    }
+    # 峰值内存已记录，再转换为原先的类型对比数据表大小
+    if frame is not None and hasattr(frame, 'memory_usage'):
+        from schema import frame_memory_mb, legacy_frame
+        result["frame_mb"] = frame_memory_mb(frame)
+        result["legacy_frame_mb"] = frame_memory_mb(legacy_frame(frame))
+    conn.send(result)
+    conn.close()
+
+
+def run_stage(stage, work_dir):
+    ctx = mp.get_context('spawn')
+    parent, child = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child, args=(stage, work_dir, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+    return result
+
+
+def compare(results, baselines, time_tolerance, memory_tolerance, require_baselines=False):
+    """
+    与基线比较，返回超出容差的条目
+    require_baselines为True时没有基线的条目也算作失败（CI等全新环境中不会因为缺少基线而直接通过）
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if result.get("error"):
+            continue
+        if not baseline:
+            if require_baselines:
+                regressions.append(f"{key}: 没有基线")
+            continue
+        if result["seconds"] > baseline["seconds"] * (1 + time_tolerance):
+            regressions.append(f"{key}: 耗时 {result['seconds']:.2f}s > 基线 {baseline['seconds']:.2f}s")
+        if result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + memory_tolerance):
+            regressions.append(f"{key}: 峰值内存 {result['peak_rss_mb']:.0f}MB > 基线 {baseline['peak_rss_mb']:.0f}MB")
+    return regressions
+
+
+def memory_savings(results, baselines):
+    """
+    各阶段相对基线的峰值内存变化，以及数据表紧凑类型相对原先类型节省的内存
+    """
+    lines = []
+    for key, result in results.items():
+        if result.get("error"):
+            continue
+        parts = []
+        baseline = baselines.get(key)
+        if baseline:
+            saved = baseline["peak_rss_mb"] - result["peak_rss_mb"]
+            parts.append(f"峰值内存 {result['peak_rss_mb']:.0f}MB（基线 {baseline['peak_rss_mb']:.0f}MB，"
+                         f"节省 {saved:.0f}MB / {saved / baseline['peak_rss_mb']:.0%}）")
+        if "frame_mb" in result:
+            parts.append(f"数据表 {result['frame_mb']:.1f}MB（原类型 {result['legacy_frame_mb']:.1f}MB，"
+                         f"{result['legacy_frame_mb'] / max(result['frame_mb'], 1e-9):.1f}x）")
+        if parts:
+            lines.append(f"{key}: " + "，".join(parts))
+    return lines
+
+
+def main():
+    from generate_data import generate_raw
+
+    parser = argparse.ArgumentParser(description="南瓜价格分析各阶段的规模化性能测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help="原始数据行数，支持1万到5000万")
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--data-dir', default=None, help="缓存生成数据的目录，默认使用临时目录")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="允许比基线慢的比例")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help="允许比基线多用内存的比例")
+    parser.add_argument('--update-baselines', action='store_true', help="用本次结果更新基线")
+    parser.add_argument('--require-baselines', action='store_true',
+                        help="没有基线的阶段视为失败，以非零状态退出（用于CI）")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='pumpkin_bench_')
+    results = {}
+    print(f"{'stage':>14} {'rows':>12} {'seconds':>9} {'cpu(s)':>9} {'peak MB':>9} {'frame MB':>9}")
+    for size in args.sizes:
+        work_dir = os.path.join(data_dir, f"rows_{size}")
+        raw_path = os.path.join(work_dir, 'raw.csv')
+        if not os.path.exists(raw_path):
+            generate_raw(raw_path, size)
+        stages = list(args.stages)
+        # 后续阶段需要clean的输出
+        if 'clean' not in stages and not os.path.exists(os.path.join(work_dir, 'processed_data.csv')):
+            stages.insert(0, 'clean')
+        for stage in stages:
+            result = run_stage(stage, work_dir)
+            results[f"{stage}@{size}"] = result
+            status = f"  失败: {result['error']}" if result["error"] else ""
+            frame_mb = f"{result['frame_mb']:.1f}" if "frame_mb" in result else "-"
+            print(f"{stage:>14} {size:>12,} {result['seconds']:>9.2f} {result['cpu_seconds']:>9.2f} "
+                  f"{result['peak_rss_mb']:>9.0f} {frame_mb:>9}{status}")
+
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    with open(RESULTS_PATH, 'w') as f:
+        json.dump({"machine": platform.platform(), "results": results}, f, indent=4)
+
+    failed = [key for key, result in results.items() if result["error"]]
+    baselines = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baselines = json.load(f)["results"]
+
+    savings = memory_savings(results, baselines)
+    if savings:
+        print("\n内存占用:")
+        for line in savings:
+            print(f"  {line}")
+
+    if args.update_baselines:
+        baselines.update({key: result for key, result in results.items() if not result["error"]})
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({"machine": platform.platform(), "results": baselines}, f, indent=4)
+        print(f"基线已更新: {BASELINE_PATH}")
+    elif not baselines and not args.require_baselines:
+        print("没有基线，使用 --update-baselines 记录本次结果")
+
+    regressions = [] if args.update_baselines else compare(
+        results, baselines, args.time_tolerance, args.memory_tolerance, args.require_baselines)
+    for line in failed:
+        print(f"阶段失败: {line} {results[line]['error']}")
+    for line in regressions:
+        print(f"性能回退: {line}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
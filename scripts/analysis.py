@@ -1,147 +1,173 @@
-import pandas as pd
-import numpy as np
 import json
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import LabelEncoder, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from datetime import datetime
-
-
-def perform_analysis(data_path, report_path):
+from data_analysis import load_data, compute_statistics, ANALYSIS_COLUMNS
+from market_stats import analyze_markets, market_stats_dir_for, DEFAULT_WINDOW, DEFAULT_SPAN
+from forecast import forecast_markets, forecast_dir_for, DEFAULT_HORIZON, HISTORY_WEEKS
+from pipeline import PipelineContext
+from result_cache import ResultCache
+from configuration import RESULT_CACHE_DIR, MODEL_ENGINES
+from column_store import iter_processed
+from sketches import build_sketches, sketch_path_for
+from vocabulary import load_vocabularies
+import profiling
+from profiling import step, profiled
+
+
+def plot_prediction_scatter(y_test, y_pred, lims, path):
     """
-    分析南瓜价格数据并生成报告
-    包含统计摘要、价格相关性、时间趋势分析和机器学习模型
+    实际价格 vs 预测价格散点图
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    plt.scatter(y_test, y_pred, alpha=0.5)
+    plt.plot(lims, lims, 'r--')
+    plt.xlabel('实际价格')
+    plt.ylabel('预测价格')
+    plt.title('实际价格 vs 预测价格')
+    plt.savefig(path)
+    plt.close()
+
+
+# 各报告章节依赖的模块，源码变化时对应的缓存失效
+STATISTICS_CODE = ('data_analysis', 'column_store', 'schema')
+MARKET_CODE = ('market_stats', 'column_store', 'schema')
+FORECAST_CODE = ('forecast', 'market_stats', 'column_store', 'schema')
+MODEL_CODE = ('analysis', 'model', 'vocabulary', 'data_analysis', 'column_store', 'schema')
+# 测试集划分与model.train_and_evaluate相同（model.TEST_SIZE/RANDOM_STATE）；模型的超参数见model.build_regressor（其源码在MODEL_CODE中）
+MODEL_PARAMS = {"test_size": 0.2, "random_state": 42}
+
+
+def fit_price_model(df, fig_dir, vocabularies, engine='forest', max_rows=None, fitted=None, n_jobs=-1):
+    """
+    用model.train_and_evaluate训练并评估价格模型（与流水线的建模阶段相同），渲染预测散点图，
+    返回报告中的machine_learning部分；engine、max_rows和n_jobs见train_and_evaluate
+    sklearn只在训练时导入，统计、近似统计和缓存命中的运行不加载它
+    fitted(fit)返回训练好的模型，传入时可改为读取缓存的模型（见cached_report）
+    """
+    from model import train_and_evaluate
+
+    if not ({'Date', 'City', 'Type', 'Avg Price'}.issubset(df.columns) and len(df) > 100):
+        return "缺少必要列或数据量不足"
+
+    lims = (df['Avg Price'].min(), df['Avg Price'].max())
+
+    def plot(y_test, y_pred):
+        os.makedirs(fig_dir, exist_ok=True)
+        with step("plot_predictions"):
+            plot_prediction_scatter(y_test, y_pred, lims, os.path.join(fig_dir, 'price_predictions.png'))
+
+    return train_and_evaluate(df, vocabularies, engine=engine, max_rows=max_rows, fitted=fitted, on_predict=plot,
+                              n_jobs=n_jobs)
+
+
+def cached_report(data_path, cache=None, machine_learning=None, model_params=None, model_code=(),
+                  model_artifacts=()):
     """
-    # 读取处理后的数据
-    df = pd.read_csv(data_path)
+    报告中统计、市场统计、预测和机器学习各章节的计算与缓存，由perform_analysis（及main.run_analysis）调用
+    数据只在有章节需要计算时加载一次（只读取分析用到的列）；市场统计和预测表写在处理后数据旁边，
+    类别字典为同目录的vocabularies.json
+    machine_learning(df, vocabularies, fitted)返回machine_learning章节，其参数、代码指纹和产出的文件由调用方给出；
+    为None时不生成该章节
+    传入cache（result_cache.ResultCache）时各章节按输入内容哈希、参数和代码指纹缓存，
+    全部命中时不读取数据，报告的cache部分记录命中/未命中次数
+    训练好的模型以price_model条目（joblib）与该章节使用相同的参数和代码指纹缓存：章节未命中（如预测散点图被删除）
+    而模型命中时，fitted(fit)读取缓存的模型而不是重新训练
+    """
+    def load():
+        with step("load_data") as record:
+            df = load_data(data_path, ANALYSIS_COLUMNS)
+            record["rows_out"] = len(df)
+        return df
+
+    data = PipelineContext(load)
+    vocabulary_path = os.path.join(os.path.dirname(data_path), 'vocabularies.json')
+    input_hash = cache.input_hash(data_path) if cache is not None else None
+    vocabulary_hash = (cache.input_hash(vocabulary_path)
+                       if cache is not None and os.path.exists(vocabulary_path) else None)
+
+    def cached(section, compute, params=None, code=(), artifacts=()):
+        if cache is None:
+            return compute()
+        return cache.get_or_compute(section, compute, input_hash, params, code, artifacts)
+
+    model_params = dict(model_params or {}, vocabularies=vocabulary_hash)
+
+    def fitted(fit):
+        if cache is None:
+            return fit()
+        return cache.get_or_compute("price_model", fit, input_hash, model_params, model_code, kind='joblib')
+
+    # 1~3. 数据概览、价格统计、相关性和月度趋势
+    def statistics():
+        with step("statistics", rows_in=len(data.frame)):
+            return compute_statistics(data.frame)
+
+    results = cached("statistics", statistics, {"columns": ANALYSIS_COLUMNS}, STATISTICS_CODE)
+
+    # 各市场（City × Variety）的滚动均值、波动率、EWMA和季节指数
+    market_dir = market_stats_dir_for(data_path)
+
+    def market_statistics():
+        with step("market_statistics", rows_in=len(data.frame)):
+            return analyze_markets(data.frame, load_vocabularies(vocabulary_path), market_dir)
+
+    results["market_statistics"] = cached(
+        "market_statistics", market_statistics,
+        {"window": DEFAULT_WINDOW, "span": DEFAULT_SPAN, "out_dir": market_dir, "vocabularies": vocabulary_hash},
+        MARKET_CODE, artifacts=[market_dir])
+
+    # 各市场未来几周的周均价预测（季节朴素、岭回归AR、指数平滑，所有序列批量拟合）及回测误差
+    forecast_dir = forecast_dir_for(data_path)
+
+    def forecast():
+        with step("forecast", rows_in=len(data.frame)):
+            return forecast_markets(data.frame, load_vocabularies(vocabulary_path), forecast_dir)
+
+    results["forecast"] = cached(
+        "forecast", forecast,
+        {"horizon": DEFAULT_HORIZON, "history": HISTORY_WEEKS, "out_dir": forecast_dir,
+         "vocabularies": vocabulary_hash},
+        FORECAST_CODE, artifacts=[forecast_dir])
+
+    # 4. 机器学习模型
+    if machine_learning is not None:
+        try:
+            results["machine_learning"] = cached(
+                "machine_learning", lambda: machine_learning(data.frame, load_vocabularies(vocabulary_path), fitted),
+                model_params, model_code, model_artifacts)
+        except Exception as e:
+            results["machine_learning"] = f"模型训练失败: {str(e)}"
+
+    if cache is not None:
+        results["cache"] = cache.stats()
+    return results
+
 
+@profiled()
+def perform_analysis(data_path, report_path, cache=None, engine='forest', max_rows=None, n_jobs=-1):
+    """
+    分析南瓜价格数据并生成报告
+    包含统计摘要、价格相关性、时间趋势分析、市场统计、价格预测和机器学习模型（各章节的缓存见cached_report）
+    engine为机器学习章节使用的模型（见model.build_regressor），max_rows为训练集分层抽样的行数上限
+    n_jobs为随机森林使用的CPU核数，已在进程池中运行时传入1（只影响耗时，不计入缓存键）
+    """
     # 确保报告目录存在
     os.makedirs(os.path.dirname(report_path), exist_ok=True)
 
-    # 1. 数据概览
-    analysis_results = {
-        "overview": {
-            "total_records": len(df),
-            "start_date": str(df['Date'].min()) if 'Date' in df.columns else "N/A",
-            "end_date": str(df['Date'].max()) if 'Date' in df.columns else "N/A",
-            "unique_cities": df['City'].nunique() if 'City' in df.columns else "N/A",
-            "unique_types": df['Type'].nunique() if 'Type' in df.columns else "N/A"
-        },
-        "price_statistics": {
-            "low_price_mean": df['Low Price'].mean() if 'Low Price' in df.columns else "N/A",
-            "high_price_mean": df['High Price'].mean() if 'High Price' in df.columns else "N/A",
-            "avg_price_mean": df['Avg Price'].mean() if 'Avg Price' in df.columns else "N/A",
-            "avg_price_std": df['Avg Price'].std() if 'Avg Price' in df.columns else "N/A",
-            "avg_price_min": df['Avg Price'].min() if 'Avg Price' in df.columns else "N/A",
-            "avg_price_max": df['Avg Price'].max() if 'Avg Price' in df.columns else "N/A"
-        }
-    }
-
-    # 2. 价格相关性分析
-    if {'Low Price', 'High Price', 'Avg Price'}.issubset(df.columns):
-        price_corr = df[['Low Price', 'High Price', 'Avg Price']].corr().to_dict()
-        analysis_results["price_correlation"] = price_corr
-    else:
-        analysis_results["price_correlation"] = "缺少价格列"
-
-    # 3. 时间趋势分析
-    if 'Date' in df.columns and 'Avg Price' in df.columns:
-        # 转换日期列为datetime类型
-        df['Date'] = pd.to_datetime(df['Date'])
-
-        # 按月度分析价格趋势
-        monthly_avg = df.set_index('Date').resample('M')['Avg Price'].mean()
-        monthly_trend = {
-            "months": monthly_avg.index.strftime('%Y-%m').tolist(),
-            "prices": monthly_avg.values.tolist()
-        }
-        analysis_results["monthly_price_trend"] = monthly_trend
-    else:
-        analysis_results["monthly_price_trend"] = "缺少日期或价格列"
+    # 价格模型及预测散点图，散点图与报告写在同一目录下的figures中
+    fig_dir = os.path.join(os.path.dirname(report_path), 'figures')
 
-    # 4. 添加机器学习模型（线性回归）
-    if {'Date', 'City', 'Type', 'Avg Price'}.issubset(df.columns) and len(df) > 100:
-        try:
-            # 准备数据
-            df_ml = df.copy()
-
-            # 从日期中提取月份作为特征
-            df_ml['Month'] = pd.to_datetime(df_ml['Date']).dt.month
-
-            # 特征和目标变量
-            X = df_ml[['City', 'Type', 'Month']]
-            y = df_ml['Avg Price']
-
-            # 分割数据集
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y, test_size=0.2, random_state=42
-            )
-
-            # 创建预处理管道
-            preprocessor = ColumnTransformer(
-                transformers=[
-                    ('cat', OneHotEncoder(handle_unknown='ignore'), ['City', 'Type'])
-                ],
-                remainder='passthrough'
-            )
-
-            # 创建模型管道
-            model = Pipeline(steps=[
-                ('preprocessor', preprocessor),
-                (('regressor', RandomForestRegressor(n_estimators=200,
-                                    max_depth=10,
-                                    min_samples_split=5,
-                                    random_state=42)))
-            ])
-
-            # 训练模型
-            model.fit(X_train, y_train)
-
-            # 预测和评估
-            y_pred = model.predict(X_test)
-            mse = mean_squared_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
-
-            # 存储模型结果
-            analysis_results["machine_learning"] = {
-                "model_type": "线性回归",
-                "features": ["城市", "南瓜类型", "月份"],
-                "target": "平均价格",
-                "test_size": len(X_test),
-                "mean_squared_error": mse,
-                "r2_score": r2,
-                "sample_predictions": {
-                    "actual": y_test.iloc[:5].tolist(),
-                    "predicted": y_pred[:5].tolist()
-                }
-            }
-
-            # 可视化预测结果
-            plt.figure(figsize=(10, 6))
-            plt.scatter(y_test, y_pred, alpha=0.5)
-            plt.plot([y.min(), y.max()], [y.min(), y.max()], 'r--')
-            plt.xlabel('实际价格')
-            plt.ylabel('预测价格')
-            plt.title('实际价格 vs 预测价格')
-
-            # 保存可视化
-            fig_dir = os.path.join(os.path.dirname(report_path), 'figures')
-            os.makedirs(fig_dir, exist_ok=True)
-            plt.savefig(os.path.join(fig_dir, 'price_predictions.png'))
-            plt.close()
+    def machine_learning(df, vocabularies, fitted):
+        return fit_price_model(df, fig_dir, vocabularies, engine, max_rows, fitted, n_jobs)
 
-        except Exception as e:
-            analysis_results["machine_learning"] = f"模型训练失败: {str(e)}"
-    else:
-        analysis_results["machine_learning"] = "缺少必要列或数据量不足"
+    analysis_results = cached_report(
+        data_path, cache, machine_learning, dict(MODEL_PARAMS, engine=engine, max_rows=max_rows), MODEL_CODE,
+        [os.path.join(fig_dir, 'price_predictions.png')])
 
-    # 5. 保存分析报告
+    # 5. 保存分析报告（开启性能记录时附带各步骤的耗时和内存）
+    if profiling.is_enabled():
+        analysis_results["performance"] = profiling.performance_section()
     with open(report_path, 'w') as f:
         json.dump(analysis_results, f, indent=4)
 
@@ -149,20 +175,64 @@ def perform_analysis(data_path, report_path):
     return analysis_results
 
 
+@profiled()
+def perform_approximate_analysis(data_path, report_path, chunk_rows=1_000_000):
+    """
+    近似统计模式：按块一次遍历数据，构建可合并的概要（见sketches）并保存在处理后数据旁边，
+    由概要生成概览、价格统计、相关性、月度趋势和分位数，内存占用与行数无关；不训练模型
+    """
+    with step("sketch") as record:
+        sketch = build_sketches(iter_processed(data_path, ANALYSIS_COLUMNS, chunk_rows))
+        record["rows_out"] = sketch.stats.count
+    sketch.save(sketch_path_for(data_path))
+
+    analysis_results = sketch.report_sections()
+    analysis_results["machine_learning"] = "近似统计模式不训练模型，请运行完整分析"
+    if profiling.is_enabled():
+        analysis_results["performance"] = profiling.performance_section()
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(analysis_results, f, indent=4)
+
+    print(f"近似统计报告已保存至: {report_path}")
+    return analysis_results
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分析南瓜价格数据并生成报告")
+    parser.add_argument('--approximate', action='store_true',
+                        help="按块一次遍历数据，由可合并的概要生成近似统计（不训练模型）")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help="近似统计模式每块的行数")
+    parser.add_argument('--no-cache', action='store_true', help="不读取也不写入结果缓存")
+    parser.add_argument('--clear-cache', action='store_true', help="运行前清空结果缓存")
+    parser.add_argument('--engine', choices=MODEL_ENGINES, default='forest', help="机器学习章节使用的模型")
+    parser.add_argument('--max-rows', type=int, default=None, help="训练集按 City × Type 分层抽样的行数上限")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.enable_from_args(args)
+
     # 路径设置
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     processed_data_path = os.path.join(base_dir, 'data', 'processed_data.csv')
     report_path = os.path.join(base_dir, 'reports', 'analysis_report.json')
 
     # 执行分析
-    analysis_results = perform_analysis(processed_data_path, report_path)
+    if args.approximate:
+        analysis_results = perform_approximate_analysis(processed_data_path, report_path, args.chunk_rows)
+    else:
+        cache = None if args.no_cache else ResultCache(RESULT_CACHE_DIR)
+        if cache is not None and args.clear_cache:
+            cache.invalidate()
+        analysis_results = perform_analysis(processed_data_path, report_path, cache=cache, engine=args.engine,
+                                            max_rows=args.max_rows)
 
     # 打印机器学习结果摘要
     if "machine_learning" in analysis_results and isinstance(analysis_results["machine_learning"], dict):
         ml = analysis_results["machine_learning"]
         print("\n机器学习模型结果:")
-        print(f"模型类型: {ml['model_type']}")
+        print(f"模型类型: {ml['model_type']}（{ml['engine']}）")
         print(f"特征: {', '.join(ml['features'])}")
         print(f"目标: {ml['target']}")
         print(f"测试集大小: {ml['test_size']}")
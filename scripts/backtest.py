@@ -0,0 +1,145 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.metrics import mean_squared_error, r2_score
+
+from configuration import PROCESSED_DATA_PATH, BACKTEST_REPORT_PATH, VOCABULARY_PATH
+from data_analysis import load_data, ANALYSIS_COLUMNS
+from feature_processing import extract_month
+from model import FEATURES, VocabularyEncoder, build_regressor
+from vocabulary import load_vocabularies
+from utility import save_json, ensure_dir
+
+# 子进程中共享的特征矩阵、目标值和单个模型使用的CPU核数（由进程池initializer设置）
+_X = None
+_y = None
+_n_jobs = -1
+
+
+def build_matrix(df, vocabularies=None):
+    """
+    按日期排序后一次性构建整数特征矩阵，之后每个fold都是其上的连续切片（视图，不复制）
+    返回 (X, y, dates)
+    """
+    df = extract_month(df.loc[:, ['Date', 'City', 'Type', 'Avg Price']])
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values('Date', kind='stable')
+    encoder = VocabularyEncoder(vocabularies=vocabularies).fit(df[FEATURES])
+    X = np.ascontiguousarray(encoder.transform(df[FEATURES]))
+    y = df['Avg Price'].to_numpy(dtype=np.float64)
+    return X, y, df['Date'].to_numpy()
+
+
+def make_folds(dates, freq='M', window=None, min_train_periods=1):
+    """
+    按时间划分walk-forward的fold：每个有数据的周期（freq）依次作为测试集，
+    训练集为之前所有周期（expanding）或之前window个有数据的周期（rolling）
+    dates须已排序，返回的边界均为行号区间
+    """
+    # 训练集至少包含一个周期，否则fold的训练集为空
+    if min_train_periods < 1:
+        raise ValueError(f"min_train_periods 须不小于1，实际为 {min_train_periods}")
+    if window is not None and window < 1:
+        raise ValueError(f"window 须不小于1，实际为 {window}")
+    periods = pd.PeriodIndex(dates, freq=freq)
+    # 未排序时按周期取的行号区间会交错，训练集和测试集在时间上重叠
+    if not periods.is_monotonic_increasing:
+        raise ValueError("dates 须按时间升序排列")
+    unique_periods = periods.unique()
+    starts = np.searchsorted(periods.asi8, unique_periods.asi8, side='left')
+    ends = np.searchsorted(periods.asi8, unique_periods.asi8, side='right')
+
+    folds = []
+    for i in range(min_train_periods, len(unique_periods)):
+        first = 0 if window is None else max(0, i - window)
+        folds.append({
+            "fold": len(folds),
+            "test_period": str(unique_periods[i]),
+            "train": (int(starts[first]), int(starts[i])),
+            "test": (int(starts[i]), int(ends[i])),
+        })
+    return folds
+
+
+def _init_worker(X, y, n_jobs=-1):
+    global _X, _y, _n_jobs
+    _X, _y, _n_jobs = X, y, n_jobs
+
+
+def _run_fold(fold):
+    (a, b), (c, d) = fold["train"], fold["test"]
+    # fold在进程池中并行时单个模型只用单核，串行时使用全部CPU核
+    model = build_regressor(n_jobs=_n_jobs)
+    model.fit(_X[a:b], _y[a:b])
+    y_pred = model.predict(_X[c:d])
+    y_test = _y[c:d]
+    return dict(
+        fold,
+        train_size=b - a,
+        test_size=d - c,
+        mean_squared_error=float(mean_squared_error(y_test, y_pred)),
+        r2_score=float(r2_score(y_test, y_pred)) if d - c > 1 else float('nan'),
+        predictions=y_pred,
+    )
+
+
+def backtest(df, freq='M', window=None, min_train_periods=1, workers=None, vocabularies=None):
+    """
+    walk-forward回测：各fold在进程池中并行训练和评估
+    window为None时使用扩展窗口，否则使用最近window个周期的滚动窗口
+    返回每个fold以及汇总的MSE/R²
+    """
+    X, y, dates = build_matrix(df, vocabularies)
+    folds = make_folds(dates, freq, window, min_train_periods)
+    if not folds:
+        return {"folds": [], "aggregate": "数据覆盖的周期不足，无法回测"}
+
+    workers = workers or os.cpu_count()
+    if workers > 1 and len(folds) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(folds)),
+                                 initializer=_init_worker, initargs=(X, y, 1)) as pool:
+            results = list(pool.map(_run_fold, folds))
+    else:
+        _init_worker(X, y)
+        results = [_run_fold(fold) for fold in folds]
+
+    # 汇总：fold平均值，以及所有测试样本合并后的整体指标
+    y_test = np.concatenate([y[slice(*r["test"])] for r in results])
+    y_pred = np.concatenate([r.pop("predictions") for r in results])
+    for r in results:
+        r["train_start"] = str(pd.Timestamp(dates[r["train"][0]]).date())
+        r["train_end"] = str(pd.Timestamp(dates[r["train"][1] - 1]).date())
+    mse = np.array([r["mean_squared_error"] for r in results])
+    r2 = np.array([r["r2_score"] for r in results])
+    return {
+        "settings": {"freq": freq, "window": window or "expanding", "min_train_periods": min_train_periods},
+        "folds": results,
+        "aggregate": {
+            "n_folds": len(results),
+            "mean_mse": float(mse.mean()),
+            "mean_r2": float(np.nanmean(r2)) if not np.isnan(r2).all() else float('nan'),
+            "pooled_mse": float(mean_squared_error(y_test, y_pred)),
+            "pooled_r2": float(r2_score(y_test, y_pred)),
+        }
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="价格模型的walk-forward回测")
+    parser.add_argument('--freq', default='M', help="测试周期（pandas频率，如 W、M、Q）")
+    parser.add_argument('--window', type=int, default=None, help="滚动窗口的周期数，默认扩展窗口")
+    parser.add_argument('--min-train-periods', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None, help="并行进程数，默认CPU核数")
+    args = parser.parse_args()
+
+    df = load_data(PROCESSED_DATA_PATH, ANALYSIS_COLUMNS)
+    report = backtest(df, args.freq, args.window, args.min_train_periods, args.workers,
+                      load_vocabularies(VOCABULARY_PATH))
+    ensure_dir(os.path.dirname(BACKTEST_REPORT_PATH))
+    save_json(report, BACKTEST_REPORT_PATH)
+    print(f"回测完成（{len(report['folds'])} 个fold），结果已保存至: {BACKTEST_REPORT_PATH}")
+    if isinstance(report["aggregate"], dict):
+        print(f"平均MSE: {report['aggregate']['mean_mse']:.2f}, 平均R²: {report['aggregate']['mean_r2']:.4f}")
@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import argparse
+
+# 将 scripts 目录加入系统路径，避免模块找不到
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from configuration import (RAW_DATA_PATH, PROCESSED_DATA_PATH, REPORT_PATH, FIGURES_DIR, MODEL_DIR,
+                           RESULT_CACHE_DIR, MODEL_ENGINES, VOCABULARY_PATH, PROCESSED_FORECASTS_DIR,
+                           RAW_DATA_DIR, SERVICE_DIR, SERVICE_PORT)
+import profiling
+
+# 统一的命令行入口：python scripts/cli.py {clean,analyze,forecast,model,plot,all,serve}
+# 模块顶层只导入标准库和配置；pandas、sklearn、matplotlib/seaborn等在子命令运行时才导入，
+# 解析参数和 --help 不加载它们（启动耗时见 benchmarks/bench_import_time.py）
+
+
+def run_clean(args):
+    from data_cleaning import clean_data
+    from column_store import store_path_for
+    from cube import cube_path_for
+
+    os.makedirs(os.path.dirname(PROCESSED_DATA_PATH), exist_ok=True)
+    store_dir = None if args.no_store else store_path_for(PROCESSED_DATA_PATH)
+    cube_path = None if args.no_store else cube_path_for(PROCESSED_DATA_PATH)
+    clean_data(args.input or RAW_DATA_PATH, PROCESSED_DATA_PATH, chunksize=args.chunksize, store_dir=store_dir,
+               cube_path=cube_path, workers=args.workers)
+
+
+def run_analyze(args):
+    # 近似统计和缓存全部命中的运行不会导入sklearn和matplotlib
+    from analysis import perform_analysis, perform_approximate_analysis
+    from result_cache import ResultCache
+
+    if args.approximate:
+        perform_approximate_analysis(PROCESSED_DATA_PATH, REPORT_PATH, args.chunk_rows)
+        return
+    cache = None if args.no_cache else ResultCache(RESULT_CACHE_DIR)
+    if cache is not None and args.clear_cache:
+        cache.invalidate()
+    perform_analysis(PROCESSED_DATA_PATH, REPORT_PATH, cache=cache, engine=args.engine, max_rows=args.max_rows)
+
+
+def run_forecast(args):
+    from data_analysis import load_data
+    from market_stats import MEASURE
+    from forecast import forecast_markets, check_window
+    from vocabulary import load_vocabularies
+
+    try:
+        check_window(args.horizon, args.history)
+    except ValueError as error:
+        raise SystemExit(f"forecast: {error}")
+    df = load_data(PROCESSED_DATA_PATH, ['Date', 'City', 'Variety', MEASURE])
+    section = forecast_markets(df, load_vocabularies(VOCABULARY_PATH), PROCESSED_FORECASTS_DIR,
+                               args.horizon, args.history)
+    print(json.dumps(section, indent=4, ensure_ascii=False))
+    print(f"预测表已保存至: {PROCESSED_FORECASTS_DIR}")
+
+
+def run_model(args):
+    from model import run_training
+
+    run_training(PROCESSED_DATA_PATH, MODEL_DIR, args.engine, args.max_rows, args.streaming,
+                 args.chunk_rows, args.compare)
+
+
+def run_plot(args):
+    from visualization import visualize_data
+    from cube import load_cube, cube_path_for
+
+    cube = load_cube(cube_path_for(PROCESSED_DATA_PATH), PROCESSED_DATA_PATH)
+    visualize_data(PROCESSED_DATA_PATH, FIGURES_DIR, workers=args.workers, only_changed=args.only_changed,
+                   cube=cube, binned=args.binned)
+
+
+def run_all(args):
+    from stages import run_pipeline
+
+    run_pipeline(args.stages, force=args.force, chunksize=args.chunksize, workers=args.workers,
+                 engine=args.engine, max_rows=args.max_rows)
+
+
+def run_serve(args):
+    import asyncio
+    from service import ReportService
+
+    service = ReportService(args.raw_dir, args.service_dir, args.workers, args.poll)
+    try:
+        asyncio.run(service.run_once() if args.once else service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("[service] 已停止")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="南瓜价格分析命令行")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    clean = commands.add_parser('clean', help="清洗原始数据")
+    clean.add_argument('--input', default=None,
+                       help="原始数据：单个文件、目录或通配符（如 'data/raw/*.csv'），默认 data/US-pumpkins.csv")
+    clean.add_argument('--chunksize', type=int, default=None, help="按块流式处理时每块的行数，默认整表读入内存")
+    clean.add_argument('--workers', type=int, default=None, help="多文件输入时并行清洗的进程数，默认CPU核数")
+    clean.add_argument('--no-store', action='store_true', help="只输出CSV，不写列式存储和聚合立方体")
+    clean.set_defaults(func=run_clean)
+
+    analyze = commands.add_parser('analyze', help="统计分析并生成报告")
+    analyze.add_argument('--approximate', action='store_true',
+                         help="按块一次遍历数据，由可合并的概要生成近似统计（不训练模型）")
+    analyze.add_argument('--chunk-rows', type=int, default=1_000_000, help="近似统计模式每块的行数")
+    analyze.add_argument('--no-cache', action='store_true', help="不读取也不写入结果缓存")
+    analyze.add_argument('--clear-cache', action='store_true', help="运行前清空结果缓存")
+    analyze.add_argument('--engine', choices=MODEL_ENGINES, default='forest', help="机器学习章节使用的模型")
+    analyze.add_argument('--max-rows', type=int, default=None, help="训练集按 City × Type 分层抽样的行数上限")
+    analyze.set_defaults(func=run_analyze)
+
+    forecast = commands.add_parser('forecast', help="批量预测各市场（City × Variety）未来几周的价格")
+    forecast.add_argument('--horizon', type=int, default=4, help="预测周数（也是回测留出的周数）")
+    forecast.add_argument('--history', type=int, default=156, help="每个序列使用的最近周数")
+    forecast.set_defaults(func=run_forecast)
+
+    model = commands.add_parser('model', help="训练价格模型，或比较不同训练方式")
+    model.add_argument('--engine', choices=MODEL_ENGINES, default=None, help="默认整表训练用forest，流式训练用hist")
+    model.add_argument('--max-rows', type=int, default=None, help="训练集按 City × Type 分层抽样的行数上限")
+    model.add_argument('--streaming', action='store_true', help="按块流式读取和聚合，适用于大于内存的数据")
+    model.add_argument('--chunk-rows', type=int, default=1_000_000, help="流式训练每块的行数")
+    model.add_argument('--compare', action='store_true', help="比较forest、hist、分层抽样的hist和流式hist")
+    model.set_defaults(func=run_model)
+
+    plot = commands.add_parser('plot', help="生成可视化图表")
+    plot.add_argument('--workers', type=int, default=1, help="并行渲染的进程数")
+    plot.add_argument('--only-changed', action='store_true', help="只重新生成数据有变化的图")
+    plot.add_argument('--binned', action=argparse.BooleanOptionalAction, default=None,
+                      help="分布图使用（--no-binned：不使用）分箱汇总绘制，默认按行数自动选择")
+    plot.set_defaults(func=run_plot)
+
+    pipeline = commands.add_parser('all', help="运行完整流水线（清洗 → 分析/建模/可视化 → 报告）")
+    pipeline.add_argument('--stages', nargs='+', default=None,
+                          help="只运行这些阶段（及其上游）：clean analyze markets forecast model visualize report")
+    pipeline.add_argument('--force', action='store_true', help="忽略缓存，重新运行所有阶段")
+    pipeline.add_argument('--chunksize', type=int, default=None, help="清洗阶段按块流式处理")
+    pipeline.add_argument('--workers', type=int, default=1, help="可视化阶段并行渲染的进程数")
+    pipeline.add_argument('--engine', choices=MODEL_ENGINES, default='forest', help="建模阶段使用的模型")
+    pipeline.add_argument('--max-rows', type=int, default=None, help="建模阶段按 City × Type 分层抽样的训练行数上限")
+    pipeline.set_defaults(func=run_all)
+
+    serve = commands.add_parser('serve', help="服务模式：监视原始数据目录，自动重算并通过本地HTTP端点发布报告")
+    serve.add_argument('--raw-dir', default=RAW_DATA_DIR, help="监视的原始数据目录（其中的*.csv）")
+    serve.add_argument('--service-dir', default=SERVICE_DIR, help="版本目录和current.json的位置")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=SERVICE_PORT)
+    serve.add_argument('--workers', type=int, default=1, help="同时运行的重算任务数（进程数）")
+    serve.add_argument('--poll', type=float, default=2.0, help="扫描目录的间隔（秒）")
+    serve.add_argument('--once', action='store_true', help="处理一次目录中的文件并发布后退出")
+    serve.set_defaults(func=run_serve)
+
+    for command in (clean, analyze, forecast, model, plot, pipeline, serve):
+        profiling.add_arguments(command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiling.enable_from_args(args)
+    args.func(args)
+    # analyze和all把各步骤的记录写入报告的performance部分，其余子命令直接打印
+    if profiling.is_enabled() and args.command in ('clean', 'forecast', 'model', 'plot'):
+        profiling.print_summary()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema, read_processed_csv, PROCESSED_DTYPES, DATE_COLUMN, DATE_FORMAT
+
+SCHEMA_FILE = "schema.json"
+# 存储格式版本，格式变化时递增；版本不一致的存储不再读取
+STORE_VERSION = 1
+
+# 以类别编码存储的字符串列（schema中的类别列）
+CATEGORY_COLUMNS = [col for col, dtype in PROCESSED_DTYPES.items() if dtype == 'category']
+
+
+def store_path_for(csv_path):
+    """
+    处理后CSV对应的列式存储目录，例如 data/processed_data.csv -> data/processed_data_store
+    """
+    return os.path.splitext(csv_path)[0] + "_store"
+
+
+class ColumnStoreWriter:
+    """
+    按列写出的二进制存储：每列一个原始二进制文件，schema.json记录类型和行数
+    日期以datetime64[ns]存储，City/Type/Package/Package_Unit以int32编码加类别表存储
+    支持按块追加，写完后整体替换目标目录
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.tmp_dir = store_dir + ".tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.columns = None
+        self.vocabularies = {}
+        self.n_rows = 0
+
+    def _init_columns(self, df):
+        self.columns = []
+        for i, name in enumerate(df.columns):
+            if name in CATEGORY_COLUMNS:
+                kind, dtype = "category", "int32"
+                self.vocabularies[name] = {}
+            elif pd.api.types.is_datetime64_any_dtype(df[name]):
+                kind, dtype = "datetime", "datetime64[ns]"
+            else:
+                kind, dtype = "numeric", str(df[name].dtype)
+            self.columns.append({"name": name, "kind": kind, "dtype": dtype, "file": f"{i:02d}.bin"})
+
+    def _encode(self, name, series):
+        # 先在块内去重，再把块内编码映射到全局类别表
+        vocabulary = self.vocabularies[name]
+        codes, uniques = pd.factorize(series)
+        if not len(uniques):
+            return np.full(len(series), -1, dtype=np.int32)
+        ids = np.array([vocabulary.setdefault(value, len(vocabulary)) for value in uniques], dtype=np.int32)
+        return np.where(codes >= 0, ids[codes], -1).astype(np.int32)
+
+    def append(self, df):
+        if self.columns is None:
+            self._init_columns(df)
+        for column in self.columns:
+            name = column["name"]
+            if column["kind"] == "category":
+                values = self._encode(name, df[name])
+            else:
+                values = np.asarray(df[name].to_numpy(), dtype=column["dtype"])
+            with open(os.path.join(self.tmp_dir, column["file"]), "ab") as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+        self.n_rows += len(df)
+
+    def close(self):
+        for column in self.columns or []:
+            if column["kind"] == "category":
+                column["categories"] = list(self.vocabularies[column["name"]])
+        with open(os.path.join(self.tmp_dir, SCHEMA_FILE), "w") as f:
+            json.dump({"version": STORE_VERSION, "n_rows": self.n_rows, "columns": self.columns or []}, f, indent=4)
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+        os.rename(self.tmp_dir, self.store_dir)
+
+
+def write_store(df, store_dir):
+    """
+    将整个DataFrame写成列式存储
+    """
+    writer = ColumnStoreWriter(store_dir)
+    writer.append(df)
+    writer.close()
+
+
+def load_schema(store_dir):
+    """
+    读取存储的schema.json，版本与STORE_VERSION不一致时抛出ValueError
+    """
+    with open(os.path.join(store_dir, SCHEMA_FILE)) as f:
+        schema = json.load(f)
+    if schema.get("version") != STORE_VERSION:
+        raise ValueError(f"{store_dir} 的存储格式版本为 {schema.get('version')}，"
+                         f"当前为 {STORE_VERSION}，请重新运行数据清洗")
+    return schema
+
+
+def read_store(store_dir, columns=None):
+    """
+    读取列式存储，columns指定时只读取这些列（不存在的列忽略）
+    数值列和日期列通过内存映射读取
+    """
+    schema = load_schema(store_dir)
+    n_rows = schema["n_rows"]
+
+    data = {}
+    for column in schema["columns"]:
+        name = column["name"]
+        if columns is not None and name not in columns:
+            continue
+        path = os.path.join(store_dir, column["file"])
+        if n_rows:
+            values = np.memmap(path, dtype=column["dtype"], mode="r", shape=(n_rows,))
+        else:
+            values = np.empty(0, dtype=column["dtype"])
+        if column["kind"] == "category":
+            data[name] = pd.Categorical.from_codes(values, categories=column["categories"])
+        else:
+            data[name] = np.asarray(values)
+    return pd.DataFrame(data)
+
+
+def store_is_fresh(store_dir, csv_path):
+    """
+    存储存在、格式版本一致且不早于对应的CSV文件时才使用
+    """
+    schema_path = os.path.join(store_dir, SCHEMA_FILE)
+    if not os.path.exists(schema_path):
+        return False
+    with open(schema_path) as f:
+        if json.load(f).get("version") != STORE_VERSION:
+            return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(schema_path) >= os.path.getmtime(csv_path)
+
+
+def load_processed(csv_path, columns=None):
+    """
+    读取处理后的数据：优先使用列式存储，否则回退到解析CSV
+    两种方式都按schema.PROCESSED_DTYPES返回紧凑类型（旧的float64存储在读取时转换）
+    """
+    store_dir = store_path_for(csv_path)
+    if store_is_fresh(store_dir, csv_path):
+        return apply_schema(read_store(store_dir, columns))
+    return read_processed_csv(csv_path, columns)
+
+
+def iter_store(store_dir, columns=None, chunk_rows=1_000_000):
+    """
+    按行块读取列式存储，每块只把该段内存映射的数据转为DataFrame，内存占用只与chunk_rows有关
+    """
+    schema = load_schema(store_dir)
+    n_rows = schema["n_rows"]
+    selected = [c for c in schema["columns"] if columns is None or c["name"] in columns]
+    arrays = {c["name"]: np.memmap(os.path.join(store_dir, c["file"]), dtype=c["dtype"], mode="r", shape=(n_rows,))
+              for c in selected if n_rows}
+    for start in range(0, n_rows, chunk_rows):
+        data = {}
+        for column in selected:
+            values = np.array(arrays[column["name"]][start:start + chunk_rows])
+            if column["kind"] == "category":
+                data[column["name"]] = pd.Categorical.from_codes(values, categories=column["categories"])
+            else:
+                data[column["name"]] = values
+        yield pd.DataFrame(data)
+
+
+def iter_processed(csv_path, columns=None, chunk_rows=1_000_000):
+    """
+    按块读取处理后的数据（优先列式存储，否则分块解析CSV），各块为紧凑类型，见load_processed
+    """
+    store_dir = store_path_for(csv_path)
+    if store_is_fresh(store_dir, csv_path):
+        for chunk in iter_store(store_dir, columns, chunk_rows):
+            yield apply_schema(chunk)
+        return
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [col for col in header if columns is None or col in columns]
+    dtypes = {col: dtype for col, dtype in PROCESSED_DTYPES.items() if col in usecols}
+    parse_dates = [DATE_COLUMN] if DATE_COLUMN in usecols else False
+    yield from pd.read_csv(csv_path, usecols=usecols, dtype=dtypes, parse_dates=parse_dates,
+                           date_format=DATE_FORMAT, chunksize=chunk_rows)
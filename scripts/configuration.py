@@ -3,6 +3,22 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 RAW_DATA_PATH       = os.path.join(BASE_DIR, "data", "US-pumpkins.csv")
+RAW_DATA_DIR        = os.path.join(BASE_DIR, "data", "raw")
 PROCESSED_DATA_PATH = os.path.join(BASE_DIR, "data", "processed_data.csv")
+PROCESSED_STORE_DIR = os.path.join(BASE_DIR, "data", "processed_data_store")
+PROCESSED_CUBE_PATH = os.path.join(BASE_DIR, "data", "processed_data_cube.npz")
+PROCESSED_MARKETS_DIR = os.path.join(BASE_DIR, "data", "processed_data_markets")
+PROCESSED_FORECASTS_DIR = os.path.join(BASE_DIR, "data", "processed_data_forecasts")
+VOCABULARY_PATH     = os.path.join(BASE_DIR, "data", "vocabularies.json")
+INGEST_STATE_PATH   = os.path.join(BASE_DIR, "data", "ingest_state.json")
 REPORT_PATH         = os.path.join(BASE_DIR, "output", "analysis_report.json")
-FIGURES_DIR         = os.path.join(BASE_DIR, "output", "figures")
\ No newline at end of file
+BACKTEST_REPORT_PATH = os.path.join(BASE_DIR, "output", "backtest_report.json")
+FIGURES_DIR         = os.path.join(BASE_DIR, "output", "figures")
+MODEL_DIR           = os.path.join(BASE_DIR, "output", "models")
+PIPELINE_CACHE_DIR  = os.path.join(BASE_DIR, "output", "cache")
+RESULT_CACHE_DIR    = os.path.join(BASE_DIR, "output", "result_cache")
+SERVICE_DIR         = os.path.join(BASE_DIR, "output", "service")
+SERVICE_PORT        = 8765
+
+# 价格模型：随机森林 / 直方图梯度提升（在此定义，命令行解析参数时不必导入sklearn）
+MODEL_ENGINES = ['forest', 'hist']
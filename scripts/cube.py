@@ -0,0 +1,278 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# 立方体的维度（最后一维为月份）和聚合的价格列
+DIMENSIONS = ['City', 'Type', 'Variety', 'Month']
+MEASURE = 'Avg Price'
+STATISTICS = ['count', 'mean', 'std', 'min', 'max']
+
+
+def cube_path_for(csv_path):
+    """
+    处理后CSV对应的聚合立方体文件，例如 data/processed_data.csv -> data/processed_data_cube.npz
+    """
+    return os.path.splitext(csv_path)[0] + "_cube.npz"
+
+
+def _month_number(value):
+    # 自1970-01起的月份序号；ISO格式的字符串直接解析，其余交给pd.Timestamp
+    try:
+        month = np.datetime64(value, 'M')
+    except (ValueError, TypeError):
+        month = np.datetime64(pd.Timestamp(value), 'M')
+    return int(month.astype(np.int64))
+
+
+def _reduce(cells, count, total, sumsq, low, high):
+    """
+    按格子编码合并重复的格子：排序后用reduceat，返回按编码升序排列的格子及其聚合值
+    """
+    if not len(cells):
+        return cells, count, total, sumsq, low, high
+    order = np.argsort(cells, kind='stable')
+    cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+    return (cells[starts], np.add.reduceat(count[order], starts), np.add.reduceat(total[order], starts),
+            np.add.reduceat(sumsq[order], starts), np.minimum.reduceat(low[order], starts),
+            np.maximum.reduceat(high[order], starts))
+
+
+class PriceCube:
+    """
+    City × Type × Variety × 月份 的平均价格聚合立方体
+    只保存有数据的格子（类似CSR的稀疏布局）：按升序排列的格子编码（各维度坐标在完整形状中的扁平下标），
+    以及每个格子的计数、和、平方和、最小值和最大值；空格子不占空间，
+    因此大小只随有数据的组合数增长，不随只追加的类别字典（见vocabulary）的乘积增长。
+    切片、上卷和时间范围查询只在这些小数组上计算，不读取逐行数据
+    City/Type/Variety的坐标为类别字典中的编码（字典只追加，编码稳定），
+    Type缺失值与字典外的取值一样落在编码0（'Other'）
+    限制：格子编码为int64，完整形状（各维度大小的乘积）须小于2**63，超出时构建会报ValueError
+    """
+
+    def __init__(self, labels, first_month, n_months, cells, count, total, sumsq, low, high):
+        self.labels = {dim: list(values) for dim, values in labels.items()}
+        self.first_month = int(first_month)
+        self.n_months = int(n_months)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.count = count
+        self.total = total
+        self.sumsq = sumsq
+        self.low = low
+        self.high = high
+        self._codes = {dim: {value: i for i, value in enumerate(values)} for dim, values in self.labels.items()}
+
+    @property
+    def shape(self):
+        # 完整（逻辑上的）形状；实际只保存 len(cells) 个格子
+        return tuple(len(self.labels[dim]) for dim in DIMENSIONS[:-1]) + (self.n_months,)
+
+    @classmethod
+    def empty(cls, labels, first_month, n_months):
+        return cls(labels, first_month, n_months, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                   np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0))
+
+    @classmethod
+    def from_frame(cls, df, vocabularies):
+        """
+        由清洗后的数据构建立方体：City/Type按字典编码，Variety已是字典编码
+        每行先算出格子编码，再按格子排序后用reduceat一次算出计数、和、平方和与最值
+        """
+        labels = {dim: vocabularies[dim].values for dim in DIMENSIONS[:-1]}
+        prices = df[MEASURE].to_numpy(dtype=np.float64)
+        dates = df['Date']
+        if not np.issubdtype(dates.dtype, np.datetime64):
+            dates = pd.to_datetime(dates)
+        months = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+        valid = ~np.isnan(prices) & ~np.isnat(dates.to_numpy(dtype='datetime64[ns]'))
+        if not valid.any():
+            return cls.empty(labels, 0, 0)
+
+        codes = [
+            vocabularies['City'].encode(df['City'][valid]),
+            vocabularies['Type'].encode(df['Type'][valid]),
+            np.asarray(df['Variety'].to_numpy()[valid], dtype=np.int64),
+        ]
+        months, prices = months[valid], prices[valid]
+        first_month = months.min()
+        cube = cls.empty(labels, first_month, int(months.max() - first_month) + 1)
+        cells = np.ravel_multi_index(codes + [months - first_month], cube.shape)
+        (cube.cells, cube.count, cube.total, cube.sumsq, cube.low, cube.high) = _reduce(
+            cells, np.ones(len(cells), dtype=np.int64), prices, prices * prices, prices, prices)
+        return cube
+
+    def _coordinates(self):
+        # 各格子在各维度上的坐标（City、Type、Variety编码和相对first_month的月份）
+        return np.unravel_index(self.cells, self.shape)
+
+    def _recoded(self, shape, first_month):
+        # 把格子编码换算到更大的坐标系中（字典只追加，原有编码是新字典的前缀）
+        coords = list(self._coordinates())
+        coords[-1] = coords[-1] + (self.first_month - first_month)
+        return np.ravel_multi_index(coords, shape)
+
+    def merge(self, other):
+        """
+        合并两个立方体（如按块或按批构建的结果），返回新的立方体
+        """
+        if not len(other.cells):
+            return self
+        if not len(self.cells):
+            return other
+        labels = {dim: max(self.labels[dim], other.labels[dim], key=len) for dim in DIMENSIONS[:-1]}
+        first = min(self.first_month, other.first_month)
+        last = max(self.first_month + self.n_months, other.first_month + other.n_months)
+        cube = PriceCube.empty(labels, first, last - first)
+        cells = np.concatenate([self._recoded(cube.shape, first), other._recoded(cube.shape, first)])
+        (cube.cells, cube.count, cube.total, cube.sumsq, cube.low, cube.high) = _reduce(
+            cells, *(np.concatenate([getattr(self, name), getattr(other, name)])
+                     for name in ('count', 'total', 'sumsq', 'low', 'high')))
+        return cube
+
+    def _select(self, dim, values, coords):
+        # 返回选中格子的布尔掩码；values为None时全选
+        if values is None:
+            return None
+        codes = self._codes[dim]
+        if isinstance(values, str):
+            code = codes.get(values)
+            return np.zeros(len(coords), dtype=bool) if code is None else coords == code
+        # 字典中没有的取值不匹配任何格子（而不是归入'Other'）
+        return np.isin(coords, [codes[value] for value in values if value in codes])
+
+    def _month_range(self, start=None, end=None):
+        lo = 0 if start is None else max(_month_number(start) - self.first_month, 0)
+        hi = self.n_months if end is None else min(_month_number(end) - self.first_month + 1, self.n_months)
+        return lo, max(hi, lo)
+
+    def _block(self, city, type_, variety, start, end):
+        """
+        返回选中格子的各维度坐标和在格子数组中的下标
+        """
+        coords = self._coordinates()
+        lo, hi = self._month_range(start, end)
+        keep = (coords[-1] >= lo) & (coords[-1] < hi)
+        for dim, values, dim_coords in zip(DIMENSIONS, (city, type_, variety), coords):
+            mask = self._select(dim, values, dim_coords)
+            if mask is not None:
+                keep &= mask
+        index = np.flatnonzero(keep)
+        return [dim_coords[index] for dim_coords in coords], index
+
+    def query(self, city=None, type_=None, variety=None, start=None, end=None, by=None):
+        """
+        查询平均价格的计数、均值、标准差、最小值和最大值
+        city/type_/variety可为单个取值、取值列表或None（全部）；start/end为起止月份（含），
+        如 '2016-09'、'2016-10-31'；Type缺失（普通南瓜）的记录对应'Other'
+        by为空时返回汇总的字典，否则按by中的维度（可含'Month'）上卷，返回DataFrame（只含有数据的组合）
+        """
+        coords, index = self._block(city, type_, variety, start, end)
+        by = [by] if isinstance(by, str) else list(by or [])
+        axes = [i for i, dim in enumerate(DIMENSIONS) if dim in by]
+
+        # 按DIMENSIONS中的顺序把by的维度编成组编码，再合并同组的格子
+        group_shape = tuple(self.shape[i] for i in axes)
+        keys = (np.ravel_multi_index([coords[i] for i in axes], group_shape) if axes
+                else np.zeros(len(index), dtype=np.int64))
+        keys, count, total, sumsq, low, high = _reduce(
+            keys, *(getattr(self, name)[index] for name in ('count', 'total', 'sumsq', 'low', 'high')))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(sumsq - total * mean, 0) / (count - 1))
+        stats = {'count': count, 'mean': mean, 'std': std, 'min': low, 'max': high}
+
+        if not by:
+            if not len(keys):
+                return {'count': 0, 'mean': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan}
+            return {name: (int(value[0]) if name == 'count' else float(value[0])) for name, value in stats.items()}
+
+        grid = []
+        for i, codes in zip(axes, np.unravel_index(keys, group_shape)):
+            dim = DIMENSIONS[i]
+            if dim == 'Month':
+                grid.append(pd.PeriodIndex(
+                    (self.first_month + codes).astype('datetime64[M]'), freq='M', name=dim))
+            else:
+                grid.append(pd.Index(np.asarray(self.labels[dim], dtype=object)[codes], name=dim))
+        result = pd.DataFrame(stats, index=pd.MultiIndex.from_arrays(grid) if len(grid) > 1 else grid[0])
+        return result.reorder_levels(by) if len(by) > 1 else result
+
+    def monthly_mean(self, city=None, type_=None, variety=None, start=None, end=None):
+        """
+        按月的平均价格序列，索引为月末日期，从第一个到最后一个有数据的月份，
+        中间没有数据的月份为NaN（与按月resample的结果一致）
+        """
+        coords, index = self._block(city, type_, variety, start, end)
+        months = coords[-1]
+        count = np.bincount(months, weights=self.count[index], minlength=self.n_months)
+        total = np.bincount(months, weights=self.total[index], minlength=self.n_months)
+        present = np.flatnonzero(count)
+        if not len(present):
+            return pd.Series([], dtype=np.float64, index=pd.DatetimeIndex([], freq='M'))
+        keep = slice(present[0], present[-1] + 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total[keep] / count[keep]
+        first = np.datetime64(self.first_month + int(present[0]), 'M')
+        return pd.Series(mean, index=pd.date_range(pd.Timestamp(first), periods=len(mean), freq='M'))
+
+    def save(self, path):
+        """
+        原子地写出压缩的npz文件（类别标签、起始月份和月份数存为JSON）
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = json.dumps({"labels": self.labels, "first_month": self.first_month, "n_months": self.n_months},
+                          ensure_ascii=False)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(meta), cells=self.cells, count=self.count, total=self.total,
+                                sumsq=self.sumsq, low=self.low, high=self.high)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            return cls(meta["labels"], meta["first_month"], meta["n_months"], data['cells'], data['count'],
+                       data['total'], data['sumsq'], data['low'], data['high'])
+
+
+def load_cube(path, csv_path=None):
+    """
+    读取聚合立方体；文件不存在、早于对应的CSV或是旧的稠密格式（没有cells）时返回None
+    """
+    if not os.path.exists(path):
+        return None
+    if csv_path and os.path.exists(csv_path) and os.path.getmtime(path) < os.path.getmtime(csv_path):
+        return None
+    with np.load(path) as data:
+        if 'cells' not in data.files:
+            return None
+    return PriceCube.load(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    from configuration import PROCESSED_DATA_PATH, VOCABULARY_PATH
+    from data_analysis import load_data
+    from vocabulary import load_vocabularies
+
+    parser = argparse.ArgumentParser(description="构建或查询 City × Type × Variety × 月份 的价格聚合立方体")
+    parser.add_argument('--build', action='store_true', help="由处理后的数据重新构建立方体")
+    parser.add_argument('--city', nargs='+', default=None)
+    parser.add_argument('--type', dest='type_', nargs='+', default=None)
+    parser.add_argument('--variety', nargs='+', default=None)
+    parser.add_argument('--start', default=None, help="起始月份，如 2016-09")
+    parser.add_argument('--end', default=None, help="结束月份（含），如 2016-10")
+    parser.add_argument('--by', nargs='+', default=None, choices=DIMENSIONS, help="按这些维度上卷")
+    args = parser.parse_args()
+
+    cube_path = cube_path_for(PROCESSED_DATA_PATH)
+    cube = None if args.build else load_cube(cube_path, PROCESSED_DATA_PATH)
+    if cube is None:
+        df = load_data(PROCESSED_DATA_PATH, ['Date', 'City', 'Type', 'Variety', MEASURE])
+        cube = PriceCube.from_frame(df, load_vocabularies(VOCABULARY_PATH))
+        cube.save(cube_path)
+        print(f"聚合立方体已保存至: {cube_path}（形状 {cube.shape}，有数据的格子 {len(cube.cells)}）")
+    print(cube.query(args.city, args.type_, args.variety, args.start, args.end, args.by))
@@ -1,40 +1,164 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
-
-def load_data(path):
-    return pd.read_csv(path)
-
-def summarize_data(df):
-    return {
-        "total_records": len(df),
-        "start_date": str(df['Date'].min()) if 'Date' in df.columns else "N/A",
-        "end_date": str(df['Date'].max()) if 'Date' in df.columns else "N/A",
-        "unique_cities": df['City'].nunique() if 'City' in df.columns else "N/A",
-        "unique_types": df['Type'].nunique() if 'Type' in df.columns else "N/A"
-    }
+from column_store import load_processed
+
+# 分析和可视化阶段用到的列（Variety用于按市场的滚动统计）
+ANALYSIS_COLUMNS = ['Date', 'City', 'Type', 'Variety', 'Low Price', 'High Price', 'Avg Price']
+
+def load_data(path, columns=None):
+    """
+    读取处理后的数据，优先使用列式存储；columns指定时只读取这些列
+    各列按紧凑类型返回（类别字符串、float32价格、int16编码、datetime64日期），见schema
+    """
+    return load_processed(path, columns)
+
+def format_date(value):
+    # 列式存储中的日期为Timestamp，与CSV中的日期字符串保持同样的输出格式
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
+
+PRICE_COLUMNS = ['Low Price', 'High Price', 'Avg Price']
+
+def _nunique(series):
+    # 类别列直接统计出现过的编码，避免对字符串做哈希
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=1)))
+    return series.nunique()
+
+def _date_values(series):
+    # 列式存储中已是datetime64，CSV中为日期字符串
+    if not np.issubdtype(series.dtype, np.datetime64):
+        series = pd.to_datetime(series)
+    return series.to_numpy(dtype='datetime64[ns]')
+
+def _pairwise_correlation(centered, valid):
+    """
+    与DataFrame.corr()相同的成对删除：每对列只使用两列都有效的行
+    centered为按各列整体均值中心化、缺失处为0的价格数组，valid为有效值掩码；
+    各对的行数、和、平方和与交叉积都由矩阵乘法一次得到，平移不改变相关系数
+    """
+    weights = valid.astype(np.float64)
+    n = weights @ weights.T
+    # sums[i, j]：列i在列i、j都有效的行上的和；squares同理
+    sums = centered @ weights.T
+    squares = (centered ** 2) @ weights.T
+    cross = centered @ centered.T
+    covariance = cross - sums * sums.T / n
+    variance = squares - sums ** 2 / n
+    corr = covariance / np.sqrt(variance * variance.T)
+    np.fill_diagonal(corr, np.where(np.diag(variance) > 0, 1.0, np.nan))
+    return corr
+
+def compute_statistics(df):
+    """
+    一次性计算报告中的概览、价格统计、相关性和月度趋势
+    价格列拷贝为一个连续的 (3, n) 数组，均值、离差平方和与交叉积在同一次中心化后得到；
+    月度趋势以整数月份编号分桶，用bincount求和与计数，不重新解析日期也不复制数据表
+    最值与pandas逐列计算一致；均值/标准差、相关系数和月均价与pandas在浮点舍入误差内一致（float32列约1e-12相对误差）
+    价格有缺失值时，相关系数与DataFrame.corr()一样按列对成对删除
+    summarize_data等函数可传入本函数的结果，只取其中一部分而不重新计算
+    """
+    has_prices = set(PRICE_COLUMNS).issubset(df.columns)
+    has_trend = 'Date' in df.columns and 'Avg Price' in df.columns
+    dates = _date_values(df['Date']) if 'Date' in df.columns else None
 
-def price_statistics(df):
-    return {
-        "low_price_mean": df['Low Price'].mean() if 'Low Price' in df.columns else "N/A",
-        "high_price_mean": df['High Price'].mean() if 'High Price' in df.columns else "N/A",
-        "avg_price_mean": df['Avg Price'].mean() if 'Avg Price' in df.columns else "N/A",
-        "avg_price_std": df['Avg Price'].std() if 'Avg Price' in df.columns else "N/A",
-        "avg_price_min": df['Avg Price'].min() if 'Avg Price' in df.columns else "N/A",
-        "avg_price_max": df['Avg Price'].max() if 'Avg Price' in df.columns else "N/A"
+    # 1. 数据概览
+    if dates is not None:
+        valid_dates = dates[~np.isnat(dates)]
+        start_date = format_date(pd.Timestamp(valid_dates.min())) if len(valid_dates) else "NaT"
+        end_date = format_date(pd.Timestamp(valid_dates.max())) if len(valid_dates) else "NaT"
+    results = {
+        "overview": {
+            "total_records": len(df),
+            "start_date": start_date if dates is not None else "N/A",
+            "end_date": end_date if dates is not None else "N/A",
+            "unique_cities": _nunique(df['City']) if 'City' in df.columns else "N/A",
+            "unique_types": _nunique(df['Type']) if 'Type' in df.columns else "N/A"
+        }
     }
 
-def monthly_price_trend(df):
-    if 'Date' not in df.columns or 'Avg Price' not in df.columns:
-        return "缺少日期或价格列"
-    df['Date'] = pd.to_datetime(df['Date'])
-    monthly_avg = df.set_index('Date').resample('M')['Avg Price'].mean()
-    return {
-        "months": monthly_avg.index.strftime('%Y-%m').tolist(),
-        "prices": monthly_avg.values.tolist()
+    # 2. 价格统计与相关性（共用同一份价格数组）
+    columns = [col for col in PRICE_COLUMNS if col in df.columns]
+    prices = np.empty((len(columns), len(df)))
+    for i, col in enumerate(columns):
+        prices[i] = df[col].to_numpy(dtype=np.float64)
+    missing = np.isnan(prices)
+    counts = len(df) - missing.sum(axis=1)
+    filled = np.where(missing, 0.0, prices) if missing.any() else prices
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = filled.sum(axis=1) / counts
+        centered = np.where(missing, 0.0, filled - means[:, None])
+        sumsq = (centered ** 2).sum(axis=1)
+        std = np.sqrt(sumsq / (counts - 1))
+    stats = {col: i for i, col in enumerate(columns)}
+
+    def column_stat(col, values):
+        return float(values[stats[col]]) if col in stats else "N/A"
+
+    def column_extreme(col, func):
+        if col not in stats or counts[stats[col]] == 0:
+            return float('nan') if col in stats else "N/A"
+        value = func(prices[stats[col]][~missing[stats[col]]])
+        # 最值是原列中的某个值，float32列按其最短十进制表示输出（0.24而不是0.23999999463558197）
+        return float(str(df[col].dtype.type(value))) if df[col].dtype == np.float32 else float(value)
+
+    results["price_statistics"] = {
+        "low_price_mean": column_stat('Low Price', means),
+        "high_price_mean": column_stat('High Price', means),
+        "avg_price_mean": column_stat('Avg Price', means),
+        "avg_price_std": column_stat('Avg Price', std),
+        "avg_price_min": column_extreme('Avg Price', np.min),
+        "avg_price_max": column_extreme('Avg Price', np.max)
     }
 
-def price_correlation(df):
-    cols = ['Low Price', 'High Price', 'Avg Price']
-    if set(cols).issubset(df.columns):
-        return df[cols].corr().to_dict()
-    return "缺少价格列"
\ No newline at end of file
+    if has_prices:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if missing.any():
+                corr = _pairwise_correlation(centered, ~missing)
+            else:
+                cross = centered @ centered.T
+                corr = cross / np.sqrt(np.outer(sumsq, sumsq))
+                np.fill_diagonal(corr, np.where(sumsq > 0, 1.0, np.nan))
+        results["price_correlation"] = {
+            col_j: {col_i: float(corr[i, j]) for i, col_i in enumerate(PRICE_COLUMNS)}
+            for j, col_j in enumerate(PRICE_COLUMNS)
+        }
+    else:
+        results["price_correlation"] = "缺少价格列"
+
+    # 3. 月度趋势：从最早到最晚的每个自然月一个桶，没有数据的月份为NaN（与resample('M')一致）
+    if has_trend:
+        avg = prices[stats['Avg Price']]
+        valid = ~np.isnat(dates) & ~missing[stats['Avg Price']]
+        month_keys = dates[valid].astype('datetime64[M]').astype(np.int64)
+        if len(month_keys):
+            first = month_keys.min()
+            buckets = month_keys - first
+            sums = np.bincount(buckets, weights=avg[valid])
+            month_counts = np.bincount(buckets)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                monthly = sums / month_counts
+            months = np.arange(first, first + len(sums)).astype('datetime64[M]')
+        else:
+            monthly, months = np.array([]), np.array([], dtype='datetime64[M]')
+        results["monthly_price_trend"] = {
+            "months": np.datetime_as_string(months, unit='M').tolist(),
+            "prices": monthly.tolist()
+        }
+    else:
+        results["monthly_price_trend"] = "缺少日期或价格列"
+    return results
+
+def summarize_data(df, statistics=None):
+    return (statistics or compute_statistics(df))["overview"]
+
+def price_statistics(df, statistics=None):
+    return (statistics or compute_statistics(df))["price_statistics"]
+
+def monthly_price_trend(df, statistics=None):
+    return (statistics or compute_statistics(df))["monthly_price_trend"]
+
+def price_correlation(df, statistics=None):
+    return (statistics or compute_statistics(df))["price_correlation"]
@@ -1,38 +1,220 @@
+import numpy as np
 import pandas as pd
 import os
+import glob
+import time
 from datetime import datetime
 import csv
+from concurrent.futures import ProcessPoolExecutor
 
+from column_store import ColumnStoreWriter, write_store, store_path_for
+from cube import PriceCube, cube_path_for
+from vocabulary import Vocabulary, load_vocabularies, save_vocabularies
+from package_units import normalize_packages
+from schema import apply_schema
+import profiling
+from profiling import step, profiled
 
-def clean_data(input_path, output_path):
+
+# 原始数据的列名
+RAW_COLUMNS = [
+    'City Name', 'Type', 'Package', 'Variety', 'Sub Variety', 'Grade', 'Date',
+    'Low Price', 'High Price', 'Mostly Low', 'Mostly High', 'Origin', 'Origin District',
+    'Item Size', 'Color', 'Environment', 'Unit of Sale', 'Quality', 'Condition',
+    'Appearance', 'Storage', 'Crop', 'Repack', 'Trans Mode', 'Unnamed1', 'Unnamed2'
+]
+
+# 显式列类型：价格读为float32（与处理后数据的紧凑类型一致），其余均按字符串读取，避免分块时类型推断不一致
+RAW_DTYPES = {col: object for col in RAW_COLUMNS}
+RAW_DTYPES.update({col: 'float32' for col in ['Low Price', 'High Price', 'Mostly Low', 'Mostly High']})
+
+# 清洗时保留的列
+REQUIRED_COLUMNS = ['Date', 'City Name', 'Type', 'Low Price', 'High Price',
+                    'Package', 'Grade', 'Variety', 'Color', 'Origin']
+
+# 需要合并低频取值并编码的类别列
+CATEGORY_COLUMNS = ['Grade', 'Variety', 'Color', 'Origin']
+TOP_N_CATEGORIES = 10
+
+# 维护稳定类别字典的列（City/Type在处理后数据中仍保留原始字符串，字典供建模使用）
+VOCABULARY_COLUMNS = ['City', 'Type'] + CATEGORY_COLUMNS
+VOCABULARY_FILE = "vocabularies.json"
+
+# 流式清洗的默认块大小（行）
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# 原始数据中出现过的日期格式，按优先级排列
+DATE_FORMATS = [
+    '%Y/%m/%d',  # 2011/5/16
+    '%m/%d/%y',  # 9/24/16
+    '%m/%d/%Y',  # 9/24/2016
+    '%Y-%m-%d',  # 2011-05-16
+    '%m-%d-%y',  # 9-24-16
+    '%m-%d-%Y'  # 9-24-2016
+]
+
+
+def convert_date(date_str):
     """
-    清洗南瓜价格数据
-    从原始数据生成processed_data.csv
+    逐行解析单个日期字符串，依次尝试DATE_FORMATS中的格式
+    仅作为parse_dates的兜底以及结果对照使用
+    """
+    # 确保日期是字符串类型
+    date_str = str(date_str).strip()
+    if not date_str:
+        return None
+
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_dates(dates):
+    """
+    向量化解析日期列，结果与逐行调用convert_date一致
+    每个不同的日期字符串只解析一次：先按格式批量调用pd.to_datetime，
+    剩余未解析的值再逐个格式回退，最后通过整数编码映射回原始行
+    返回datetime64列，无法解析或超出范围的值为NaT
+    """
+    # 1. 去重：原始数据中的日期取值远少于行数
+    codes, uniques = pd.factorize(dates.astype(str).str.strip())
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+
+    # 2. 按优先级逐个格式批量解析，只处理前面格式没有解析成功的值
+    remaining = uniques != ''
+    for fmt in DATE_FORMATS:
+        if not remaining.any():
+            break
+        result = pd.to_datetime(uniques[remaining], format=fmt, errors='coerce')
+        parsed[remaining] = result
+        remaining &= result.reindex(uniques.index).isna()
+
+    # 3. 兜底：批量解析失败的值逐个用strptime确认
+    #    超出datetime64[ns]范围（1677~2262年）的日期视为无效
+    for i in uniques.index[remaining]:
+        value = convert_date(uniques[i])
+        if value is not None and pd.Timestamp.min <= pd.Timestamp(value) <= pd.Timestamp.max:
+            parsed[i] = pd.Timestamp(value)
+
+    # 4. 通过编码映射回原始行（-1表示缺失值）
+    values = parsed.to_numpy()
+    result = np.where(codes >= 0, values[codes], np.datetime64('NaT'))
+    return pd.Series(result, index=dates.index, name=dates.name)
+
+
+def detect_delimiter(input_path, verbose=True):
+    """
+    根据文件前4KB检测分隔符
     """
-    # 1. 检测文件实际的分隔符
     with open(input_path, 'r', newline='', encoding='utf-8') as f:
         sample = f.read(4096)  # 读取文件前4KB
         sniffer = csv.Sniffer()
         dialect = sniffer.sniff(sample)
-        print(f"检测到的分隔符: {repr(dialect.delimiter)}")
+        if verbose:
+            print(f"检测到的分隔符: {repr(dialect.delimiter)}")
+    return dialect.delimiter
+
+
+def check_header(input_path, delimiter):
+    """
+    检查表头是否为US-pumpkins格式（前24列列名一致，最后两列无列名），不一致时抛出ValueError
+    """
+    with open(input_path, 'r', newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f, delimiter=delimiter), [])
+    if [name.strip() for name in header[:24]] != RAW_COLUMNS[:24]:
+        raise ValueError(f"表头与US-pumpkins格式不一致: {header[:5]}...")
+
+
+def select_columns(df, verbose=True):
+    """
+    只保留需要的列，并将City Name重命名为City
+    """
+    # 确保只选择存在的列
+    available_columns = [col for col in REQUIRED_COLUMNS if col in df.columns]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
 
-    # 2. 定义列名
-    column_names = [
-        'City Name', 'Type', 'Package', 'Variety', 'Sub Variety', 'Grade', 'Date',
-        'Low Price', 'High Price', 'Mostly Low', 'Mostly High', 'Origin', 'Origin District',
-        'Item Size', 'Color', 'Environment', 'Unit of Sale', 'Quality', 'Condition',
-        'Appearance', 'Storage', 'Crop', 'Repack', 'Trans Mode', 'Unnamed1', 'Unnamed2'
-    ]
+    if missing_columns and verbose:
+        print(f"警告: 以下列不存在: {missing_columns}")
+
+    df = df[available_columns]
+
+    # 重命名列以保持一致性
+    if 'City Name' in df.columns:
+        df = df.rename(columns={'City Name': 'City'})
+    return df
+
+
+def count_categories(df, counts=None):
+    """
+    统计各字典列的取值频数，可跨数据块累加
+    counts按首次出现的顺序保存取值，保证与整表value_counts一致
+    """
+    counts = {} if counts is None else counts
+    for col in VOCABULARY_COLUMNS:
+        if col not in df.columns:
+            continue
+        col_counts = counts.setdefault(col, {})
+        for value, count in df[col].value_counts(sort=False).items():
+            col_counts[value] = col_counts.get(value, 0) + count
+    return counts
+
+
+def update_vocabularies(vocabularies, counts, top_n=TOP_N_CATEGORIES):
+    """
+    按频数从高到低把新取值追加到各列的类别字典，已有取值的编码保持不变
+    City/Type收录全部取值；CATEGORY_COLUMNS只收录前top_n个，其余取值编码时归为'Other'
+    """
+    for col, col_counts in counts.items():
+        ranked = pd.Series(col_counts, dtype='int64').sort_values(ascending=False, kind='stable').index
+        if col in CATEGORY_COLUMNS:
+            ranked = ranked[:top_n]
+        vocabularies.setdefault(col, Vocabulary()).add(ranked)
+    return vocabularies
+
+
+def encode_categories(df, vocabularies):
+    """
+    用类别字典把类别列转换为稳定的整数编码，字典外的值和缺失值编码为0（'Other'）
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = vocabularies[col].encode(df[col])
+    return df
 
-    # 3. 读取数据 - 移除不兼容的low_memory参数
+
+def price_mask(df):
+    """
+    有效价格行：最低价和最高价均非空且大于0
+    """
+    return (df['Low Price'].notna() & df['High Price'].notna()
+            & (df['Low Price'] > 0) & (df['High Price'] > 0))
+
+
+def vocabulary_path_for(output_path):
+    """
+    类别字典文件与处理后的数据放在同一目录
+    """
+    return os.path.join(os.path.dirname(output_path), VOCABULARY_FILE)
+
+
+def read_raw(input_path, delimiter):
+    """
+    整表读取原始数据，解析失败时依次尝试制表符和自动检测分隔符
+    """
     try:
         df = pd.read_csv(
             input_path,
-            sep=dialect.delimiter,  # 使用检测到的分隔符
+            sep=delimiter,  # 使用检测到的分隔符
             header=0,
-            names=column_names,
+            names=RAW_COLUMNS,
+            dtype=RAW_DTYPES,
             engine='python',
-            error_bad_lines=False, warn_bad_lines=True
+            on_bad_lines='warn'
         )
     except Exception as e:
         print(f"读取文件出错: {e}")
@@ -43,9 +225,10 @@ def clean_data(input_path, output_path):
                 input_path,
                 sep='\t',
                 header=0,
-                names=column_names,
+                names=RAW_COLUMNS,
+                dtype=RAW_DTYPES,
                 engine='python',
-                error_bad_lines=False, warn_bad_lines=True
+                on_bad_lines='warn'
             )
         except Exception as e2:
             print(f"使用制表符分隔也失败: {e2}")
@@ -55,104 +238,346 @@ def clean_data(input_path, output_path):
                 input_path,
                 sep=None,
                 header=0,
-                names=column_names,
+                names=RAW_COLUMNS,
+                dtype=RAW_DTYPES,
                 engine='python',
-                error_bad_lines=False, warn_bad_lines=True
+                on_bad_lines='warn'
             )
+    return df
+
+
+@profiled()
+def clean_data(input_path, output_path, chunksize=None, store_dir=None, vocab_path=None, cube_path=None,
+               workers=None):
+    """
+    清洗南瓜价格数据
+    从原始数据生成processed_data.csv
+    指定chunksize时按块流式处理，见clean_data_chunked
+    指定store_dir时同时写出列式二进制存储，见column_store
+    指定cube_path时同时写出 City × Type × Variety × 月份 的聚合立方体，见cube
+    类别编码使用vocab_path（默认与输出文件同目录的vocabularies.json）中的稳定字典，并追加新取值
+    input_path为目录或通配符时，用workers个进程并行清洗其中的每个文件后合并，见clean_files
+    整表模式返回清洗后的DataFrame，流式模式返回None
+    """
+    vocab_path = vocab_path or vocabulary_path_for(output_path)
+    input_paths = resolve_inputs(input_path)
+    if input_paths != [input_path]:
+        return clean_files(input_paths, output_path, workers, store_dir, vocab_path, cube_path)
+    if chunksize:
+        return clean_data_chunked(input_path, output_path, chunksize, store_dir, vocab_path, cube_path)
+
+    # 1. 检测文件实际的分隔符
+    delimiter = detect_delimiter(input_path)
+
+    # 2. 读取数据 - 移除不兼容的low_memory参数
+    with step("read_csv") as record:
+        df = read_raw(input_path, delimiter)
+        record["rows_out"] = len(df)
 
-    # 4. 打印数据信息以便调试
+    # 3. 打印数据信息以便调试
     print("\n数据基本信息:")
     print(f"行数: {len(df)}")
     print(f"列数: {len(df.columns)}")
     print("前5行数据:")
     print(df.head())
 
-    required_columns = ['Date', 'City Name', 'Type', 'Low Price', 'High Price',
-                        'Package', 'Grade', 'Variety', 'Color', 'Origin']
-    # 确保只选择存在的列
-    available_columns = [col for col in required_columns if col in df.columns]
-    missing_columns = [col for col in required_columns if col not in df.columns]
-
-    if missing_columns:
-        print(f"警告: 以下列不存在: {missing_columns}")
-
-    df = df[available_columns]
-
-    # 6. 重命名列以保持一致性
-    if 'City Name' in df.columns:
-        df = df.rename(columns={'City Name': 'City'})
-
-    # 7. 转换日期格式
-    def convert_date(date_str):
-        # 确保日期是字符串类型
-        date_str = str(date_str).strip()
-        if not date_str:
-            return None
-
-
-        formats = [
-            '%Y/%m/%d',  # 2011/5/16
-            '%m/%d/%y',  # 9/24/16
-            '%m/%d/%Y',  # 9/24/2016
-            '%Y-%m-%d',  # 2011-05-16
-            '%m-%d-%y',  # 9-24-16
-            '%m-%d-%Y'  # 9-24-2016
-        ]
-
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt).date()
-            except ValueError:
-                continue
-        return None
+    # 4. 选择需要的列并重命名
+    df = select_columns(df)
 
+    # 5. 转换日期格式
     if 'Date' in df.columns:
-        df['Date'] = df['Date'].apply(convert_date)
-        df = df.dropna(subset=['Date'])
-        # 包装规格转升
-        df['Package_L'] = pd.to_numeric(
-            df['Package'].str.extract(r'([\d.]+)')[0], errors='coerce'
-        ) * 35.239  # 1 bushel ≈ 35.239 L
-
-        # 类别低频合并
-        for col in ['Grade', 'Variety', 'Color', 'Origin']:
-            top = df[col].value_counts().nlargest(10).index
-            df[col] = df[col].where(df[col].isin(top), 'Other')
-
-        # 编码
-        for col in ['Grade', 'Variety', 'Color', 'Origin']:
-            df[col] = pd.Categorical(df[col]).codes
-    # 8. 处理缺失值和异常值
+        with step("parse_dates", rows_in=len(df)) as record:
+            df['Date'] = parse_dates(df['Date'])
+            df = df.dropna(subset=['Date'])
+            record["rows_out"] = len(df)
+        # 包装规格标准化为数量、单位和升数（按规则表，每种规格只解析一次）
+        with step("normalize_packages", rows_in=len(df)):
+            df = add_package_columns(df)
+
+        # 类别低频合并并编码（使用持久化的稳定类别字典）
+        with step("encode_categories", rows_in=len(df)):
+            vocabularies = update_vocabularies(load_vocabularies(vocab_path), count_categories(df))
+            df = encode_categories(df, vocabularies)
+            save_vocabularies(vocabularies, vocab_path)
+    # 6. 处理缺失值和异常值
     if 'Low Price' in df.columns and 'High Price' in df.columns:
-        df = df.dropna(subset=['Low Price', 'High Price'])
-        df = df[(df['Low Price'] > 0) & (df['High Price'] > 0)]
-        df['Package_L'] = pd.to_numeric(df['Package'].str.extract(r'([\d.]+)')[0], errors='coerce') * 35.239
-        df['Grade'] = pd.Categorical(df['Grade']).codes
-        df = df.dropna(subset=['Low Price', 'High Price', 'Package_L'])
-        # 9. 计算平均价格
-        df['Avg Price'] = (df['Low Price'] + df['High Price']) / 2
+        with step("filter_prices", rows_in=len(df)) as record:
+            # 7. 过滤无效价格，计算平均价格和每升价格，转换为紧凑列类型（见schema）
+            df = apply_schema(finish_rows(df))
+            record["rows_out"] = len(df)
     else:
         print("警告: 缺少价格列，无法计算平均价格")
 
-    # 10. 保存处理后的数据
-    df.to_csv(output_path, index=False)
+    # 8. 保存处理后的数据
+    with step("write_csv", rows_in=len(df)):
+        df.to_csv(output_path, index=False)
     print(f"\n清洗后的数据已保存至: {output_path}")
+    if store_dir:
+        with step("write_store", rows_in=len(df)):
+            write_store(df, store_dir)
+        print(f"列式存储已保存至: {store_dir}")
+    if cube_path and 'Date' in df.columns:
+        with step("build_cube", rows_in=len(df)):
+            PriceCube.from_frame(df, vocabularies).save(cube_path)
+        print(f"聚合立方体已保存至: {cube_path}")
     print(f"处理了 {len(df)} 条记录")
     if 'Date' in df.columns:
         print(f"数据时间范围: {df['Date'].min()} 至 {df['Date'].max()}")
+    return df
+
+
+def resolve_inputs(input_path):
+    """
+    输入可以是单个文件、目录（其中的*.csv）或通配符模式，多个文件按路径排序
+    """
+    if os.path.isdir(input_path):
+        return sorted(glob.glob(os.path.join(input_path, '*.csv')))
+    if any(char in input_path for char in '*?['):
+        return sorted(glob.glob(input_path))
+    return [input_path]
+
+
+def merge_counts(counts, other):
+    """
+    把一个文件的类别频数累加到总频数中
+    """
+    for col, col_counts in other.items():
+        total = counts.setdefault(col, {})
+        for value, count in col_counts.items():
+            total[value] = total.get(value, 0) + count
+    return counts
+
+
+def clean_file(input_path):
+    """
+    多文件清洗的map步骤（在子进程中运行）：检测该文件的分隔符、检查表头、读取并做行级清洗，
+    同时统计日期有效行的类别频数（供全局的类别合并使用）
+    出错时返回错误信息而不抛出，坏文件不会中断整批处理
+    """
+    start = time.perf_counter()
+    try:
+        delimiter = detect_delimiter(input_path, verbose=False)
+        check_header(input_path, delimiter)
+        df = pd.read_csv(
+            input_path,
+            sep=delimiter,
+            header=0,
+            names=RAW_COLUMNS,
+            usecols=REQUIRED_COLUMNS,
+            dtype=RAW_DTYPES,
+            engine='c',
+            on_bad_lines='warn'
+        )
+        rows_in = len(df)
+        df = prepare_rows(df)
+        counts = count_categories(df)
+        df = finish_rows(df)
+    except Exception as e:
+        return {"file": input_path, "error": f"{type(e).__name__}: {e}"}
+    return {"file": input_path, "rows_in": rows_in, "rows_out": len(df),
+            "seconds": time.perf_counter() - start, "frame": df, "counts": counts}
+
+
+@profiled()
+def clean_files(input_paths, output_path, workers=None, store_dir=None, vocab_path=None, cube_path=None):
+    """
+    并行清洗多个原始文件（如每个城市一个CSV）并合并为一个处理后的数据集
+    map：各文件在进程池中独立读取和行级清洗，并统计类别频数；
+    reduce：在主进程中合并频数、更新类别字典，再统一编码、写出
+    无法读取或格式不对的文件会被跳过，记录在返回的DataFrame的attrs['skipped_files']中
+    """
+    vocab_path = vocab_path or vocabulary_path_for(output_path)
+    workers = workers or os.cpu_count()
+
+    # 1. map：逐文件清洗（结果保持输入文件的顺序）
+    with step("map_files", rows_in=len(input_paths)):
+        if workers > 1 and len(input_paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(input_paths))) as pool:
+                results = list(pool.map(clean_file, input_paths))
+        else:
+            results = [clean_file(path) for path in input_paths]
+
+    skipped = [{"file": r["file"], "error": r["error"]} for r in results if "error" in r]
+    results = [r for r in results if "error" not in r]
+    for r in skipped:
+        print(f"警告: 跳过文件 {r['file']}: {r['error']}")
+    if not results:
+        raise ValueError(f"没有可以清洗的输入文件（共 {len(input_paths)} 个）")
+
+    # 2. reduce：合并各文件的类别频数，更新类别字典后统一编码
+    with step("reduce", rows_in=sum(r["rows_out"] for r in results)) as record:
+        counts = {}
+        for r in results:
+            merge_counts(counts, r["counts"])
+        vocabularies = update_vocabularies(load_vocabularies(vocab_path), counts)
+        save_vocabularies(vocabularies, vocab_path)
+        # 各文件的类别列取值不同，合并后变回object，需重新转换为紧凑类型
+        df = pd.concat([r["frame"] for r in results], ignore_index=True)
+        df = apply_schema(encode_categories(df, vocabularies))
+        record["rows_out"] = len(df)
+
+    # 3. 写出
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with step("write_csv", rows_in=len(df)):
+        df.to_csv(output_path, index=False)
+    print(f"\n清洗后的数据已保存至: {output_path}")
+    if store_dir:
+        with step("write_store", rows_in=len(df)):
+            write_store(df, store_dir)
+        print(f"列式存储已保存至: {store_dir}")
+    if cube_path:
+        with step("build_cube", rows_in=len(df)):
+            PriceCube.from_frame(df, vocabularies).save(cube_path)
+        print(f"聚合立方体已保存至: {cube_path}")
+
+    print(f"处理了 {len(results)} 个文件（跳过 {len(skipped)} 个），共 {len(df)} 条记录")
+    for r in results:
+        print(f"  {os.path.basename(r['file'])}: {r['rows_in']} -> {r['rows_out']} 行, {r['seconds']:.2f}s")
+    df.attrs["skipped_files"] = skipped
+    return df
+
+
+def read_raw_chunks(input_path, delimiter, chunksize):
+    """
+    使用C解析器按块读取原始数据，只读取需要的列并指定列类型
+    至少产生一个块：没有数据行时为带有全部列的空块，流式清洗与整表清洗一样写出表头
+    """
+    options = dict(sep=delimiter, header=0, names=RAW_COLUMNS, usecols=REQUIRED_COLUMNS, dtype=RAW_DTYPES,
+                   engine='c', on_bad_lines='warn')
+    empty = True
+    with pd.read_csv(input_path, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            empty = False
+            yield chunk
+    if empty:
+        yield pd.read_csv(input_path, nrows=0, **options)
+
+
+def prepare_rows(chunk):
+    """
+    单个数据块的行级处理：选列、解析日期、包装规格标准化
+    """
+    chunk = select_columns(chunk, verbose=False)
+    chunk['Date'] = parse_dates(chunk['Date'])
+    chunk = chunk.dropna(subset=['Date'])
+    return add_package_columns(chunk)
+
+
+def add_package_columns(df):
+    """
+    添加包装规格的数量、单位和升数（Package_Qty、Package_Unit、Package_L），见package_units
+    """
+    packages = normalize_packages(df['Package'])
+    df[list(packages.columns)] = packages
+    return df
+
+
+def finish_rows(chunk):
+    """
+    过滤无效价格的行，计算平均价格和每升价格
+    按重量、按个计价等无法换算容积的包装保留，Package_L和Price_per_L为NaN
+    """
+    chunk = chunk[price_mask(chunk)]
+    chunk['Avg Price'] = (chunk['Low Price'] + chunk['High Price']) / 2
+    chunk['Price_per_L'] = chunk['Avg Price'] / chunk['Package_L']
+    return chunk
+
+
+def clean_rows(chunk):
+    """
+    只做行级清洗（不合并、不编码类别列）：日期、价格过滤、包装规格、平均价格和每升价格
+    保留下来的行与整表清洗保留的行相同，供增量统计使用
+    """
+    return finish_rows(prepare_rows(chunk))
+
+
+def clean_data_chunked(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, store_dir=None,
+                       vocab_path=None, cube_path=None):
+    """
+    流式清洗：按固定行数分块读取并追加写出，内存占用只与chunksize有关
+    第一遍只统计类别频数，第二遍清洗并写出，结果与整表清洗一致
+    """
+    vocab_path = vocab_path or vocabulary_path_for(output_path)
+    delimiter = detect_delimiter(input_path)
+
+    # 1. 第一遍：统计日期有效行的类别频数并更新类别字典
+    counts = {}
+    for chunk in read_raw_chunks(input_path, delimiter, chunksize):
+        with step("count_categories", rows_in=len(chunk)):
+            count_categories(prepare_rows(chunk), counts)
+    vocabularies = update_vocabularies(load_vocabularies(vocab_path), counts)
+    save_vocabularies(vocabularies, vocab_path)
+
+    # 2. 第二遍：逐块清洗并追加写出
+    n_written = 0
+    date_min, date_max = None, None
+    writer = ColumnStoreWriter(store_dir) if store_dir else None
+    cube = None
+    header = True
+    for chunk in read_raw_chunks(input_path, delimiter, chunksize):
+        with step("clean_chunk", rows_in=len(chunk)) as record:
+            chunk = prepare_rows(chunk)
+            chunk = apply_schema(finish_rows(encode_categories(chunk, vocabularies)))
+            record["rows_out"] = len(chunk)
+
+        with step("write_chunk", rows_in=len(chunk)):
+            chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            if writer:
+                writer.append(chunk)
+        if cube_path:
+            # 各块的立方体可直接合并
+            with step("build_cube", rows_in=len(chunk)):
+                part = PriceCube.from_frame(chunk, vocabularies)
+                cube = part if cube is None else cube.merge(part)
+        n_written += len(chunk)
+        if len(chunk):
+            lo, hi = chunk['Date'].min(), chunk['Date'].max()
+            date_min = lo if date_min is None else min(date_min, lo)
+            date_max = hi if date_max is None else max(date_max, hi)
+
+    print(f"\n清洗后的数据已保存至: {output_path}")
+    if writer:
+        writer.close()
+        print(f"列式存储已保存至: {store_dir}")
+    if cube is not None:
+        cube.save(cube_path)
+        print(f"聚合立方体已保存至: {cube_path}")
+    print(f"处理了 {n_written} 条记录")
+    print(f"数据时间范围: {date_min} 至 {date_max}")
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="清洗南瓜价格数据")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="按块流式处理时每块的行数，默认整表读入内存")
+    parser.add_argument('--no-store', action='store_true',
+                        help="只输出CSV，不写列式存储和聚合立方体")
+    parser.add_argument('--input', default=None,
+                        help="原始数据：单个文件、目录或通配符（如 'data/raw/*.csv'），默认 data/US-pumpkins.csv")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="多文件输入时并行清洗的进程数，默认CPU核数")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.enable_from_args(args)
+
     # 路径设置
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    input_path = os.path.join(base_dir, 'data', 'US-pumpkins.csv')
+    input_path = args.input or os.path.join(base_dir, 'data', 'US-pumpkins.csv')
     output_path = os.path.join(base_dir, 'data', 'processed_data.csv')
 
     # 确保输出目录存在
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     try:
-        clean_data(input_path, output_path)
+        store_dir = None if args.no_store else store_path_for(output_path)
+        cube_path = None if args.no_store else cube_path_for(output_path)
+        clean_data(input_path, output_path, chunksize=args.chunksize, store_dir=store_dir,
+                   cube_path=cube_path, workers=args.workers)
+        if profiling.is_enabled():
+            profiling.print_summary()
     except Exception as e:
         print(f"\n数据处理出错: {str(e)}")
         import traceback
@@ -0,0 +1,274 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from column_store import write_store, read_store
+from market_stats import MEASURE, weekly_prices, market_index, week_numbers, variety_labels
+
+# 对每个市场（City × Variety）的周均价序列做未来几周的预测
+# 所有序列按各自最后一周右对齐装入一个 (序列数, HISTORY_WEEKS) 的二维数组，缺失的周为NaN，
+# 三种模型都在整个数组上批量计算，不为每个序列单独建模
+MODELS = ['seasonal_naive', 'ridge', 'ets']
+DEFAULT_HORIZON = 4  # 预测的周数，也是回测留出的周数
+HISTORY_WEEKS = 156  # 每个序列使用的最近周数（3年）
+SEASON_WEEKS = 52
+AR_LAGS = 4
+RIDGE_PENALTY = 1.0  # 在标准化后的序列上
+ETS_ALPHAS = np.linspace(0.1, 0.9, 9)
+
+
+def forecast_dir_for(csv_path):
+    """
+    处理后CSV对应的预测表目录，例如 data/processed_data.csv -> data/processed_data_forecasts
+    """
+    return os.path.splitext(csv_path)[0] + "_forecasts"
+
+
+def check_window(horizon, history):
+    """
+    检查预测周数和历史周数：回测留出horizon周后，训练区间至少要有AR_LAGS+1周才能构造一个滞后样本
+    """
+    if horizon < 1:
+        raise ValueError(f"horizon 须不小于1，实际为 {horizon}")
+    if history - horizon < AR_LAGS + 1:
+        raise ValueError(f"history 须不小于 horizon + {AR_LAGS + 1}（{horizon + AR_LAGS + 1}），实际为 {history}")
+
+
+def pack_series(weekly, history=HISTORY_WEEKS):
+    """
+    把weekly_prices的结果装入右对齐的二维数组：第i行最后一列是市场i有数据的最后一周，
+    往前每列早一周，没有数据的周为NaN；更早的周舍去
+    返回 (数组, 市场表)，市场表每行一个序列：City、Variety、最后一周Week和有数据的周数
+    """
+    market, starts = market_index(weekly)
+    week = week_numbers(weekly['Week'].to_numpy())
+    ends = np.r_[starts[1:], len(week)]
+    last = week[ends - 1]
+    column = history - 1 - (last[market] - week)
+    keep = column >= 0
+    values = np.full((len(starts), history), np.nan)
+    values[market[keep], column[keep]] = weekly['price'].to_numpy()[keep]
+    series = pd.DataFrame({
+        'City': weekly['City'].iloc[starts].reset_index(drop=True),
+        'Variety': weekly['Variety'].to_numpy()[starts],
+        'Week': weekly['Week'].to_numpy()[ends - 1],
+        'weeks': np.bincount(market[keep], minlength=len(starts)),
+    })
+    return values, series
+
+
+def forward_fill(values):
+    """
+    沿时间轴（列）向前填充NaN，每行开头的NaN保持不变
+    """
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(len(values))[:, None], index]
+
+
+def seasonal_naive(values, horizon=DEFAULT_HORIZON, season=SEASON_WEEKS):
+    """
+    季节朴素预测：第k步取一年前同一周（截至该周最近一次的价格）；一年前还没有数据时取最后一个价格
+    """
+    filled = forward_fill(values)
+    columns = values.shape[1] + np.arange(horizon) - season
+    seasonal = np.where(columns >= 0, filled[:, np.clip(columns, 0, None)], np.nan)
+    return np.where(np.isnan(seasonal), filled[:, -1:], seasonal)
+
+
+def ridge_ar(values, horizon=DEFAULT_HORIZON, lags=AR_LAGS, penalty=RIDGE_PENALTY):
+    """
+    每个序列一个岭回归AR(lags)模型：序列先按自身的均值和标准差标准化，
+    用连续lags周都有数据的点构造滞后矩阵，所有序列的正规方程 (XᵀX + λI)β = Xᵀy 一次批量求解；
+    预测时逐步递推，缺失的滞后值用向前填充的值（开头没有数据时为均值）
+    """
+    # 回测时可能有序列在训练区间内没有数据，均值记为0，不用nanmean避免空切片警告
+    observed = ~np.isnan(values)
+    count = np.maximum(observed.sum(axis=1, keepdims=True), 1)
+    mean = np.where(observed, values, 0.0).sum(axis=1, keepdims=True) / count
+    std = np.sqrt(np.where(observed, (values - mean) ** 2, 0.0).sum(axis=1, keepdims=True) / count)
+    std = np.where(std == 0, 1.0, std)
+    z = (values - mean) / std
+
+    windows = sliding_window_view(z, lags + 1, axis=1)
+    X, y = windows[..., :-1], windows[..., -1]
+    valid = ~np.isnan(windows).any(axis=-1)
+    X = np.where(valid[..., None], X, 0.0)
+    y = np.where(valid, y, 0.0)
+    gram = np.einsum('nti,ntj->nij', X, X) + penalty * np.eye(lags)
+    beta = np.linalg.solve(gram, np.einsum('nti,nt->ni', X, y)[..., None])[..., 0]
+
+    state = np.nan_to_num(forward_fill(z)[:, -lags:])
+    steps = []
+    for _ in range(horizon):
+        step = (state * beta).sum(axis=1)
+        steps.append(step)
+        state = np.column_stack([state[:, 1:], step])
+    return np.column_stack(steps) * std + mean
+
+
+def exponential_smoothing(values, horizon=DEFAULT_HORIZON, alphas=ETS_ALPHAS):
+    """
+    简单指数平滑（ETS(A,N,N)）：所有序列和所有候选α同时沿时间递推，
+    每个序列取一步预测平方误差最小的α，预测值为最后的水平；缺失的周水平不变
+    返回 (预测, 各序列选用的α)
+    """
+    n_series, n_weeks = values.shape
+    observed = ~np.isnan(values)
+    first = np.argmax(observed, axis=1)
+    level = np.tile(values[np.arange(n_series), first], (len(alphas), 1))
+    sse = np.zeros((len(alphas), n_series))
+    alpha = alphas[:, None]
+    for t in range(n_weeks):
+        error = values[:, t] - level
+        counted = observed[:, t] & (t > first)
+        sse += np.where(counted, error * error, 0.0)
+        level = np.where(observed[:, t], level + alpha * error, level)
+    best = np.argmin(sse, axis=0)
+    final = level[best, np.arange(n_series)]
+    return np.repeat(final[:, None], horizon, axis=1), alphas[best]
+
+
+def predict_all(values, horizon=DEFAULT_HORIZON):
+    """
+    三种模型对所有序列的预测，{模型名: (序列数, horizon)数组}
+    """
+    return {
+        'seasonal_naive': seasonal_naive(values, horizon),
+        'ridge': ridge_ar(values, horizon),
+        'ets': exponential_smoothing(values, horizon)[0],
+    }
+
+
+def backtest(values, horizon=DEFAULT_HORIZON):
+    """
+    留出每个序列最后horizon周，用之前的数据预测，在留出期有数据的周上计算各模型的误差；
+    训练区间内没有数据的序列不计分，各模型在同一组点上比较
+    返回 (整体误差表 {模型: MAE/RMSE/MAPE/点数}, 各序列误差最小的模型)
+    """
+    train, actual = values[:, :-horizon], values[:, -horizon:]
+    forecasts = predict_all(train, horizon)
+    scored = ~np.isnan(actual) & ~np.isnan(train).all(axis=1, keepdims=True)
+    errors, series_mae = {}, []
+    for name in MODELS:
+        error = forecasts[name] - actual
+        abs_error = np.where(scored, np.abs(error), 0.0)
+        points = scored.sum()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ape = np.where(scored & (actual != 0), abs_error / np.abs(actual), 0.0)
+            errors[name] = {
+                "mae": float(abs_error.sum() / points),
+                "rmse": float(np.sqrt((abs_error ** 2).sum() / points)),
+                "mape": float(ape.sum() / (scored & (actual != 0)).sum()),
+                "points": int(points),
+            }
+            series_mae.append(np.where(scored.any(axis=1), abs_error.sum(axis=1) / scored.sum(axis=1), np.inf))
+    best = np.array(MODELS)[np.argmin(np.vstack(series_mae), axis=0)]
+    return errors, best
+
+
+def forecast_table(values, series, best_models, horizon=DEFAULT_HORIZON):
+    """
+    预测表：每个序列horizon行（City、Variety、目标周、步数），各模型的预测，
+    以及回测中该序列误差最小的模型（best_model）和它的预测（forecast）
+    """
+    forecasts = predict_all(values, horizon)
+    n_series = len(series)
+    rows = np.repeat(np.arange(n_series), horizon)
+    step = np.tile(np.arange(1, horizon + 1), n_series)
+    table = pd.DataFrame({
+        'City': series['City'].iloc[rows].reset_index(drop=True),
+        'Variety': series['Variety'].to_numpy()[rows],
+        'Week': series['Week'].to_numpy()[rows] + (step * 7).astype('timedelta64[D]'),
+        'horizon': step.astype(np.int8),
+    })
+    for name in MODELS:
+        table[name] = forecasts[name].ravel()
+    choice = np.searchsorted(np.array(sorted(MODELS)), best_models)
+    stacked = np.stack([forecasts[name] for name in sorted(MODELS)])
+    table['best_model'] = pd.Categorical(best_models[rows], categories=MODELS)
+    table['forecast'] = stacked[choice[rows], rows, step - 1]
+    return table
+
+
+def forecast_markets(df, vocabularies=None, out_dir=None, horizon=DEFAULT_HORIZON, history=HISTORY_WEEKS):
+    """
+    对每个市场（City × Variety）预测未来horizon周的周均价，返回报告中的forecast部分；
+    指定out_dir时写出完整的预测表（列式存储）
+    """
+    check_window(horizon, history)
+    if not {'Date', 'City', 'Variety', MEASURE}.issubset(df.columns):
+        return "缺少日期、城市、品种或价格列"
+    weekly = weekly_prices(df)
+    section = {"horizon_weeks": horizon, "history_weeks": history, "models": MODELS}
+    if weekly.empty:
+        return dict(section, series=0)
+
+    start = time.perf_counter()
+    values, series = pack_series(weekly, history)
+    errors, best_models = backtest(values, horizon)
+    table = forecast_table(values, series, best_models, horizon)
+    section.update({
+        "series": len(series),
+        "fit_seconds": time.perf_counter() - start,
+        "backtest": errors,
+        "best_model_counts": {name: int((best_models == name).sum()) for name in MODELS},
+    })
+    # 数据最多的几个市场的下一周预测
+    top = np.argsort(-series['weeks'].to_numpy(), kind='stable')[:10]
+    first_step = table.iloc[top * horizon]
+    section["next_week"] = [
+        {
+            "city": str(row.City),
+            "variety": variety,
+            "week": row.Week.strftime('%Y-%m-%d'),
+            "best_model": row.best_model,
+            "forecast": float(row.forecast),
+        }
+        for row, variety in zip(first_step.itertuples(), variety_labels(first_step['Variety'].to_numpy(), vocabularies))
+    ]
+    if out_dir:
+        save_forecasts(table, out_dir)
+        section["table"] = out_dir
+    return section
+
+
+def save_forecasts(table, out_dir):
+    """
+    以列式存储写出预测表：浮点列为float32，best_model存为MODELS中的序号，可用load_forecasts读取
+    """
+    floats = table.select_dtypes('float64').columns
+    table = table.astype({col: np.float32 for col in floats})
+    write_store(table.assign(best_model=table['best_model'].cat.codes.astype(np.int8)), out_dir)
+
+
+def load_forecasts(out_dir):
+    table = read_store(out_dir)
+    table['best_model'] = pd.Categorical.from_codes(table['best_model'], categories=MODELS)
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from configuration import PROCESSED_DATA_PATH, VOCABULARY_PATH
+    from data_analysis import load_data
+    from vocabulary import load_vocabularies
+
+    parser = argparse.ArgumentParser(description="批量预测各市场（City × Variety）未来几周的价格")
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help="预测周数（也是回测留出的周数）")
+    parser.add_argument('--history', type=int, default=HISTORY_WEEKS, help="每个序列使用的最近周数")
+    args = parser.parse_args()
+    try:
+        check_window(args.horizon, args.history)
+    except ValueError as error:
+        parser.error(str(error))
+
+    df = load_data(PROCESSED_DATA_PATH, ['Date', 'City', 'Variety', MEASURE])
+    out_dir = forecast_dir_for(PROCESSED_DATA_PATH)
+    section = forecast_markets(df, load_vocabularies(VOCABULARY_PATH), out_dir, args.horizon, args.history)
+    print(json.dumps(section, indent=4, ensure_ascii=False))
+    print(f"预测表已保存至: {out_dir}")
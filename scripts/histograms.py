@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+# 细粒度直方图的桶数：分位数和箱线图的须的误差不超过一个桶宽（最大价格/FINE_BINS的2倍以内）
+FINE_BINS = 2048
+# 初始桶宽，之后按需加倍（取2的幂，不同直方图的桶边界总能对齐）
+INITIAL_WIDTH = 2.0 ** -10
+
+
+class PriceHistogram:
+    """
+    按组（如Type）累积的价格细粒度直方图，一次流式遍历即可得到直方图、分箱KDE和近似分位数
+    桶从0开始、等宽；遇到超出范围的价格时桶宽加倍（相邻两桶合并，计数保持精确），无需预先知道最大值
+    同时精确记录每组的行数、最小值、最大值、和与平方和；两个直方图可合并（见merge）
+    """
+
+    def __init__(self, bins=FINE_BINS, width=INITIAL_WIDTH):
+        self.bins = bins
+        self.width = width
+        self.labels = []
+        self._codes = {}
+        self.counts = np.zeros((0, bins), dtype=np.int64)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self.total = np.zeros(0)
+        self.sumsq = np.zeros(0)
+
+    def _grow(self, upper):
+        # 桶宽加倍直到覆盖upper：每次把相邻两桶合并到前半部分
+        while upper >= self.width * self.bins:
+            merged = self.counts.reshape(len(self.counts), self.bins // 2, 2).sum(axis=2)
+            self.counts = np.concatenate([merged, np.zeros_like(merged)], axis=1)
+            self.width *= 2
+
+    def _group_codes(self, groups):
+        # 缺失的分组标签统一记为None一组
+        codes, uniques = pd.factorize(groups)
+        labels = list(uniques) + ([None] if (codes < 0).any() else [])
+        ids = np.array([self._codes.setdefault(label, len(self._codes)) for label in labels], dtype=np.int64)
+        if len(self._codes) > len(self.labels):
+            n_new = len(self._codes) - len(self.labels)
+            self.labels.extend(list(self._codes)[len(self.labels):])
+            self.counts = np.vstack([self.counts, np.zeros((n_new, self.bins), dtype=np.int64)])
+            self.min = np.r_[self.min, np.full(n_new, np.inf)]
+            self.max = np.r_[self.max, np.full(n_new, -np.inf)]
+            self.total = np.r_[self.total, np.zeros(n_new)]
+            self.sumsq = np.r_[self.sumsq, np.zeros(n_new)]
+        return ids[codes]
+
+    def update(self, prices, groups):
+        """
+        累加一块数据：prices为价格数组，groups为等长的分组标签（缺失值也作为一组）
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = ~np.isnan(prices) & (prices >= 0)
+        prices = prices[valid]
+        if not len(prices):
+            return self
+        group = self._group_codes(np.asarray(groups, dtype=object)[valid])
+        self._grow(prices.max())
+        n_groups = len(self.labels)
+        cells = group * self.bins + np.minimum((prices / self.width).astype(np.int64), self.bins - 1)
+        self.counts += np.bincount(cells, minlength=n_groups * self.bins).reshape(n_groups, self.bins)
+        self.total += np.bincount(group, weights=prices, minlength=n_groups)
+        self.sumsq += np.bincount(group, weights=prices * prices, minlength=n_groups)
+        by_group = pd.Series(prices).groupby(group)
+        lo, hi = by_group.min(), by_group.max()
+        self.min[lo.index] = np.minimum(self.min[lo.index], lo.to_numpy())
+        self.max[hi.index] = np.maximum(self.max[hi.index], hi.to_numpy())
+        return self
+
+    def merge(self, other):
+        """
+        合并另一个直方图（例如另一个文件或数据块的结果）
+        """
+        self._grow(other.width * other.bins - other.width / 2)
+        for label in other.labels:
+            self._group_codes(np.array([label], dtype=object))
+        ids = np.array([self._codes[label] for label in other.labels], dtype=np.int64)
+        factor = int(round(self.width / other.width))
+        counts = other.counts.reshape(len(other.labels), self.bins // factor, factor).sum(axis=2)
+        self.counts[ids, :counts.shape[1]] += counts
+        self.min[ids] = np.minimum(self.min[ids], other.min)
+        self.max[ids] = np.maximum(self.max[ids], other.max)
+        self.total[ids] += other.total
+        self.sumsq[ids] += other.sumsq
+        return self
+
+    def _rows(self, groups=None):
+        if groups is None:
+            return np.arange(len(self.labels))
+        return np.array([self._codes[label] for label in groups if label in self._codes], dtype=np.int64)
+
+    def group_counts(self):
+        """
+        各组的行数，按行数从多到少排序的Series
+        """
+        return pd.Series(self.counts.sum(axis=1), index=pd.Index(self.labels, dtype=object)).sort_values(
+            ascending=False, kind='stable')
+
+    def histogram(self, n_bins=30, groups=None):
+        """
+        在 [最小值, 最大值] 上等分为n_bins个展示桶，细桶按中心点落入展示桶
+        返回 (边界, 计数)
+        """
+        rows = self._rows(groups)
+        counts = self.counts[rows].sum(axis=0)
+        lo, hi = self.min[rows].min(), self.max[rows].max()
+        edges = np.linspace(lo, hi, n_bins + 1) if hi > lo else np.array([lo - 0.5, lo + 0.5])
+        centers = (np.arange(self.bins) + 0.5) * self.width
+        index = np.clip(np.searchsorted(edges, centers, side='right') - 1, 0, len(edges) - 2)
+        return edges, np.bincount(index, weights=counts, minlength=len(edges) - 1)
+
+    def kde(self, groups=None, grid_size=200):
+        """
+        分箱KDE：在细桶计数上做高斯平滑，带宽按Scott规则（n^(-1/5)·标准差，与scipy/seaborn一致）
+        计算量只与桶数有关；返回 (x, 密度)，x覆盖 [最小值, 最大值]
+        """
+        rows = self._rows(groups)
+        counts = self.counts[rows].sum(axis=0).astype(np.float64)
+        n = counts.sum()
+        mean = self.total[rows].sum() / n
+        std = np.sqrt(max(self.sumsq[rows].sum() / n - mean * mean, 0.0) * n / max(n - 1, 1))
+        bandwidth = max(std * n ** (-1 / 5), self.width)
+        sigma = bandwidth / self.width
+        offsets = np.arange(-int(np.ceil(4 * sigma)), int(np.ceil(4 * sigma)) + 1)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        # 取完整卷积中与细桶对齐的部分（核比桶数还长时mode='same'的长度不对）
+        smoothed = np.convolve(counts, kernel / kernel.sum())[len(offsets) // 2:][:self.bins]
+        centers = (np.arange(self.bins) + 0.5) * self.width
+        x = np.linspace(self.min[rows].min(), self.max[rows].max(), grid_size)
+        return x, np.interp(x, centers, smoothed) / (n * self.width)
+
+    def quantiles(self, q, group):
+        """
+        由累计计数在桶内线性插值得到的近似分位数，限制在该组的最小/最大值之内
+        按秩计与精确分位数相差不超过一个细桶中的行数；取值离散时结果落在相邻两个取值之间
+        """
+        row = self._codes[group]
+        cumulative = np.r_[0, np.cumsum(self.counts[row])]
+        edges = np.arange(self.bins + 1) * self.width
+        values = np.interp(np.asarray(q) * cumulative[-1], cumulative, edges)
+        return np.clip(values, self.min[row], self.max[row])
+
+    def box_stats(self, groups):
+        """
+        各组的箱线图统计量（可直接传给matplotlib的Axes.bxp）：中位数、四分位数，
+        须为1.5倍四分位距内最远的非空细桶（精确到一个桶宽），不画离群点
+        """
+        stats = []
+        for group in groups:
+            row = self._codes[group]
+            q1, med, q3 = self.quantiles([0.25, 0.5, 0.75], group)
+            iqr = q3 - q1
+            nonempty = np.flatnonzero(self.counts[row]) * self.width
+            inside = nonempty[(nonempty + self.width >= q1 - 1.5 * iqr) & (nonempty <= q3 + 1.5 * iqr)]
+            whislo = max(inside.min(), self.min[row]) if len(inside) else q1
+            whishi = min(inside.max() + self.width, self.max[row]) if len(inside) else q3
+            stats.append({"label": str(group), "med": med, "q1": q1, "q3": q3,
+                          "whislo": min(whislo, q1), "whishi": max(whishi, q3),
+                          "count": int(self.counts[row].sum())})
+        return stats
+
+
+def iter_chunks(df, chunk_rows=1_000_000):
+    """
+    按行切片遍历数据表（视图，不复制）
+    """
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def price_histogram(chunks, price='Avg Price', group='Type'):
+    """
+    一次遍历数据块，累积按group分组的价格直方图
+    """
+    histogram = PriceHistogram()
+    for chunk in chunks:
+        groups = chunk[group].to_numpy() if group in chunk.columns else np.full(len(chunk), None)
+        histogram.update(chunk[price].to_numpy(), groups)
+    return histogram
@@ -0,0 +1,321 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from configuration import RAW_DATA_PATH, REPORT_PATH, INGEST_STATE_PATH
+from data_cleaning import (RAW_COLUMNS, RAW_DTYPES, REQUIRED_COLUMNS, DEFAULT_CHUNKSIZE,
+                           detect_delimiter, clean_rows)
+from utility import ensure_dir, save_json
+
+PRICE_COLUMNS = ['Low Price', 'High Price', 'Avg Price']
+
+# 判断文件是否只被追加时比较的字节数
+FINGERPRINT_BYTES = 4096
+
+# 增量模式不重算的章节，有新增数据时标记为过期
+STALE_SECTIONS = ['market_statistics', 'forecast', 'machine_learning']
+
+
+class PriceMoments:
+    """
+    可合并的价格统计量，占用内存与类别基数无关（近似统计的概要使用，见sketches）
+    价格列保存样本数、均值和离差积矩阵（Chan并行算法合并，数值上比直接累加平方和稳定），
+    以及最小/最大值、日期范围和按月的价格和与计数
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = np.zeros(len(PRICE_COLUMNS))
+        self.comoment = np.zeros((len(PRICE_COLUMNS), len(PRICE_COLUMNS)))
+        self.min = np.full(len(PRICE_COLUMNS), np.inf)
+        self.max = np.full(len(PRICE_COLUMNS), -np.inf)
+        self.start_date = None
+        self.end_date = None
+        # 月份键（年*12+月-1） -> [Avg Price之和, 行数]
+        self.monthly = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        由清洗后的行计算一批统计量
+        """
+        stats = cls()
+        if not len(df):
+            return stats
+        values = df[PRICE_COLUMNS].to_numpy(dtype=np.float64)
+        stats.count = len(values)
+        stats.mean = values.mean(axis=0)
+        centered = values - stats.mean
+        stats.comoment = centered.T @ centered
+        stats.min = values.min(axis=0)
+        stats.max = values.max(axis=0)
+
+        dates = pd.to_datetime(df['Date'])
+        stats.start_date, stats.end_date = dates.min(), dates.max()
+
+        keys = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+        offset = keys.min()
+        sums = np.bincount(keys - offset, weights=values[:, 2])
+        counts = np.bincount(keys - offset)
+        for i in np.flatnonzero(counts):
+            stats.monthly[int(offset + i)] = [float(sums[i]), int(counts[i])]
+        return stats
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            # 复制而不是共享other的数组和月度列表，之后的合并不能改动other
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.comoment = other.comoment.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            self.start_date, self.end_date = other.start_date, other.end_date
+            self.monthly = {key: list(value) for key, value in other.monthly.items()}
+            return self
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * other.count / n
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.count * other.count / n
+        self.count = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.start_date = min(self.start_date, other.start_date)
+        self.end_date = max(self.end_date, other.end_date)
+        for key, (total, count) in other.monthly.items():
+            current = self.monthly.setdefault(key, [0.0, 0])
+            current[0] += total
+            current[1] += count
+        return self
+
+    def update(self, df):
+        return self.merge(type(self).from_frame(df))
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean.tolist(),
+            "comoment": self.comoment.tolist(),
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+            "start_date": self.start_date.isoformat() if self.count else None,
+            "end_date": self.end_date.isoformat() if self.count else None,
+            "monthly": {str(key): value for key, value in sorted(self.monthly.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        if not data or not data["count"]:
+            return stats
+        stats.count = data["count"]
+        stats.mean = np.array(data["mean"])
+        stats.comoment = np.array(data["comoment"])
+        stats.min = np.array(data["min"])
+        stats.max = np.array(data["max"])
+        stats.start_date = pd.Timestamp(data["start_date"])
+        stats.end_date = pd.Timestamp(data["end_date"])
+        stats.monthly = {int(key): value for key, value in data["monthly"].items()}
+        return stats
+
+    def report_sections(self):
+        """
+        生成与perform_analysis相同格式的报告章节；概览中不含不同取值数
+        """
+        if not self.count:
+            return {}
+        variance = np.diag(self.comoment)
+        std = np.sqrt(variance / (self.count - 1)) if self.count > 1 else np.full(len(PRICE_COLUMNS), np.nan)
+        corr = self.comoment / np.sqrt(np.outer(variance, variance))
+        np.fill_diagonal(corr, 1.0)
+
+        # 与resample('M')一致：首末月份之间没有数据的月份为NaN
+        first, last = min(self.monthly), max(self.monthly)
+        months, prices = [], []
+        for key in range(first, last + 1):
+            months.append(f"{key // 12:04d}-{key % 12 + 1:02d}")
+            total, count = self.monthly.get(key, [0.0, 0])
+            prices.append(total / count if count else float('nan'))
+
+        return {
+            "overview": {
+                "total_records": self.count,
+                "start_date": self.start_date.strftime('%Y-%m-%d'),
+                "end_date": self.end_date.strftime('%Y-%m-%d')
+            },
+            "price_statistics": {
+                "low_price_mean": float(self.mean[0]),
+                "high_price_mean": float(self.mean[1]),
+                "avg_price_mean": float(self.mean[2]),
+                "avg_price_std": float(std[2]),
+                "avg_price_min": float(self.min[2]),
+                "avg_price_max": float(self.max[2])
+            },
+            "price_correlation": {
+                col: {row: float(corr[j, i]) for j, row in enumerate(PRICE_COLUMNS)}
+                for i, col in enumerate(PRICE_COLUMNS)
+            },
+            "monthly_price_trend": {"months": months, "prices": prices}
+        }
+
+
+class RunningStats(PriceMoments):
+    """
+    可合并的充分统计量，用于增量更新分析报告：PriceMoments加上城市/类型取值集合（精确的不同取值数）
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.cities = set()
+        self.types = set()
+
+    @classmethod
+    def from_frame(cls, df):
+        stats = super().from_frame(df)
+        if len(df):
+            stats.cities = set(df['City'].dropna().unique())
+            stats.types = set(df['Type'].dropna().unique())
+        return stats
+
+    def merge(self, other):
+        # 并集生成新集合，合并进空对象时也不与other共享
+        self.cities = self.cities | other.cities
+        self.types = self.types | other.types
+        return super().merge(other)
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["cities"] = sorted(self.cities)
+        data["types"] = sorted(self.types)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = super().from_dict(data)
+        if stats.count:
+            stats.cities = set(data["cities"])
+            stats.types = set(data["types"])
+        return stats
+
+    def report_sections(self):
+        sections = super().report_sections()
+        if sections:
+            sections["overview"]["unique_cities"] = len(self.cities)
+            sections["overview"]["unique_types"] = len(self.types)
+        return sections
+
+
+def _fingerprint(f, offset):
+    # 已处理部分末尾若干字节的哈希，用于确认文件只被追加而没有被改写
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return hashlib.sha256(f.read(offset - start)).hexdigest()
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {"files": {}, "stats": None}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_state(state, state_path):
+    ensure_dir(os.path.dirname(state_path))
+    tmp_path = state_path + ".tmp"
+    save_json(state, tmp_path)
+    os.replace(tmp_path, state_path)
+
+
+def ingest_file(path, entry, stats, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    清洗文件中上次处理位置之后新增的行并合并进stats
+    返回新的文件记录（处理到的字节位置和指纹）以及新增的原始行数
+    追加的数据需要从新的一行开始
+    """
+    offset = entry["offset"] if entry else 0
+    n_raw = 0
+    with open(path, 'rb') as f:
+        if offset and _fingerprint(f, offset) != entry["fingerprint"]:
+            raise ValueError(f"{path} 已处理的部分被改写，无法增量更新，请使用 --reset 全量重算")
+        if offset == os.path.getsize(path):
+            return entry, 0
+
+        delimiter = detect_delimiter(path)
+        f.seek(offset)
+        reader = pd.read_csv(
+            f,
+            sep=delimiter,
+            header=0 if offset == 0 else None,
+            names=RAW_COLUMNS,
+            usecols=REQUIRED_COLUMNS,
+            dtype=RAW_DTYPES,
+            encoding='utf-8',
+            chunksize=chunksize,
+            on_bad_lines='warn'
+        )
+        for chunk in reader:
+            n_raw += len(chunk)
+            stats.update(clean_rows(chunk))
+        offset = f.tell()
+        fingerprint = _fingerprint(f, offset)
+    return {"offset": offset, "fingerprint": fingerprint}, n_raw
+
+
+def update_report(stats, report_path, appended=0):
+    """
+    用统计量替换报告中的概览、价格统计、相关性和月度趋势
+    有新增记录时，市场统计、预测和模型章节仍描述旧数据，替换为过期说明
+    """
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+    report.update(stats.report_sections())
+    if appended:
+        for section in STALE_SECTIONS:
+            if section in report:
+                report[section] = f"数据已增量更新（新增 {appended} 条记录），该章节未重算，请运行完整分析"
+    report.setdefault("machine_learning", "增量模式不训练模型，请运行完整分析")
+    ensure_dir(os.path.dirname(report_path))
+    save_json(report, report_path)
+    return report
+
+
+def ingest(paths, state_path=INGEST_STATE_PATH, report_path=REPORT_PATH,
+           chunksize=DEFAULT_CHUNKSIZE, reset=False):
+    """
+    增量更新：只清洗各原始文件中新增的行，与已保存的统计量合并后更新报告
+    处理耗时只与新增数据量有关；结果与全量重算在浮点误差范围内一致
+    processed_data.csv及类别编码仍由完整清洗生成
+    """
+    state = {"files": {}, "stats": None} if reset else load_state(state_path)
+    stats = RunningStats.from_dict(state["stats"])
+    before = stats.count
+
+    for path in paths:
+        key = os.path.abspath(path)
+        entry, n_raw = ingest_file(path, state["files"].get(key), stats, chunksize)
+        state["files"][key] = entry
+        print(f"{path}: 新增 {n_raw} 行原始数据")
+
+    state["stats"] = stats.to_dict()
+    report = update_report(stats, report_path, stats.count - before)
+    save_state(state, state_path)
+    print(f"分析报告已增量更新至: {report_path}（累计 {stats.count} 条记录）")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="增量更新南瓜价格分析报告")
+    parser.add_argument('paths', nargs='*', default=[RAW_DATA_PATH], help="原始数据文件")
+    parser.add_argument('--reset', action='store_true', help="丢弃已保存的统计量，全量重算")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    ingest(args.paths, chunksize=args.chunksize, reset=args.reset)
@@ -1,45 +1,26 @@
-from configuration import *
-from utility import save_json, ensure_dir  # ← 添加 ensure_dir
-from data_analysis import *
-from model import train_and_evaluate
-from evaluate import plot_predictions
+import os
 import sys
 # 将 scripts 目录加入系统路径，避免模块找不到
 sys.path.insert(0, os.path.dirname(__file__))
 
-from configuration import *
-from utility import save_json
-from data_analysis import *
-from model import train_and_evaluate
-from evaluate import plot_predictions
+from configuration import PROCESSED_DATA_PATH, REPORT_PATH, RESULT_CACHE_DIR
 
-def run_analysis():
-    ensure_dir(os.path.dirname(REPORT_PATH))
-    df = load_data(PROCESSED_DATA_PATH)
 
-    results = {
-        "overview": summarize_data(df),
-        "price_statistics": price_statistics(df),
-        "price_correlation": price_correlation(df),
-        "monthly_price_trend": monthly_price_trend(df)
-    }
+def run_analysis(use_cache=True):
+    """
+    生成分析报告（analysis.perform_analysis，各章节由analysis.cached_report计算）
+    use_cache为True时各章节和训练好的模型按处理后数据的内容哈希、参数和代码指纹缓存在RESULT_CACHE_DIR，
+    全部命中时不读取数据；报告的cache部分记录命中/未命中次数
+    """
+    from analysis import perform_analysis
+    from result_cache import ResultCache
 
-    if {'City', 'Type', 'Avg Price'}.issubset(df.columns) and len(df) > 100:
-        try:
-            ml_results = train_and_evaluate(df)
-            results["machine_learning"] = ml_results
-            plot_predictions(
-                ml_results["sample_predictions"]["actual"],
-                ml_results["sample_predictions"]["predicted"],
-                os.path.join(os.path.dirname(PROCESSED_DATA_PATH), "figures", "price_predictions.png")
-            )
-        except Exception as e:
-            results["machine_learning"] = f"模型训练失败: {str(e)}"
-    else:
-        results["machine_learning"] = "缺少必要列或数据量不足"
+    cache = ResultCache(RESULT_CACHE_DIR) if use_cache else None
+    return perform_analysis(PROCESSED_DATA_PATH, REPORT_PATH, cache=cache)
 
-    save_json(results, REPORT_PATH)
-    print("分析完成，结果已保存至:", REPORT_PATH)
 
 if __name__ == "__main__":
-    run_analysis()
\ No newline at end of file
+    # 与 python scripts/cli.py all 相同，参数见cli.py
+    from cli import main
+
+    main(['all'] + sys.argv[1:])
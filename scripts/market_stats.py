@@ -0,0 +1,256 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_store import write_store, read_store
+
+# 市场 = City × Variety；价格先按自然周取平均，再在每个市场的周序列上计算滚动统计
+MEASURE = 'Avg Price'
+DEFAULT_WINDOW = 4  # 滚动窗口（周），按日历周计算，没有数据的周不补齐
+DEFAULT_SPAN = 4  # EWMA的跨度（按有数据的周计）
+# 南瓜季从7月开始：季节内周序号从7月1日起算，跨年的一季归入开始的年份
+SEASON_START_MONTH = 7
+TOP_N_MARKETS = 10
+
+
+def market_stats_dir_for(csv_path):
+    """
+    处理后CSV对应的市场统计表目录，例如 data/processed_data.csv -> data/processed_data_markets
+    """
+    return os.path.splitext(csv_path)[0] + "_markets"
+
+
+def week_numbers(dates):
+    """
+    以周一开始的周序号：1970-01-01是周四，加3天后整除7
+    """
+    return (dates.astype('datetime64[D]').astype(np.int64) + 3) // 7
+
+
+def weekly_prices(df):
+    """
+    把行级数据聚合为每个市场每周一个点：周均价和行数
+    市场和 (市场, 周) 都用哈希分组（pd.factorize）编号、bincount聚合，耗时与行数成线性；
+    只对聚合后的点排序，返回按 (市场, 周) 排序的DataFrame，Week为该周周一的日期
+    """
+    prices = df[MEASURE].to_numpy(dtype=np.float64)
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnan(prices) & ~np.isnat(dates) & df['City'].notna().to_numpy()
+    city_codes, cities = pd.factorize(df['City'].to_numpy()[valid], sort=True)
+    varieties = np.asarray(df['Variety'].to_numpy()[valid], dtype=np.int64)
+    weeks = week_numbers(dates[valid])
+    prices = prices[valid]
+
+    n_varieties = varieties.max() + 1 if len(varieties) else 1
+    first_week = weeks.min() if len(weeks) else 0
+    n_weeks = weeks.max() - first_week + 1 if len(weeks) else 1
+    point_ids, points = pd.factorize((city_codes * n_varieties + varieties) * n_weeks + (weeks - first_week))
+    sums = np.bincount(point_ids, weights=prices, minlength=len(points))
+    rows = np.bincount(point_ids, minlength=len(points))
+
+    order = np.argsort(points, kind='stable')
+    points, sums, rows = points[order], sums[order], rows[order]
+    market, week = np.divmod(points, n_weeks)
+    return pd.DataFrame({
+        'City': pd.Categorical.from_codes(market // n_varieties, categories=pd.Index(cities, dtype=object)),
+        'Variety': (market % n_varieties).astype(np.int16),
+        'Week': ((week + first_week) * 7 - 3).astype('datetime64[D]').astype('datetime64[ns]'),
+        'price': sums / np.maximum(rows, 1),
+        'rows': rows,
+    })
+
+
+def market_index(weekly):
+    """
+    每个点所在市场的编号和各市场第一个点的位置（weekly_prices的结果已按市场排序）
+    """
+    city = weekly['City'].cat.codes.to_numpy()
+    variety = weekly['Variety'].to_numpy()
+    new_market = np.r_[True, (city[1:] != city[:-1]) | (variety[1:] != variety[:-1])]
+    return np.cumsum(new_market) - 1, np.flatnonzero(new_market)
+
+
+def rolling_statistics(weekly, window=DEFAULT_WINDOW, span=DEFAULT_SPAN):
+    """
+    在所有市场的周序列上同时计算滚动均值、滚动标准差、波动率（标准差/均值）和EWMA
+    滚动窗口为最近window个日历周 (t-window, t]：各市场的点拼接成一个有序数组，
+    窗口左端用searchsorted一次求出，窗口和由前缀和相减得到（先减去市场均值，减小前缀和的舍入误差）；
+    EWMA用pandas的分组ewm，所有市场在同一个内核中计算
+    """
+    market, _ = market_index(weekly)
+    price = weekly['price'].to_numpy()
+    week = week_numbers(weekly['Week'].to_numpy())
+
+    # 各市场的键相隔window以上，窗口不会跨越市场
+    week = week - week.min()
+    keys = market * (week.max() + 1 + window) + week
+    left = np.searchsorted(keys, keys - window + 1, side='left')
+    right = np.arange(1, len(keys) + 1)
+
+    market_mean = np.bincount(market, weights=price) / np.bincount(market)
+    centered = price - market_mean[market]
+    s1 = np.r_[0.0, np.cumsum(centered)]
+    s2 = np.r_[0.0, np.cumsum(centered * centered)]
+    count = right - left
+    sum1 = s1[right] - s1[left]
+    mean = sum1 / count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = np.where(count > 1, np.maximum(s2[right] - s2[left] - sum1 * mean, 0.0) / (count - 1), np.nan)
+
+    rolling_mean = mean + market_mean[market]
+    rolling_std = np.sqrt(var)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        volatility = rolling_std / rolling_mean
+    return weekly.assign(
+        rolling_weeks=count.astype(np.int16),
+        rolling_mean=rolling_mean,
+        rolling_std=rolling_std,
+        volatility=volatility,
+        ewma=pd.Series(price).groupby(market).ewm(span=span).mean().to_numpy(),
+    )
+
+
+def seasonal_index(weekly):
+    """
+    按季节内周序号的同比季节指数：每个点的周均价除以该市场当季的平均价，
+    再在各季之间对同一市场、同一季节内周序号取平均（1.0为该季平均水平）
+    """
+    market, starts = market_index(weekly)
+    price = weekly['price'].to_numpy()
+    week_start = weekly['Week'].to_numpy().astype('datetime64[D]')
+    months = week_start.astype('datetime64[M]').astype(np.int64)
+    # 季节开始的月份序号（自1970-01起），季节内周序号从该月1日起算
+    season = months - (months - (SEASON_START_MONTH - 1)) % 12
+    week_of_season = (week_start - season.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) // 7
+
+    # 市场当季均价（各周等权）
+    season_ids, _ = pd.factorize(market * (season.max() + 1) + season)
+    season_mean = np.bincount(season_ids, weights=price) / np.bincount(season_ids)
+    ratio = price / season_mean[season_ids]
+
+    # 同一市场、同一季节内周序号在各季之间取平均
+    n_weeks = week_of_season.max() + 1
+    cell_ids, cells = pd.factorize(market * n_weeks + week_of_season)
+    index = np.bincount(cell_ids, weights=ratio) / np.bincount(cell_ids)
+    seasons = np.bincount(cell_ids)
+    order = np.argsort(cells, kind='stable')
+    cells, index, seasons = cells[order], index[order], seasons[order]
+    rows = starts[cells // n_weeks]
+    return pd.DataFrame({
+        'City': weekly['City'].iloc[rows].reset_index(drop=True),
+        'Variety': weekly['Variety'].to_numpy()[rows],
+        'Season_Week': (cells % n_weeks).astype(np.int8),
+        'seasonal_index': index,
+        'seasons': seasons.astype(np.int16),
+    })
+
+
+def market_tables(df, window=DEFAULT_WINDOW, span=DEFAULT_SPAN):
+    """
+    返回 (周度滚动统计表, 季节指数表)；没有有效行时返回 (None, None)
+    """
+    weekly = weekly_prices(df)
+    if weekly.empty:
+        return None, None
+    rolling = rolling_statistics(weekly, window, span)
+    return rolling, seasonal_index(rolling)
+
+
+def save_market_tables(rolling, seasonal, out_dir):
+    """
+    以列式存储写出两张表（浮点列为float32），可用load_market_tables读取
+    """
+    for name, table in (('rolling', rolling), ('seasonal', seasonal)):
+        floats = table.select_dtypes('float64').columns
+        write_store(table.astype({col: np.float32 for col in floats}), os.path.join(out_dir, name))
+
+
+def load_market_tables(out_dir):
+    return read_store(os.path.join(out_dir, 'rolling')), read_store(os.path.join(out_dir, 'seasonal'))
+
+
+def variety_labels(codes, vocabularies):
+    """
+    Variety编码 -> 类别字典中的名称（没有字典时为编码本身）
+    """
+    vocabulary = (vocabularies or {}).get('Variety')
+    if vocabulary is None:
+        return [str(code) for code in codes]
+    return [vocabulary.values[code] if code < len(vocabulary) else str(code) for code in codes]
+
+
+def market_section(rolling, seasonal, vocabularies=None, top_n=TOP_N_MARKETS):
+    """
+    报告中的市场统计部分：平均滚动波动率最高的市场及其最新一周的滚动均值、标准差和EWMA，
+    以及所有市场平均的季节曲线（季节内周序号 -> 季节指数）
+    """
+    market, starts = market_index(rolling)
+    last = np.r_[starts[1:], len(rolling)] - 1
+    volatility = rolling['volatility'].to_numpy()
+    valid = ~np.isnan(volatility)
+    counts = np.bincount(market[valid], minlength=len(starts))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_volatility = np.bincount(market[valid], weights=volatility[valid], minlength=len(starts)) / counts
+    ranked = [i for i in np.argsort(-mean_volatility, kind='stable') if counts[i]][:top_n]
+
+    rows = rolling.iloc[last[ranked]]
+    varieties = variety_labels(rows['Variety'].to_numpy(), vocabularies)
+    most_volatile = [
+        {
+            "city": str(row.City),
+            "variety": variety,
+            "weeks": int(last[i] - starts[i] + 1),
+            "mean_volatility": float(mean_volatility[i]),
+            "latest_week": row.Week.strftime('%Y-%m-%d'),
+            "latest_rolling_mean": float(row.rolling_mean),
+            "latest_rolling_std": float(row.rolling_std),
+            "latest_ewma": float(row.ewma),
+        }
+        for i, row, variety in zip(ranked, rows.itertuples(), varieties)
+    ]
+
+    profile = seasonal.groupby('Season_Week')['seasonal_index'].mean()
+    return {
+        "markets": int(len(starts)),
+        "weekly_points": int(len(rolling)),
+        "most_volatile_markets": most_volatile,
+        "season_profile": {int(week): float(value) for week, value in profile.items()},
+    }
+
+
+def analyze_markets(df, vocabularies=None, out_dir=None, window=DEFAULT_WINDOW, span=DEFAULT_SPAN):
+    """
+    计算各市场（City × Variety）的滚动统计和季节指数，返回报告中的market_statistics部分；
+    指定out_dir时同时写出两张完整的表
+    """
+    if not {'Date', 'City', 'Variety', MEASURE}.issubset(df.columns):
+        return "缺少日期、城市、品种或价格列"
+    rolling, seasonal = market_tables(df, window, span)
+    section = {"window_weeks": window, "ewma_span": span, "season_start_month": SEASON_START_MONTH}
+    if rolling is None:
+        return dict(section, markets=0, weekly_points=0, most_volatile_markets=[], season_profile={})
+    section.update(market_section(rolling, seasonal, vocabularies))
+    if out_dir:
+        save_market_tables(rolling, seasonal, out_dir)
+        section["tables"] = out_dir
+    return section
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from configuration import PROCESSED_DATA_PATH, VOCABULARY_PATH
+    from data_analysis import load_data
+    from vocabulary import load_vocabularies
+
+    parser = argparse.ArgumentParser(description="各市场（City × Variety）的滚动波动率、EWMA和季节指数")
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help="滚动窗口（周）")
+    parser.add_argument('--span', type=int, default=DEFAULT_SPAN, help="EWMA跨度（周）")
+    args = parser.parse_args()
+
+    df = load_data(PROCESSED_DATA_PATH, ['Date', 'City', 'Variety', MEASURE])
+    out_dir = market_stats_dir_for(PROCESSED_DATA_PATH)
+    section = analyze_markets(df, load_vocabularies(VOCABULARY_PATH), out_dir, args.window, args.span)
+    print(json.dumps(section, indent=4, ensure_ascii=False))
+    print(f"市场统计表已保存至: {out_dir}")
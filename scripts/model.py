@@ -1,48 +1,387 @@
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.metrics import mean_squared_error, r2_score
-from feature_processing import extract_month   # ← 去掉了 .
-
-def build_model():
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('cat', OneHotEncoder(handle_unknown='ignore'), ['City', 'Type'])
-        ],
-        remainder='passthrough'
-    )
+from schema import month_of
+from vocabulary import Vocabulary, OTHER_CODE, load_vocabularies
+from configuration import VOCABULARY_PATH, MODEL_ENGINES
+from profiling import step, profiled
+import os
+import json
+import time
+import joblib
+import sklearn
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+FEATURES = ['City', 'Type', 'Month']
+LATEST_FILE = "latest.json"
+
+# forest：随机森林（One-hot之前的默认模型）；hist：直方图梯度提升，City/Type作为原生类别特征
+ENGINES = MODEL_ENGINES
+# HistGradientBoosting的类别取值须小于max_bins（255）；字典按频数排序，更靠后的少见取值归为'Other'
+MAX_CATEGORY_CODE = 254
+# 分层抽样的分层列
+STRATA = ['City', 'Type']
+# 测试集的比例和随机种子，各训练方式使用同一组测试行（见holdout_mask）
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+class VocabularyEncoder(BaseEstimator, TransformerMixin):
+    """
+    用稳定类别字典把City/Type编码为整数，与其余特征拼成紧凑的整数特征矩阵
+    拟合时在字典副本中追加训练集里新出现的取值，不修改传入的字典；未知取值编码为0（'Other'）
+    指定max_code时大于它的编码也归为'Other'
+    """
+
+    def __init__(self, columns=('City', 'Type'), vocabularies=None, max_code=None):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.max_code = max_code
+
+    def fit(self, X, y=None):
+        self.vocabularies_ = {}
+        for col in self.columns:
+            base = (self.vocabularies or {}).get(col)
+            vocabulary = Vocabulary(base.values if base is not None else None)
+            vocabulary.add(X[col].unique())
+            self.vocabularies_[col] = vocabulary
+        self.passthrough_ = [col for col in X.columns if col not in self.columns]
+        return self
+
+    def transform(self, X):
+        codes = [self.vocabularies_[col].encode(X[col]) for col in self.columns]
+        if self.max_code is not None:
+            codes = [np.where(c > self.max_code, OTHER_CODE, c).astype(c.dtype) for c in codes]
+        rest = [X[col].to_numpy() for col in self.passthrough_]
+        return np.column_stack(codes + rest)
+
+def build_model(vocabularies, engine='forest', native_categories=True, n_jobs=-1):
+    """
+    vocabularies为清洗阶段保存的类别字典（load_vocabularies的结果），由调用方传入；
+    为空字典时从训练数据建立；n_jobs见build_regressor
+    """
+    max_code = MAX_CATEGORY_CODE if engine == 'hist' and native_categories else None
     model = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(
-            n_estimators=200,
-            max_depth=10,
-            min_samples_split=5,
-            random_state=42
-        ))
+        ('encoder', VocabularyEncoder(vocabularies=vocabularies, max_code=max_code)),
+        ('regressor', build_regressor(engine, n_jobs=n_jobs, native_categories=native_categories))
     ])
     return model
 
-def train_and_evaluate(df):
-    df = extract_month(df)
-    X = df[['City', 'Type', 'Month']]
-    y = df['Avg Price']
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+def build_regressor(engine='forest', n_jobs=-1, native_categories=True):
+    """
+    两种模型都使用全部CPU核（HistGradientBoosting通过OpenMP）；已在进程池中并行时传入n_jobs=1
+    特征矩阵的前两列为City/Type编码，hist模型默认将其作为原生类别特征，native_categories为False时按序数编码切分
+    """
+    if engine == 'hist':
+        return HistGradientBoostingRegressor(
+            max_iter=200,
+            learning_rate=0.1,
+            max_leaf_nodes=31,
+            categorical_features=[0, 1] if native_categories else None,
+            early_stopping=False,
+            random_state=42
+        )
+    return RandomForestRegressor(
+        n_estimators=200,
+        max_depth=10,
+        min_samples_split=5,
+        n_jobs=n_jobs,
+        random_state=42
     )
-    model = build_model()
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
-    return {
-        "model_type": "RandomForestRegressor",
-        "features": ["City", "Type", "Month"],
+
+def stratified_indices(df, max_rows, keys=STRATA, random_state=42):
+    """
+    按 City × Type 分层抽样，返回保留行的位置（升序）
+    每层先保留一行，少见的城市/类型组合不会被抽掉，其余名额按各层剩余行数的比例分配，总行数不超过max_rows
+    （层数多于max_rows时每层只保留一行）；层内的随机排名用一次分组rank得到，没有按组的Python循环
+    """
+    if max_rows is None or len(df) <= max_rows:
+        return np.arange(len(df))
+    codes = [pd.factorize(df[key], use_na_sentinel=False)[0] for key in keys if key in df.columns]
+    strata = np.ravel_multi_index(codes, [c.max() + 1 for c in codes]) if codes else np.zeros(len(df), np.int64)
+    strata = pd.factorize(strata)[0]
+    sizes = np.bincount(strata)
+    spare = max(max_rows - len(sizes), 0)
+    quota = 1 + np.floor((sizes - 1) * spare / max(len(df) - len(sizes), 1))
+    rng = np.random.default_rng(random_state)
+    rank = pd.Series(rng.random(len(df))).groupby(strata).rank(method='first').to_numpy()
+    return np.flatnonzero(rank <= quota[strata])
+
+def holdout_mask(n_rows, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    """
+    测试行的布尔掩码（与train_test_split选出的测试行相同），整表和流式训练传入同一个掩码时在同一测试集上评估
+    """
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[train_test_split(np.arange(n_rows), test_size=test_size, random_state=random_state)[1]] = True
+    return mask
+
+def model_features(df):
+    """
+    只取出特征列并添加int8的月份，不复制也不修改传入的数据表
+    """
+    return df[['City', 'Type']].assign(Month=month_of(df['Date']))
+
+def save_model(model, model_dir, metadata):
+    """
+    保存训练好的模型管道，文件名带时间戳版本号，latest.json指向最新版本
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    filename = f"price_model_{version}.joblib"
+    metadata = dict(metadata, version=version, sklearn_version=sklearn.__version__)
+    joblib.dump({"model": model, "metadata": metadata}, os.path.join(model_dir, filename))
+    with open(os.path.join(model_dir, LATEST_FILE), 'w') as f:
+        json.dump({"artifact": filename, "version": version}, f, indent=4)
+    return os.path.join(model_dir, filename)
+
+def load_model(path):
+    """
+    读取模型文件；path为目录时读取latest.json指向的最新版本
+    返回 (模型管道, 元数据)
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, LATEST_FILE)) as f:
+            path = os.path.join(path, json.load(f)["artifact"])
+    artifact = joblib.load(path)
+    return artifact["model"], artifact["metadata"]
+
+@profiled()
+def train_and_evaluate(df, vocabularies, model_dir=None, engine='forest', max_rows=None, test_mask=None,
+                       fitted=None, on_predict=None, n_jobs=-1):
+    """
+    训练并评估价格模型；指定model_dir时保存训练好的模型，vocabularies见build_model
+    engine为'forest'（随机森林）或'hist'（直方图梯度提升）；
+    指定max_rows时训练集按 City × Type 分层抽样到约max_rows行，测试集不抽样
+    test_mask为测试行的布尔掩码，默认为holdout_mask(len(df))
+    fitted(fit)返回训练好的模型：fit()训练并返回模型，调用方可改为读取缓存的模型（此时fit_seconds为None）；
+    on_predict(y_test, y_pred)在评估后调用，例如绘制预测散点图
+    已在进程池中并行时传入n_jobs=1，随机森林不再使用全部CPU核
+    """
+    X = model_features(df)
+    y = df['Avg Price']
+    test = holdout_mask(len(df)) if test_mask is None else np.asarray(test_mask, dtype=bool)
+    X_train, X_test, y_train, y_test = X[~test], X[test], y[~test], y[test]
+    sample = stratified_indices(X_train, max_rows)
+    if len(sample) < len(X_train):
+        X_train, y_train = X_train.iloc[sample], y_train.iloc[sample]
+    model = build_model(vocabularies, engine, n_jobs=n_jobs)
+    timing = {"fit_seconds": None}
+
+    def fit():
+        with step("fit", rows_in=len(X_train)):
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            timing["fit_seconds"] = time.perf_counter() - start
+        return model
+
+    model = fit() if fitted is None else fitted(fit)
+    fit_seconds = timing["fit_seconds"]
+    with step("predict", rows_in=len(X_test)):
+        y_pred = model.predict(X_test)
+    if on_predict is not None:
+        on_predict(y_test.to_numpy(), y_pred)
+    results = {
+        "model_type": type(model.named_steps['regressor']).__name__,
+        "engine": engine,
+        "min_samples_leaf": model.named_steps['regressor'].min_samples_leaf,
+        "features": list(FEATURES),
         "target": "Avg Price",
+        "train_size": len(X_train),
         "test_size": len(X_test),
+        "fit_seconds": fit_seconds,
         "mean_squared_error": mean_squared_error(y_test, y_pred),
         "r2_score": r2_score(y_test, y_pred),
         "sample_predictions": {
             "actual": y_test.iloc[:5].tolist(),
             "predicted": y_pred[:5].tolist()
         }
-    }
\ No newline at end of file
+    }
+    if model_dir:
+        with step("save_model"):
+            results["model_artifact"] = save_model(model, model_dir, {
+                "engine": engine,
+                "features": list(FEATURES),
+                "target": "Avg Price",
+                "train_size": len(X_train),
+                "mean_squared_error": results["mean_squared_error"],
+                "r2_score": results["r2_score"],
+            })
+    return results
+
+
+class CellStatistics:
+    """
+    按特征组合（City × Type × Month）累积目标值的和、平方和与行数，可逐块更新
+    特征只有这三个类别列，组合数远小于行数，占用内存与数据量无关
+    """
+
+    def __init__(self, compact_every=16):
+        self.compact_every = compact_every
+        self._parts = []
+
+    def partial_fit(self, X, y):
+        y = np.asarray(y, dtype=np.float64)
+        frame = X.reset_index(drop=True).assign(sum=y, sumsq=y * y, count=1)
+        part = frame.groupby(FEATURES, dropna=False, observed=True)[['sum', 'sumsq', 'count']].sum().reset_index()
+        # 各块的类别不同，按取值而不是类别编码合并
+        self._parts.append(part.astype({'City': object, 'Type': object}))
+        if len(self._parts) >= self.compact_every:
+            self._parts = [self.table()]
+        return self
+
+    def table(self):
+        parts = pd.concat(self._parts, ignore_index=True)
+        return parts.groupby(FEATURES, dropna=False, sort=False)[['sum', 'sumsq', 'count']].sum().reset_index()
+
+
+def _row_stream(chunks, test_size, random_state, test_mask=None):
+    # 逐块按固定种子随机划分训练/测试行；传入test_mask时按行号取出各块对应的部分
+    rng = np.random.default_rng(random_state)
+    offset = 0
+    for chunk in chunks:
+        X = model_features(chunk)
+        if test_mask is None:
+            test = rng.random(len(chunk)) < test_size
+        else:
+            test = test_mask[offset:offset + len(chunk)]
+        offset += len(chunk)
+        yield X, chunk['Avg Price'].to_numpy(dtype=np.float64), test
+
+
+@profiled()
+def train_streaming(chunks, vocabularies, model_dir=None, engine='hist', test_size=TEST_SIZE,
+                    random_state=RANDOM_STATE, test_mask=None):
+    """
+    大于内存的数据的流式训练（partial_fit式）：逐块把训练行聚合为各 City × Type × Month 格子的价格和与行数，
+    读完后在格子均价上以行数为样本权重拟合。对平方损失的梯度提升，同一格子内各行的特征和梯度相同，
+    结果与在原始行上以min_samples_leaf=1拟合相同（浮点误差内）
+    City/Type按序数编码切分：原生类别切分会忽略样本数少于10的类别，按格子计数时无法与原始行一致
+    测试行同样聚合，MSE和R²由格子的和、平方和与行数精确计算，不保存原始行
+    测试行默认逐块随机选取；传入test_mask（整个数据的布尔掩码，如holdout_mask）时与整表训练使用同一测试集
+    """
+    if test_mask is not None:
+        test_mask = np.asarray(test_mask, dtype=bool)
+    train, test = CellStatistics(), CellStatistics()
+    samples = None
+    rows = 0
+    with step("aggregate") as record:
+        for X, y, is_test in _row_stream(chunks, test_size, random_state, test_mask):
+            train.partial_fit(X[~is_test], y[~is_test])
+            test.partial_fit(X[is_test], y[is_test])
+            if samples is None and is_test.any():
+                samples = (X[is_test].iloc[:5], y[is_test][:5])
+            rows += len(X)
+        record["rows_out"] = rows
+    cells, test_cells = train.table(), test.table()
+
+    model = build_model(vocabularies, engine, native_categories=False)
+    if engine == 'hist':
+        model.set_params(regressor__min_samples_leaf=1)
+    with step("fit", rows_in=len(cells)):
+        start = time.perf_counter()
+        model.fit(cells[FEATURES], cells['sum'] / cells['count'],
+                  regressor__sample_weight=cells['count'].to_numpy(dtype=np.float64))
+        fit_seconds = time.perf_counter() - start
+    with step("predict", rows_in=len(test_cells)):
+        pred = model.predict(test_cells[FEATURES])
+
+    n = test_cells['count'].sum()
+    sse = (test_cells['sumsq'] - 2 * pred * test_cells['sum'] + test_cells['count'] * pred * pred).sum()
+    sst = test_cells['sumsq'].sum() - test_cells['sum'].sum() ** 2 / n
+    results = {
+        "model_type": type(model.named_steps['regressor']).__name__,
+        "engine": f"{engine}_streaming",
+        "min_samples_leaf": model.named_steps['regressor'].min_samples_leaf,
+        "features": list(FEATURES),
+        "target": "Avg Price",
+        "train_size": int(cells['count'].sum()),
+        "train_cells": len(cells),
+        "test_size": int(n),
+        "fit_seconds": fit_seconds,
+        "mean_squared_error": float(sse / n),
+        "r2_score": float(1 - sse / sst),
+        "sample_predictions": {
+            "actual": samples[1].tolist() if samples else [],
+            "predicted": model.predict(samples[0]).tolist() if samples else []
+        }
+    }
+    if model_dir:
+        with step("save_model"):
+            results["model_artifact"] = save_model(model, model_dir, {
+                key: results[key] for key in
+                ("engine", "features", "target", "train_size", "mean_squared_error", "r2_score")
+            })
+    return results
+
+
+def compare_engines(df, vocabularies, max_rows=None, chunk_rows=1_000_000):
+    """
+    在同一数据上比较随机森林、梯度提升（全量和分层抽样）和流式梯度提升的拟合耗时与精度
+    流式训练在格子上拟合，必须使用min_samples_leaf=1才与原始行等价，而整表hist使用默认的20，
+    正则化不同，表中每行列出各自的min_samples_leaf
+    各方式使用同一个测试掩码（holdout_mask），MSE和R²在同一组测试行上计算
+    """
+    test_mask = holdout_mask(len(df))
+    runs = [('forest', None), ('hist', None)]
+    if max_rows and max_rows < len(df):
+        runs.append(('hist', max_rows))
+    rows = []
+    for engine, rows_budget in runs:
+        result = train_and_evaluate(df, vocabularies, engine=engine, max_rows=rows_budget, test_mask=test_mask)
+        rows.append(dict(result, engine=engine if rows_budget is None else f"{engine}_sampled"))
+    chunks = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    rows.append(train_streaming(chunks, vocabularies, test_mask=test_mask))
+    return [{key: row[key] for key in
+             ("engine", "min_samples_leaf", "train_size", "test_size", "fit_seconds", "mean_squared_error",
+              "r2_score")}
+            for row in rows]
+
+
+def print_comparison(table):
+    print(f"{'engine':<16} {'min leaf':>8} {'train rows':>12} {'fit(s)':>9} {'MSE':>12} {'R²':>8}")
+    for row in table:
+        print(f"{row['engine']:<16} {row['min_samples_leaf']:>8} {row['train_size']:>12,} {row['fit_seconds']:>9.2f} "
+              f"{row['mean_squared_error']:>12.2f} {row['r2_score']:>8.4f}")
+
+
+def run_training(data_path, model_dir=None, engine=None, max_rows=None, streaming=False,
+                 chunk_rows=1_000_000, compare=False):
+    """
+    命令行入口（model.py和cli.py共用）：比较各训练方式，或整表/流式训练并保存模型
+    engine为None时整表训练用forest，流式训练用hist
+    """
+    from column_store import iter_processed, load_processed
+
+    columns = ['Date', 'City', 'Type', 'Avg Price']
+    vocabularies = load_vocabularies(VOCABULARY_PATH)
+    if compare:
+        table = compare_engines(load_processed(data_path, columns), vocabularies, max_rows, chunk_rows)
+        print_comparison(table)
+        return table
+    if streaming:
+        results = train_streaming(iter_processed(data_path, columns, chunk_rows), vocabularies,
+                                  model_dir, engine=engine or 'hist')
+    else:
+        results = train_and_evaluate(load_processed(data_path, columns), vocabularies, model_dir,
+                                     engine=engine or 'forest', max_rows=max_rows)
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    from configuration import PROCESSED_DATA_PATH, MODEL_DIR
+
+    parser = argparse.ArgumentParser(description="训练价格模型，或比较不同训练方式的耗时与精度")
+    parser.add_argument('--engine', choices=ENGINES, default=None, help="默认整表训练用forest，流式训练用hist")
+    parser.add_argument('--max-rows', type=int, default=None, help="训练集按 City × Type 分层抽样的行数上限")
+    parser.add_argument('--streaming', action='store_true', help="按块流式读取和聚合，适用于大于内存的数据")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help="流式训练每块的行数")
+    parser.add_argument('--compare', action='store_true', help="比较forest、hist、分层抽样的hist和流式hist")
+    args = parser.parse_args()
+
+    run_training(PROCESSED_DATA_PATH, MODEL_DIR, args.engine, args.max_rows, args.streaming,
+                 args.chunk_rows, args.compare)
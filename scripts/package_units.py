@@ -0,0 +1,67 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+BUSHEL_LITERS = 35.239  # 1 bushel ≈ 35.239 L
+CUBIC_INCH_LITERS = 0.016387064
+# 散装箱（"24 inch bins"）中的尺寸为箱高，底面按标准托盘 48 × 40 英寸计算
+BIN_FOOTPRINT_SQ_IN = 48 * 40
+
+# 包装规格规则表：(正则, 单位, 每单位的升数)，按顺序匹配第一条
+# qty为数量（可为分数，如 "1 1/9"、"1/2"，省略时为1）；
+# 按重量（lb）、按个（each）和未注明尺寸的箱（bins）无法换算为容积，升数为NaN
+PACKAGE_RULES = [
+    (r'^(?P<qty>[\d\s/.]*)\s*bushel\s+(cartons|crates|baskets|boxes|sacks)$', 'bushel', BUSHEL_LITERS),
+    (r'^(?P<qty>[\d.]+)\s*inch\s+bins?$', 'inch bin', BIN_FOOTPRINT_SQ_IN * CUBIC_INCH_LITERS),
+    (r'^(?P<qty>[\d\s/.]*)\s*lbs?\s+(cartons|crates|sacks|boxes)$', 'lb', np.nan),
+    (r'^bins?$', 'bin', np.nan),
+    (r'^each$', 'each', np.nan),
+]
+_COMPILED_RULES = [(re.compile(pattern), unit, liters) for pattern, unit, liters in PACKAGE_RULES]
+
+
+def parse_quantity(text):
+    """
+    解析数量：整数、小数、分数或带分数（"1 1/9"），空字符串为1，无法解析时为NaN
+    """
+    text = text.strip()
+    if not text:
+        return 1.0
+    try:
+        return float(sum(float(part.split('/')[0]) / float(part.split('/')[1]) if '/' in part else float(part)
+                         for part in text.split()))
+    except (ValueError, ZeroDivisionError):
+        return np.nan
+
+
+def parse_package(package):
+    """
+    按规则表解析单个包装规格，返回 (数量, 单位, 升数)；不认识的规格返回 (NaN, None, NaN)
+    """
+    if not isinstance(package, str):
+        return np.nan, None, np.nan
+    text = ' '.join(package.lower().split())
+    for pattern, unit, liters in _COMPILED_RULES:
+        match = pattern.match(text)
+        if match:
+            quantity = parse_quantity(match.groupdict().get('qty') or '')
+            return quantity, unit, quantity * liters
+    return np.nan, None, np.nan
+
+
+def normalize_packages(package):
+    """
+    包装规格标准化（清洗时使用）：每个不同的取值只解析一次，再按编码向量化地映射回各行
+    返回与package同索引的DataFrame，列为 Package_Qty、Package_Unit、Package_L
+    """
+    codes, uniques = pd.factorize(package)
+    # 末尾追加一项缺失值，编码-1（缺失）正好取到它
+    table = [parse_package(value) for value in uniques] + [(np.nan, None, np.nan)]
+    quantities, units, liters = (np.array(column) for column in zip(*table))
+    return pd.DataFrame({
+        'Package_Qty': quantities.astype(np.float64)[codes],
+        'Package_Unit': units.astype(object)[codes],
+        'Package_L': liters.astype(np.float64)[codes],
+    }, index=package.index)
+
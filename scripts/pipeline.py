@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+
+from utility import ensure_dir, save_json, file_hash
+from result_cache import code_fingerprint
+from profiling import step
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+    func接收PipelineContext，返回可JSON序列化的结果（会被缓存）
+    artifacts为该阶段产出的文件，缺失时即使缓存键相同也会重新运行
+    code为func所在模块之外、结果还依赖的模块名，其源码哈希计入缓存键
+    """
+
+    def __init__(self, name, func, deps=(), params=None, artifacts=(), code=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.artifacts = list(artifacts)
+        self.code = sorted({func.__module__, *code})
+
+
+class PipelineContext:
+    """
+    阶段之间共享的状态：上游阶段的结果和只加载一次的数据表
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._frame = None
+        self.results = {}
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self._loader()
+        return self._frame
+
+    def set_frame(self, df):
+        self._frame = df
+
+
+class Pipeline:
+    """
+    按依赖关系（DAG）顺序运行各阶段
+    缓存键由原始数据的内容哈希、阶段参数、阶段代码的源码哈希和上游阶段的缓存键组成，
+    键未变化且产出文件都存在时跳过该阶段并复用缓存结果
+    """
+
+    def __init__(self, stages, input_path, cache_dir):
+        self.stages = {stage.name: stage for stage in stages}
+        self.input_path = input_path
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+
+    def order(self, targets=None):
+        # 深度优先得到拓扑顺序，只包含目标阶段及其上游
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"流水线存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in targets or self.stages:
+            visit(name)
+        return ordered
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _result_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def run(self, context, targets=None, force=False):
+        ensure_dir(self.cache_dir)
+        manifest = self._load_manifest()
+        input_hash = file_hash(self.input_path)
+        keys = {}
+
+        for name in self.order(targets):
+            stage = self.stages[name]
+            payload = {
+                "input": input_hash,
+                "params": stage.params,
+                "code": code_fingerprint(stage.code),
+                "deps": [keys[dep] for dep in stage.deps],
+            }
+            keys[name] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+            cached = manifest.get(name, {})
+            outputs = stage.artifacts + [self._result_path(name)]
+            if not force and cached.get("key") == keys[name] and all(map(os.path.exists, outputs)):
+                with open(self._result_path(name)) as f:
+                    context.results[name] = json.load(f)
+                print(f"[{name}] 输入未变化，跳过")
+                continue
+
+            print(f"[{name}] 运行中...")
+            with step(f"stage:{name}"):
+                context.results[name] = stage.func(context)
+            save_json(context.results[name], self._result_path(name))
+            manifest[name] = {"key": keys[name]}
+            # 每个阶段完成后立即记录，中途失败时已完成的阶段仍可复用
+            save_json(manifest, self.manifest_path)
+
+        return context.results
@@ -0,0 +1,81 @@
+import pandas as pd
+
+from configuration import MODEL_DIR
+from model import load_model, FEATURES
+
+
+def _key(value):
+    # 缺失的类别值统一用None作为查找键
+    return None if pd.isna(value) else value
+
+
+class PricePredictor:
+    """
+    加载一次已保存的模型，提供批量预测和单条低延迟预测
+    单条预测从预先计算好的 City × Type × Month 预测表中查找，
+    表中没有的组合（类别字典中没有的城市或类型）才调用模型并缓存结果
+    """
+
+    def __init__(self, path=MODEL_DIR, precompute=True):
+        self.model, self.metadata = load_model(path)
+        self.table = {}
+        if precompute:
+            self.build_lookup()
+
+    def _features(self, records):
+        records = pd.DataFrame(records)
+        if 'Month' not in records.columns:
+            records = records.assign(Month=pd.to_datetime(records['Date']).dt.month)
+        # 与训练时一致，类别列按object类型传入（全为缺失值的列否则会被推断为float）
+        return records[FEATURES].astype({'City': object, 'Type': object})
+
+    def predict_batch(self, records):
+        """
+        批量预测，records为包含City、Type和Date（或Month）的DataFrame或字典列表
+        """
+        return self.model.predict(self._features(records))
+
+    def build_lookup(self):
+        """
+        用一次批量预测填满训练集中所有 City × Type × 月份组合的预测表
+        """
+        # 字典第0项为保留的'Other'，Type另外加上缺失值
+        vocabularies = self.model.named_steps['encoder'].vocabularies_
+        cities = vocabularies['City'].values[1:]
+        types = vocabularies['Type'].values[1:] + [None]
+        grid = pd.MultiIndex.from_product([cities, types, range(1, 13)], names=FEATURES).to_frame(index=False)
+        prices = self.model.predict(grid)
+        self.table = {
+            (_key(city), _key(type_), month): price
+            for city, type_, month, price in zip(grid['City'], grid['Type'], grid['Month'], prices)
+        }
+        return self.table
+
+    def predict_one(self, city, type_, date=None, month=None):
+        """
+        单条预测，date和month二选一
+        """
+        if month is None:
+            month = pd.Timestamp(date).month
+        key = (_key(city), _key(type_), int(month))
+        price = self.table.get(key)
+        if price is None:
+            record = self._features([{'City': city, 'Type': type_, 'Month': key[2]}])
+            price = self.table[key] = self.model.predict(record)[0]
+        return price
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="使用已保存的模型预测南瓜平均价格")
+    parser.add_argument('input', help="包含City、Type、Date列的CSV文件")
+    parser.add_argument('output', help="预测结果输出路径")
+    parser.add_argument('--model', default=MODEL_DIR, help="模型文件或模型目录（使用最新版本）")
+    args = parser.parse_args()
+
+    predictor = PricePredictor(args.model, precompute=False)
+    records = pd.read_csv(args.input)
+    records['Predicted Price'] = predictor.predict_batch(records)
+    records.to_csv(args.output, index=False)
+    print(f"已预测 {len(records)} 条记录，结果保存至: {args.output}")
@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import atexit
+import cProfile
+import resource
+from functools import wraps
+from contextlib import contextmanager
+
+# 设置 PUMPKIN_PROFILE=1 开启各步骤的计时；设置 PUMPKIN_PROFILE_DUMP=路径 同时导出cProfile结果
+PROFILE_ENV = "PUMPKIN_PROFILE"
+PROFILE_DUMP_ENV = "PUMPKIN_PROFILE_DUMP"
+
+_enabled = False
+_records = []
+_stack = []
+_profiler = None
+# 关闭时所有步骤共用的记录，写入的行数被直接丢弃
+_DISCARD = {}
+
+
+def _peak_rss_mb():
+    # Linux下ru_maxrss单位为KB，macOS下为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def enable(dump_path=None):
+    """
+    开启计时；指定dump_path时同时运行cProfile，进程退出时写出.prof文件
+    （可用snakeviz、flameprof、gprof2dot等查看），同目录写出步骤的折叠栈（.folded，可直接用flamegraph.pl绘制）
+    """
+    global _enabled, _profiler
+    _enabled = True
+    if dump_path and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        atexit.register(dump, dump_path)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _records.clear()
+    _stack.clear()
+
+
+@contextmanager
+def step(name, rows_in=None):
+    """
+    记录一个步骤的耗时、CPU时间、峰值内存和输入/输出行数
+    返回的字典中可写入rows_out；嵌套调用时步骤名以'/'连接
+    关闭时只有一次判断的开销
+    """
+    if not _enabled:
+        yield _DISCARD
+        return
+    _stack.append(name)
+    record = {"step": "/".join(_stack), "rows_in": rows_in, "rows_out": None}
+    # 按开始顺序记录，父步骤排在子步骤之前
+    _records.append(record)
+    rss_before = _peak_rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_seconds"] = time.perf_counter() - wall
+        record["cpu_seconds"] = time.process_time() - cpu
+        record["peak_rss_mb"] = _peak_rss_mb()
+        # 该步骤使进程峰值内存上升的量
+        record["peak_rss_growth_mb"] = record["peak_rss_mb"] - rss_before
+        _stack.pop()
+
+
+def profiled(name=None):
+    """
+    把整个函数作为一个步骤记录的装饰器
+    """
+    def decorator(func):
+        step_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with step(step_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def performance_section():
+    """
+    报告中的performance部分：按开始顺序排列的已完成步骤
+    """
+    records = [r for r in _records if "wall_seconds" in r]
+    # 在外层步骤内调用时外层尚未结束，以已完成的最外层步骤计总耗时
+    finished = {r["step"] for r in records}
+    outermost = [r for r in records if r["step"].rpartition("/")[0] not in finished]
+    return {
+        "total_wall_seconds": sum(r["wall_seconds"] for r in outermost),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in records), default=None),
+        "steps": records,
+    }
+
+
+def folded_stacks():
+    """
+    步骤的折叠栈（每行 "a;b;c 自身耗时微秒"），与flamegraph.pl / speedscope兼容
+    """
+    # 同名步骤（如逐块处理）先合并，再减去子步骤得到自身耗时
+    totals, children = {}, {}
+    for r in _records:
+        if "wall_seconds" not in r:
+            continue
+        totals[r["step"]] = totals.get(r["step"], 0) + r["wall_seconds"]
+        parent = r["step"].rpartition("/")[0]
+        children[parent] = children.get(parent, 0) + r["wall_seconds"]
+    return [
+        f"{name.replace('/', ';')} {max(int((total - children.get(name, 0)) * 1e6), 0)}"
+        for name, total in totals.items()
+    ]
+
+
+def add_arguments(parser):
+    """
+    为命令行脚本添加 --profile 和 --profile-dump 参数
+    """
+    parser.add_argument('--profile', action='store_true',
+                        help=f"记录各步骤的耗时和内存（也可设置环境变量 {PROFILE_ENV}=1）")
+    parser.add_argument('--profile-dump', default=None, metavar='PATH',
+                        help="同时运行cProfile，退出时写出PATH（.prof）和步骤折叠栈（.folded）")
+
+
+def enable_from_args(args):
+    if args.profile or args.profile_dump:
+        enable(args.profile_dump)
+
+
+def print_summary():
+    """
+    打印各步骤的耗时、内存和行数（供不写报告的脚本使用）
+    """
+    print(f"\n{'step':<40} {'wall(s)':>9} {'cpu(s)':>9} {'peak MB':>9} {'rows in':>10} {'rows out':>10}")
+    for r in performance_section()["steps"]:
+        rows_in = "" if r["rows_in"] is None else r["rows_in"]
+        rows_out = "" if r["rows_out"] is None else r["rows_out"]
+        print(f"{r['step']:<40} {r['wall_seconds']:>9.3f} {r['cpu_seconds']:>9.3f} "
+              f"{r['peak_rss_mb']:>9.0f} {rows_in:>10} {rows_out:>10}")
+
+
+def dump(path):
+    """
+    写出cProfile结果（.prof）和步骤折叠栈（.folded）
+    """
+    global _profiler
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(path)
+        _profiler = None
+    with open(os.path.splitext(path)[0] + ".folded", 'w') as f:
+        f.write("\n".join(folded_stacks()) + "\n")
+
+
+if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+    enable(os.environ.get(PROFILE_DUMP_ENV))
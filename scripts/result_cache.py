@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import importlib.util
+
+from utility import ensure_dir, save_json, file_hash
+
+INDEX_FILE = "index.json"
+# 缓存总大小上限，超出时按最近访问时间淘汰最久未用的条目
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+
+def code_fingerprint(modules):
+    """
+    计算结果所依赖模块的源码哈希（代码版本指纹），任一模块改动后对应的缓存键随之改变
+    """
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        # 已加载的模块（包括作为脚本运行的__main__）直接取其文件，否则按模块名查找
+        path = getattr(sys.modules.get(name), '__file__', None) or importlib.util.find_spec(name).origin
+        with open(path, 'rb') as f:
+            digest.update(name.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    按内容寻址的结果缓存：键为输入文件内容哈希、参数和代码版本指纹的SHA-256，
+    值为报告章节（JSON）或包含模型的对象（joblib），保存在本地目录，按LRU在总大小超过max_bytes时淘汰
+    index.json记录各条目的章节名、大小、最近访问时间，以及输入文件的哈希
+    （按路径、大小和修改时间复用，文件未变化时不重新读取）
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.index = self._load_index()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.sections = {}
+        # 上限调小后打开时即按新上限淘汰
+        if self._evict():
+            self._save_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {"entries": {}, "file_hashes": {}}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def _save_index(self):
+        ensure_dir(self.cache_dir)
+        tmp_path = self.index_path + ".tmp"
+        save_json(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+
+    def input_hash(self, path):
+        """
+        输入文件的内容哈希；路径、大小和修改时间都未变化时直接使用上次的结果
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.index["file_hashes"].get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        digest = file_hash(path)
+        self.index["file_hashes"][path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        return digest
+
+    @staticmethod
+    def make_key(section, input_hash, params=None, code=()):
+        payload = {
+            "section": section,
+            "input": input_hash,
+            "params": params or {},
+            "code": code_fingerprint(code) if code else None,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _path(self, entry):
+        return os.path.join(self.cache_dir, entry["file"])
+
+    def get_or_compute(self, section, compute, input_hash, params=None, code=(), artifacts=(), kind='json'):
+        """
+        命中时读取缓存的结果，否则调用compute()并写入缓存
+        kind为'json'（报告章节）或'joblib'（含模型等任意对象）；artifacts为compute产出的文件，缺失时视为未命中
+        """
+        key = self.make_key(section, input_hash, params, code)
+        entry = self.index["entries"].get(key)
+        if entry and os.path.exists(self._path(entry)) and all(map(os.path.exists, artifacts)):
+            if kind == 'json':
+                with open(self._path(entry)) as f:
+                    value = json.load(f)
+            else:
+                import joblib
+                value = joblib.load(self._path(entry))
+            entry["last_access"] = time.time()
+            self.hits += 1
+            self.sections[section] = "hit"
+            self._save_index()
+            return value
+
+        value = compute()
+        self.misses += 1
+        self.sections[section] = "miss"
+        self._put(key, section, value, kind)
+        return value
+
+    def _put(self, key, section, value, kind):
+        filename = os.path.join(key[:2], f"{key}.{kind}")
+        path = os.path.join(self.cache_dir, filename)
+        ensure_dir(os.path.dirname(path))
+        tmp_path = path + ".tmp"
+        if kind == 'json':
+            save_json(value, tmp_path)
+        else:
+            # joblib只在缓存模型等对象时导入，只缓存JSON章节的运行不加载它
+            import joblib
+            joblib.dump(value, tmp_path)
+        os.replace(tmp_path, path)
+        self.index["entries"][key] = {
+            "section": section,
+            "file": filename,
+            "bytes": os.path.getsize(path),
+            "last_access": time.time(),
+        }
+        self._evict()
+        self._save_index()
+
+    def _remove(self, key):
+        entry = self.index["entries"].pop(key)
+        if os.path.exists(self._path(entry)):
+            os.remove(self._path(entry))
+
+    def _evict(self):
+        # 总大小超出上限时从最久未访问的条目开始删除（刚写入的条目最后才会被删除），返回删除的条目数
+        entries = self.index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        evicted = 0
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            self._remove(key)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def invalidate(self, section=None):
+        """
+        删除缓存条目：section为None时清空全部，否则只删除该章节的条目；返回删除的条目数
+        """
+        keys = [key for key, entry in self.index["entries"].items() if section is None or entry["section"] == section]
+        for key in keys:
+            self._remove(key)
+        if section is None:
+            self.index["file_hashes"] = {}
+        self._save_index()
+        return len(keys)
+
+    def stats(self):
+        """
+        本次运行的命中/未命中次数和各章节的结果，以及缓存当前的条目数和总大小，写入报告的cache部分
+        """
+        entries = self.index["entries"].values()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "sections": dict(self.sections),
+            "entries": len(entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    from configuration import RESULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(description="查看或清除分析结果缓存")
+    parser.add_argument('--clear', action='store_true', help="删除缓存条目")
+    parser.add_argument('--section', default=None, help="只删除该章节的条目（如 statistics、machine_learning）")
+    args = parser.parse_args()
+
+    cache = ResultCache(RESULT_CACHE_DIR)
+    if args.clear:
+        print(f"已删除 {cache.invalidate(args.section)} 个缓存条目")
+    print(json.dumps(cache.stats(), indent=4, ensure_ascii=False))
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+# 处理后数据的紧凑列类型：字符串列为类别，价格、包装数量和容积为float32，字典编码为int16，日期为datetime64
+PROCESSED_DTYPES = {
+    'City': 'category',
+    'Type': 'category',
+    'Package': 'category',
+    'Low Price': 'float32',
+    'High Price': 'float32',
+    'Avg Price': 'float32',
+    'Package_Qty': 'float32',
+    'Package_Unit': 'category',
+    'Package_L': 'float32',
+    'Price_per_L': 'float32',
+    'Grade': 'int16',
+    'Variety': 'int16',
+    'Color': 'int16',
+    'Origin': 'int16',
+}
+DATE_COLUMN = 'Date'
+# 处理后CSV中的日期格式（清洗时写出的ISO日期）
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def apply_schema(df):
+    """
+    把数据表中出现的列转换为紧凑类型，已是目标类型的列不复制
+    """
+    dtypes = {col: dtype for col, dtype in PROCESSED_DTYPES.items()
+              if col in df.columns and df[col].dtype != dtype}
+    if dtypes:
+        df = df.astype(dtypes, copy=False)
+    if DATE_COLUMN in df.columns and not np.issubdtype(df[DATE_COLUMN].dtype, np.datetime64):
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT)
+    return df
+
+
+def read_processed_csv(path, columns=None):
+    """
+    按紧凑类型读取处理后的CSV，解析时直接得到目标类型，不经过object/float64中间列
+    """
+    usecols = None if columns is None else (lambda c: c in columns)
+    header = pd.read_csv(path, nrows=0, usecols=usecols).columns
+    dtypes = {col: dtype for col, dtype in PROCESSED_DTYPES.items() if col in header}
+    parse_dates = [DATE_COLUMN] if DATE_COLUMN in header else False
+    return pd.read_csv(path, usecols=usecols, dtype=dtypes, parse_dates=parse_dates,
+                       date_format=DATE_FORMAT)
+
+
+def month_of(dates):
+    """
+    日期列的月份（1~12），以int8返回
+    """
+    if not np.issubdtype(dates.dtype, np.datetime64):
+        dates = pd.to_datetime(dates)
+    return dates.dt.month.astype(np.int8)
+
+
+def frame_memory_mb(df):
+    """
+    数据表实际占用的内存（含字符串对象），单位MB
+    """
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def legacy_frame(df):
+    """
+    转换为紧凑类型之前的列类型（字符串为object，数值为float64/int64），用于对比内存占用
+    """
+    dtypes = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            dtypes[col] = object
+        elif pd.api.types.is_float_dtype(df[col]):
+            dtypes[col] = np.float64
+        elif pd.api.types.is_integer_dtype(df[col]):
+            dtypes[col] = np.int64
+    legacy = df.astype(dtypes)
+    if DATE_COLUMN in legacy.columns:
+        # 原先CSV中的日期按字符串读入
+        legacy[DATE_COLUMN] = legacy[DATE_COLUMN].dt.strftime(DATE_FORMAT)
+    return legacy
@@ -0,0 +1,433 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import formatdate
+
+# 将 scripts 目录加入系统路径（spawn启动的工作进程重新导入本模块时同样需要）
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from configuration import RAW_DATA_DIR, SERVICE_DIR, SERVICE_PORT
+
+# 服务模式：监视原始数据目录，新文件到达且写完后在进程池中重新清洗、分析、绘图，
+# 完整生成一个新版本（release）后原子地发布，并由本地HTTP端点提供最新的报告、立方体和图表
+# 版本目录生成后不再修改，HTTP端点只读取已发布的版本，重算期间照常响应
+# 模块顶层只导入标准库；pandas、sklearn、matplotlib只在工作进程中导入
+
+CURRENT_FILE = "current.json"
+RELEASES_DIR = "releases"
+MANIFEST_FILE = "manifest.json"
+REPORT_FILE = "analysis_report.json"
+CUBE_FILE = "processed_data_cube.npz"
+# 已发布的旧版本保留的个数（仍在传输旧版本文件的请求不受清理影响）
+KEEP_RELEASES = 3
+DEFAULT_POLL_SECONDS = 2.0
+# 等待处理的文件变化事件上限，队列满时暂停扫描目录（背压）
+DEFAULT_QUEUE_SIZE = 64
+READ_TIMEOUT = 10
+CONTENT_TYPES = {'.json': 'application/json', '.npz': 'application/octet-stream', '.png': 'image/png'}
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+
+def scan_inputs(raw_dir):
+    """
+    原始数据目录中各CSV文件的 (大小, 修改时间)
+    """
+    signatures = {}
+    for path in glob.glob(os.path.join(raw_dir, '*.csv')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signatures[path] = (stat.st_size, stat.st_mtime_ns)
+    return signatures
+
+
+def init_worker():
+    # 工作进程无界面渲染，必须在导入pyplot之前设置
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def build_release(input_paths, release_dir, vocab_seed=None, n_jobs=-1):
+    """
+    在工作进程中运行：清洗input_paths（无法读取的文件跳过）、生成分析报告和图表，写入release_dir
+    先写入临时目录，全部完成后再改名，release_dir要么不存在要么是完整的版本
+    vocab_seed为上一版本的类别字典，沿用以保持类别编码稳定
+    n_jobs为训练模型使用的CPU核数，多个工作进程并行时为1，避免 进程数×核数 个线程争用CPU
+    返回版本清单：各文件的相对路径 -> 内容哈希（用作ETag）、行数和跳过的文件
+    """
+    from data_cleaning import clean_files
+    from data_analysis import ANALYSIS_COLUMNS
+    from analysis import perform_analysis
+    from visualization import visualize_data
+    from column_store import store_path_for
+    from cube import load_cube
+    from utility import file_hash, save_json
+
+    start = time.perf_counter()
+    tmp_dir = release_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    data_path = os.path.join(tmp_dir, "processed_data.csv")
+    vocab_path = os.path.join(tmp_dir, "vocabularies.json")
+    cube_path = os.path.join(tmp_dir, CUBE_FILE)
+    if vocab_seed and os.path.exists(vocab_seed):
+        shutil.copy(vocab_seed, vocab_path)
+
+    # 失败时删除临时目录，不留下不完整的版本
+    try:
+        # 已在工作进程中，清洗不再另开进程池
+        df = clean_files(input_paths, data_path, workers=1, store_dir=store_path_for(data_path),
+                         vocab_path=vocab_path, cube_path=cube_path)
+        perform_analysis(data_path, os.path.join(tmp_dir, REPORT_FILE), n_jobs=n_jobs)
+        visualize_data(data_path, os.path.join(tmp_dir, "figures"),
+                       df=df[[col for col in ANALYSIS_COLUMNS if col in df.columns]], cube=load_cube(cube_path))
+
+        published = [REPORT_FILE, CUBE_FILE] + sorted(
+            os.path.join("figures", name) for name in os.listdir(os.path.join(tmp_dir, "figures"))
+            if name.endswith('.png'))
+        manifest = {
+            "release": os.path.basename(release_dir),
+            "inputs": sorted(input_paths),
+            "rows": len(df),
+            "skipped_files": df.attrs.get("skipped_files", []),
+            "files": {name: file_hash(os.path.join(tmp_dir, name)) for name in published},
+            "build_seconds": time.perf_counter() - start,
+        }
+        save_json(manifest, os.path.join(tmp_dir, MANIFEST_FILE))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(release_dir, ignore_errors=True)
+    os.rename(tmp_dir, release_dir)
+    return manifest
+
+
+class ReportService:
+    """
+    监视raw_dir并在service_dir下发布版本：
+      releases/<版本>/   某一时刻原始数据的完整处理结果（报告、立方体、图表、manifest.json）
+      current.json       当前版本的清单，先写临时文件再os.replace，读者总是看到完整的旧版本或新版本
+    目录扫描、排队和HTTP请求在同一个事件循环中；清洗和分析在最多workers个进程中运行，
+    正在运行的任务占满进程池时不再从队列取事件，队列满时扫描暂停（背压）
+    多个任务并行时按提交顺序发布，先提交的任务晚完成时不覆盖较新的版本
+    """
+
+    def __init__(self, raw_dir=RAW_DATA_DIR, service_dir=SERVICE_DIR, workers=1,
+                 poll_seconds=DEFAULT_POLL_SECONDS, queue_size=DEFAULT_QUEUE_SIZE, keep_releases=KEEP_RELEASES):
+        self.raw_dir = raw_dir
+        self.service_dir = service_dir
+        self.releases_dir = os.path.join(service_dir, RELEASES_DIR)
+        self.current_path = os.path.join(service_dir, CURRENT_FILE)
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.keep_releases = keep_releases
+        self.current = self._load_current()
+        # 已排队处理的文件签名；启动时若已有版本，则视其输入为已处理
+        self.seen = {}
+        self.sequence = 0
+        self.published_sequence = -1
+        self.running = 0
+        self.builds = 0
+        self.last_error = None
+        self.queue = None
+        self.slots = None
+        self.pool = None
+        self.address = None
+        # 正在运行的重算任务；事件循环只保留任务的弱引用，需在此持有直到完成
+        self.tasks = set()
+
+    def _load_current(self):
+        if not os.path.exists(self.current_path):
+            return None
+        with open(self.current_path) as f:
+            return json.load(f)
+
+    def _release_path(self, name):
+        return os.path.join(self.releases_dir, name)
+
+    def start(self):
+        os.makedirs(self.releases_dir, exist_ok=True)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.slots = asyncio.Semaphore(self.workers)
+        # spawn：事件循环和读文件的线程已经启动，fork出的子进程可能继承被占用的锁
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context('spawn'),
+                                        initializer=init_worker)
+        if self.current:
+            self.seen = {path: tuple(sig) for path, sig in self.current.get("signatures", {}).items()}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    # ---- 监视与排队 ----
+
+    async def scan_once(self, previous):
+        """
+        扫描一次目录：两次扫描之间大小和修改时间都未变的文件视为已写完；
+        与已处理的签名不同（新增、改写）或已被删除的文件放入队列，队列满时在此等待
+        返回本次扫描的签名，作为下一次的previous
+        """
+        current = scan_inputs(self.raw_dir)
+        stable = {path: sig for path, sig in current.items() if previous.get(path) == sig}
+        changed = [path for path, sig in stable.items() if self.seen.get(path) != sig]
+        removed = [path for path in self.seen if path not in current]
+        for path in changed:
+            self.seen[path] = stable[path]
+        for path in removed:
+            del self.seen[path]
+        for path in sorted(changed) + sorted(removed):
+            await self.queue.put(path)
+        return current
+
+    async def watch(self):
+        previous = {}
+        while True:
+            previous = await self.scan_once(previous)
+            await asyncio.sleep(self.poll_seconds)
+
+    async def dispatch(self):
+        """
+        有空闲的进程时取出队列中的全部事件合并为一个任务：
+        每个任务处理提交时所有已写完的文件，任务运行期间到达的多个文件只触发一次重算
+        """
+        while True:
+            await self.slots.acquire()
+            try:
+                changed = [await self.queue.get()]
+                while not self.queue.empty():
+                    changed.append(self.queue.get_nowait())
+            except BaseException:
+                self.slots.release()
+                raise
+            task = asyncio.create_task(self.rebuild(changed))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    # ---- 计算与发布 ----
+
+    async def rebuild(self, changed=()):
+        """
+        在进程池中为当前已写完的全部文件生成新版本并发布；返回清单，没有输入或失败时返回None
+        输入文件全部被删除时撤下当前版本（见withdraw），端点返回503，而不是继续提供已不存在的数据的报告
+        调用前需已取得一个进程名额（self.slots），结束时释放
+        """
+        try:
+            signatures = dict(self.seen)
+            sequence = self.sequence
+            self.sequence += 1
+            if not signatures:
+                if self.current is not None:
+                    self.withdraw(sequence)
+                return None
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{sequence:04d}"
+            vocab_seed = (os.path.join(self._release_path(self.current["release"]), "vocabularies.json")
+                          if self.current else None)
+            print(f"[service] 版本 {name}: {len(changed)} 个文件变化，处理 {len(signatures)} 个文件")
+            self.running += 1
+            loop = asyncio.get_running_loop()
+            try:
+                manifest = await loop.run_in_executor(
+                    self.pool, build_release, sorted(signatures), self._release_path(name), vocab_seed,
+                    1 if self.workers > 1 else -1)
+            except Exception as e:
+                self.last_error = {"release": name, "error": f"{type(e).__name__}: {e}",
+                                   "time": formatdate(usegmt=True)}
+                print(f"[service] 版本 {name} 生成失败: {self.last_error['error']}")
+                return None
+            finally:
+                self.running -= 1
+            self.builds += 1
+            if sequence < self.published_sequence:
+                print(f"[service] 版本 {name} 已有更新的版本发布，跳过")
+                return manifest
+            self.publish(dict(manifest, signatures=signatures, published=formatdate(usegmt=True)), sequence)
+            await loop.run_in_executor(None, self.prune)
+            return manifest
+        finally:
+            self.slots.release()
+
+    def publish(self, manifest, sequence):
+        """
+        原子地切换当前版本：写临时文件后os.replace为current.json，再更新内存中的当前版本
+        """
+        tmp_path = self.current_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp_path, self.current_path)
+        self.current = manifest
+        self.published_sequence = sequence
+        self.last_error = None
+        print(f"[service] 已发布版本 {manifest['release']}（{manifest['rows']} 条记录，"
+              f"{manifest['build_seconds']:.1f}s）")
+
+    def withdraw(self, sequence):
+        """
+        删除current.json，不再提供任何版本；先提交、晚完成的任务同样不会重新发布旧数据的版本
+        版本目录留给prune清理
+        """
+        if os.path.exists(self.current_path):
+            os.remove(self.current_path)
+        print(f"[service] 输入文件已全部删除，撤下版本 {self.current['release']}")
+        self.current = None
+        self.published_sequence = sequence
+
+    def prune(self):
+        # 删除当前版本之外最旧的版本，只保留最近keep_releases个；不删除仍在生成的临时目录
+        current = self.current["release"] if self.current else None
+        names = sorted(name for name in os.listdir(self.releases_dir) if not name.endswith('.tmp'))
+        for name in names[:-self.keep_releases]:
+            if name != current:
+                shutil.rmtree(self._release_path(name), ignore_errors=True)
+
+    # ---- HTTP ----
+
+    def status(self):
+        current = self.current or {}
+        return {
+            "release": current.get("release"),
+            "published": current.get("published"),
+            "rows": current.get("rows"),
+            "inputs": len(current.get("inputs", [])),
+            "watching": self.raw_dir,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "running": self.running,
+            "builds": self.builds,
+            "last_error": self.last_error,
+        }
+
+    @staticmethod
+    def resolve(current, target):
+        """
+        请求路径 -> 版本中的文件：/report、/cube、/figures/<名称>；返回 (相对路径, 内容哈希) 或None
+        """
+        routes = {"/report": REPORT_FILE, "/cube": CUBE_FILE}
+        name = routes.get(target)
+        if name is None and target.startswith("/figures/"):
+            name = os.path.join("figures", os.path.basename(target[len("/figures/"):]))
+        digest = current["files"].get(name) if name else None
+        return (name, digest) if digest else None
+
+    async def respond(self, method, target, headers):
+        """
+        返回 (状态码, 响应头, 响应体)
+        文件响应带ETag（文件内容哈希），请求的If-None-Match与之相同时返回304；
+        当前版本在请求开始时确定，之后发布的新版本不影响本次响应
+        """
+        if method not in ('GET', 'HEAD'):
+            return 405, {"Allow": "GET, HEAD"}, b""
+        target = target.split('?', 1)[0]
+        if target in ("/", "/status"):
+            body = json.dumps(self.status(), indent=4, ensure_ascii=False).encode()
+            return 200, {"Content-Type": "application/json; charset=utf-8", "Cache-Control": "no-store"}, body
+        current = self.current
+        if current is None:
+            return 503, {"Retry-After": str(int(self.poll_seconds) + 1)}, b"no release published\n"
+        found = self.resolve(current, target)
+        if found is None:
+            return 404, {}, b"not found\n"
+        name, digest = found
+        etag = f'"{digest[:32]}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Release": current["release"]}
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            return 304, cache_headers, b""
+        path = os.path.join(self._release_path(current["release"]), name)
+        body = await asyncio.get_running_loop().run_in_executor(None, _read_bytes, path)
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        return 200, dict(cache_headers, **{"Content-Type": content_type}), body
+
+    async def handle(self, reader, writer):
+        # 每个连接处理一个请求（HTTP/1.1，Connection: close）
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode('latin-1').partition(":")
+                headers[key.strip().lower()] = value.strip()
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                code, extra, body = 400, {}, b"bad request\n"
+                method = 'GET'
+            else:
+                method = parts[0]
+                code, extra, body = await self.respond(method, parts[1], headers)
+            head = [f"HTTP/1.1 {code} {STATUS_TEXT[code]}", f"Date: {formatdate(usegmt=True)}",
+                    f"Content-Length: {len(body)}", "Connection: close"]
+            head += [f"{key}: {value}" for key, value in extra.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # ---- 入口 ----
+
+    async def serve(self, host='127.0.0.1', port=SERVICE_PORT):
+        """
+        同时运行目录监视、任务分派和HTTP端点，直到被取消
+        """
+        self.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        # port为0时由系统分配端口，实际地址记录在address中
+        self.address = server.sockets[0].getsockname()[:2]
+        print(f"[service] 监视 {self.raw_dir}，版本目录 {self.service_dir}，"
+              f"HTTP端点 http://{self.address[0]}:{self.address[1]}/status")
+        try:
+            async with server:
+                await asyncio.gather(self.watch(), self.dispatch(), server.serve_forever())
+        finally:
+            self.close()
+
+    async def run_once(self):
+        """
+        处理一次目录中的全部文件并发布（不监视、不启动HTTP端点），返回清单
+        """
+        self.start()
+        try:
+            self.seen = scan_inputs(self.raw_dir)
+            await self.slots.acquire()
+            return await self.rebuild(list(self.seen))
+        finally:
+            self.close()
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="监视原始数据目录，自动重算并通过本地HTTP端点发布报告")
+    parser.add_argument('--raw-dir', default=RAW_DATA_DIR, help="监视的原始数据目录（其中的*.csv）")
+    parser.add_argument('--service-dir', default=SERVICE_DIR, help="版本目录和current.json的位置")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=1, help="同时运行的重算任务数（进程数）")
+    parser.add_argument('--poll', type=float, default=DEFAULT_POLL_SECONDS, help="扫描目录的间隔（秒）")
+    parser.add_argument('--once', action='store_true', help="处理一次目录中的文件并发布后退出")
+    args = parser.parse_args()
+
+    service = ReportService(args.raw_dir, args.service_dir, args.workers, args.poll)
+    try:
+        if args.once:
+            asyncio.run(service.run_once())
+        else:
+            asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("[service] 已停止")
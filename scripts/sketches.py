@@ -0,0 +1,341 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from incremental import PriceMoments, PRICE_COLUMNS
+
+# 近似统计模式：一次遍历数据，保存可合并的概要（sketch），内存占用与行数无关
+# HyperLogLog寄存器数为2^HLL_PRECISION，相对标准误差 1.04/sqrt(2^p)，p=12时约1.6%
+HLL_PRECISION = 12
+# KLL的k：归一化秩误差约1.3%（99%置信，与Apache DataSketches的KLL一致），每个概要最多约3k个值
+KLL_K = 200
+DISTINCT_COLUMNS = ['City', 'Type', 'Variety']
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+GROUP_QUANTILES = [0.25, 0.5, 0.75]
+
+
+def sketch_path_for(csv_path):
+    """
+    处理后CSV对应的概要文件，例如 data/processed_data.csv -> data/processed_data_sketches.npz
+    """
+    return os.path.splitext(csv_path)[0] + "_sketches.npz"
+
+
+def _hash_values(values):
+    # 64位哈希：类别列只哈希类别再按编码取出，整数列（如Variety编码）按int64哈希，其余按对象哈希
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        hashes = pd.util.hash_array(values.cat.categories.to_numpy(dtype=object))
+        return hashes[codes[codes >= 0]]
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return pd.util.hash_array(values.to_numpy(dtype=np.int64))
+    values = values.dropna().to_numpy(dtype=object)
+    return pd.util.hash_array(values)
+
+
+class HyperLogLog:
+    """
+    不同取值个数的HyperLogLog估计：哈希值的前p位选择寄存器，其余位的前导零个数+1取最大值
+    相对标准误差 1.04/sqrt(2^p)；估计值小于 2.5·2^p 且有空寄存器时改用线性计数，小基数时几乎精确
+    两个概要逐寄存器取最大值即可合并，与在合并后的数据上直接计算完全相同
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    def update(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return self
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        rest = (hashes & np.uint64((1 << width) - 1)).astype(np.float64)
+        # p >= 11时剩余位数不超过53，转为float64无舍入，frexp的指数即有效位数
+        rank = (width + 1 - np.frexp(rest)[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return raw
+
+
+class KLLSketch:
+    """
+    分位数的KLL概要：第h层的值各代表2^h行，层满时把该层排序后随机取奇数位或偶数位的一半升到上一层
+    各层容量自顶向下按2/3递减（最小8），总大小约3k；归一化秩误差约1.3%（k=200，99%置信）
+    最小值和最大值精确记录；合并时逐层拼接后重新压缩，误差界与直接在合并后的数据上构建相同
+    """
+
+    def __init__(self, k=KLL_K, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - 1 - level
+        return max(8, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # 奇数个时留下最大的一个，其余成对压缩，总权重不变
+            keep = items[len(items) - len(items) % 2:]
+            promoted = items[self._rng.integers(2):len(items) - len(items) % 2:2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # 新增一层后下层容量变小，从底层重新检查
+            level = 0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        if not other.n:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, q):
+        """
+        近似分位数（按秩取保留值中累计权重首次达到q·n的值），0和1对应精确的最小/最大值
+        """
+        q = np.asarray(q, dtype=np.float64)
+        if not self.n:
+            return np.full(q.shape, np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values, cumulative = values[order], np.cumsum(weights[order])
+        index = np.minimum(np.searchsorted(cumulative, q * self.n, side='left'), len(values) - 1)
+        result = values[index]
+        result = np.where(q <= 0, self.min, result)
+        return np.where(q >= 1, self.max, result)
+
+    def to_arrays(self):
+        sizes = np.array([len(items) for items in self.levels], dtype=np.int64)
+        return np.concatenate([[self.n, self.min, self.max], sizes, np.concatenate(self.levels)])
+
+    @classmethod
+    def from_arrays(cls, data, n_levels, k=KLL_K):
+        sketch = cls(k)
+        sketch.n, sketch.min, sketch.max = int(data[0]), data[1], data[2]
+        sizes = data[3:3 + n_levels].astype(np.int64)
+        sketch.levels = np.split(data[3 + n_levels:], np.cumsum(sizes)[:-1])
+        return sketch
+
+
+def _group_slices(labels):
+    # 按标签排序后各组的连续片段：返回 (排序下标, 各组边界, 组标签)，缺失标签不属于任何组
+    codes, uniques = pd.factorize(labels)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return order, bounds, uniques
+
+
+class StatisticsSketch:
+    """
+    一组可合并的概要，用于在常数内存下生成分析报告：
+    - City/Type/Variety的不同取值数（HyperLogLog）
+    - Low/High/Avg Price整体、按City、按月份（YYYY-MM）的分位数（KLL）
+    - 样本数、均值、标准差、最值、相关性和月度均价（incremental.PriceMoments，可精确合并）
+    不保存任何类别取值集合，占用内存和文件大小与类别基数无关；概要可保存为npz并跨文件、跨日期合并
+    """
+
+    def __init__(self, precision=HLL_PRECISION, k=KLL_K):
+        self.precision = precision
+        self.k = k
+        self.distinct = {col: HyperLogLog(precision) for col in DISTINCT_COLUMNS}
+        # (价格列, 分组维度, 分组取值) -> KLLSketch；整体的分组维度和取值为 ('All', '')
+        self.quantiles = {}
+        self.stats = PriceMoments()
+
+    def _sketch(self, key):
+        if key not in self.quantiles:
+            self.quantiles[key] = KLLSketch(self.k, seed=len(self.quantiles))
+        return self.quantiles[key]
+
+    def update(self, df):
+        """
+        累加一块处理后的数据（需包含Date、City、Type、Variety和三个价格列）
+        City和月份各分组一次，三个价格列共用同样的分组片段，每组一次批量更新
+        """
+        if not len(df):
+            return self
+        for col in DISTINCT_COLUMNS:
+            self.distinct[col].update(_hash_values(df[col]))
+        # 按月份分组（日期截到月初，NaT不属于任何组），组标签为 'YYYY-MM'
+        months = df['Date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]')
+        month_order, month_bounds, month_starts = _group_slices(months)
+        groups = [('City', *_group_slices(df['City'])),
+                  ('Month', month_order, month_bounds,
+                   np.datetime_as_string(np.asarray(month_starts, dtype='datetime64[M]'), unit='M'))]
+        for measure in PRICE_COLUMNS:
+            values = df[measure].to_numpy(dtype=np.float64)
+            self._sketch((measure, 'All', '')).update(values)
+            for dimension, order, bounds, labels in groups:
+                for i, label in enumerate(labels):
+                    self._sketch((measure, dimension, str(label))).update(values[order[bounds[i]:bounds[i + 1]]])
+        self.stats.update(df)
+        return self
+
+    def merge(self, other):
+        for col in DISTINCT_COLUMNS:
+            self.distinct[col].merge(other.distinct[col])
+        for key, sketch in other.quantiles.items():
+            self._sketch(key).merge(sketch)
+        self.stats.merge(other.stats)
+        return self
+
+    def _group_quantiles(self, dimension):
+        groups = sorted(label for measure, dim, label in self.quantiles if dim == dimension and measure == 'Avg Price')
+        return {
+            label: dict(
+                rows=int(self.quantiles[('Avg Price', dimension, label)].n),
+                **{measure: _quantile_dict(self.quantiles[(measure, dimension, label)], GROUP_QUANTILES)
+                   for measure in PRICE_COLUMNS if (measure, dimension, label) in self.quantiles}
+            )
+            for label in groups
+        }
+
+    def report_sections(self):
+        """
+        生成与perform_analysis相同格式的概览、价格统计、相关性和月度趋势（不同取值数为HyperLogLog估计），
+        以及approximate_statistics部分：整体和按城市、按月份的价格分位数
+        """
+        sections = self.stats.report_sections()
+        if not sections:
+            return {}
+        distinct = {col: int(round(self.distinct[col].estimate())) for col in DISTINCT_COLUMNS}
+        sections["overview"]["unique_cities"] = distinct['City']
+        sections["overview"]["unique_types"] = distinct['Type']
+        statistics = sections["price_statistics"]
+        statistics["avg_price_min"] = _price(statistics["avg_price_min"])
+        statistics["avg_price_max"] = _price(statistics["avg_price_max"])
+        sections["approximate_statistics"] = {
+            "error_bounds": {
+                "distinct_relative_std_error": round(1.04 / np.sqrt(1 << self.precision), 4),
+                "quantile_normalized_rank_error": round(0.013 * KLL_K / self.k, 4),
+            },
+            "distinct_counts": distinct,
+            "price_quantiles": {
+                measure: _quantile_dict(self.quantiles[(measure, 'All', '')], QUANTILES)
+                for measure in PRICE_COLUMNS if (measure, 'All', '') in self.quantiles
+            },
+            "by_city": self._group_quantiles('City'),
+            "by_month": self._group_quantiles('Month'),
+        }
+        return sections
+
+    def save(self, path):
+        """
+        原子地写出npz：HyperLogLog寄存器、各KLL概要的扁平数组，以及JSON格式的参数、键和PriceMoments
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        keys = list(self.quantiles)
+        meta = json.dumps({
+            "precision": self.precision,
+            "k": self.k,
+            "quantile_keys": [list(key) for key in keys],
+            "levels": [len(self.quantiles[key].levels) for key in keys],
+            "stats": self.stats.to_dict(),
+        }, ensure_ascii=False)
+        arrays = {f"hll_{col}": self.distinct[col].registers for col in DISTINCT_COLUMNS}
+        arrays.update({f"kll_{i}": self.quantiles[key].to_arrays() for i, key in enumerate(keys)})
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, meta=np.array(meta), **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            sketch = cls(meta["precision"], meta["k"])
+            for col in DISTINCT_COLUMNS:
+                sketch.distinct[col].registers = data[f"hll_{col}"]
+            for i, (key, n_levels) in enumerate(zip(meta["quantile_keys"], meta["levels"])):
+                sketch.quantiles[tuple(key)] = KLLSketch.from_arrays(data[f"kll_{i}"], n_levels, meta["k"])
+        sketch.stats = PriceMoments.from_dict(meta["stats"])
+        return sketch
+
+
+def _price(value):
+    # 分位数和最值都是原列中的某个值，按float32的最短十进制表示输出（与compute_statistics一致）
+    return float(str(np.float32(value)))
+
+
+def _quantile_dict(sketch, quantiles):
+    return {f"p{int(round(q * 100)):02d}": _price(value) for q, value in zip(quantiles, sketch.quantiles(quantiles))}
+
+
+def build_sketches(chunks, precision=HLL_PRECISION, k=KLL_K):
+    """
+    一次遍历数据块，返回StatisticsSketch
+    """
+    sketch = StatisticsSketch(precision, k)
+    for chunk in chunks:
+        sketch.update(chunk)
+    return sketch
+
+
+if __name__ == "__main__":
+    import argparse
+    from configuration import PROCESSED_DATA_PATH
+    from column_store import iter_processed
+    from data_analysis import ANALYSIS_COLUMNS
+
+    parser = argparse.ArgumentParser(description="构建、合并可合并的统计概要，并由概要生成近似统计报告")
+    parser.add_argument('paths', nargs='*', default=[PROCESSED_DATA_PATH],
+                        help="处理后的CSV（按块读取）或已保存的概要文件（.npz，直接合并）")
+    parser.add_argument('--out', default=sketch_path_for(PROCESSED_DATA_PATH), help="合并后的概要文件")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    merged = StatisticsSketch()
+    for path in args.paths:
+        if path.endswith('.npz'):
+            merged.merge(StatisticsSketch.load(path))
+        else:
+            merged.merge(build_sketches(iter_processed(path, ANALYSIS_COLUMNS, args.chunk_rows)))
+    merged.save(args.out)
+    print(json.dumps(merged.report_sections().get("approximate_statistics", {}), indent=4, ensure_ascii=False))
+    print(f"概要已保存至: {args.out}")
@@ -0,0 +1,116 @@
+import os
+
+from configuration import (RAW_DATA_PATH, PROCESSED_DATA_PATH, PROCESSED_STORE_DIR, PROCESSED_CUBE_PATH,
+                           PROCESSED_MARKETS_DIR, PROCESSED_FORECASTS_DIR, VOCABULARY_PATH, REPORT_PATH,
+                           FIGURES_DIR, MODEL_DIR, PIPELINE_CACHE_DIR)
+from utility import save_json, ensure_dir
+from pipeline import Stage, Pipeline, PipelineContext
+import profiling
+
+# 完整流水线的各阶段，main.py和cli.py all共用；各阶段的code列出其结果依赖的模块，改动后该阶段重新运行
+# 模块顶层只导入标准库、配置和流水线框架，pandas等在阶段运行时才导入
+
+
+def build_pipeline(chunksize=None, workers=1, engine='forest', max_rows=None):
+    """
+    清洗 → 分析 / 市场统计 / 预测 / 建模 / 可视化 → 报告
+    各阶段共享同一份数据表，只在需要时加载一次；各阶段的依赖（包括pandas）在阶段运行时才导入，被缓存跳过的阶段不加载
+    """
+    def clean(ctx):
+        from data_cleaning import clean_data
+        from data_analysis import ANALYSIS_COLUMNS
+        df = clean_data(RAW_DATA_PATH, PROCESSED_DATA_PATH, chunksize=chunksize,
+                        store_dir=PROCESSED_STORE_DIR, cube_path=PROCESSED_CUBE_PATH)
+        # 整表模式直接复用清洗结果，流式模式由后续阶段从列式存储加载
+        if df is not None:
+            ctx.set_frame(df[[col for col in ANALYSIS_COLUMNS if col in df.columns]])
+        return {"processed_data": PROCESSED_DATA_PATH, "store": PROCESSED_STORE_DIR,
+                "cube": PROCESSED_CUBE_PATH}
+
+    def analyze(ctx):
+        from data_analysis import compute_statistics
+        return compute_statistics(ctx.frame)
+
+    def markets(ctx):
+        from market_stats import analyze_markets
+        from vocabulary import load_vocabularies
+        return analyze_markets(ctx.frame, load_vocabularies(VOCABULARY_PATH), PROCESSED_MARKETS_DIR)
+
+    def forecast(ctx):
+        from forecast import forecast_markets
+        from vocabulary import load_vocabularies
+        return forecast_markets(ctx.frame, load_vocabularies(VOCABULARY_PATH), PROCESSED_FORECASTS_DIR)
+
+    def model(ctx):
+        from model import train_and_evaluate
+        from evaluate import plot_predictions
+        from vocabulary import load_vocabularies
+        df = ctx.frame
+        if not ({'City', 'Type', 'Avg Price'}.issubset(df.columns) and len(df) > 100):
+            return "缺少必要列或数据量不足"
+        # 训练失败时异常向上传递：该阶段不写缓存，下次运行重新训练
+        ml_results = train_and_evaluate(df, load_vocabularies(VOCABULARY_PATH), model_dir=MODEL_DIR,
+                                        engine=engine, max_rows=max_rows)
+        plot_predictions(
+            ml_results["sample_predictions"]["actual"],
+            ml_results["sample_predictions"]["predicted"],
+            os.path.join(FIGURES_DIR, "price_predictions.png")
+        )
+        return ml_results
+
+    def visualize(ctx):
+        from visualization import visualize_data
+        from cube import load_cube
+        # 与cli.py plot相同，立方体早于处理后的CSV（如清洗时未生成立方体）时不使用，改为从数据表绘图
+        cube = load_cube(PROCESSED_CUBE_PATH, PROCESSED_DATA_PATH)
+        visualize_data(PROCESSED_DATA_PATH, FIGURES_DIR, df=ctx.frame,
+                       workers=workers, only_changed=True, cube=cube)
+        return {"figures_dir": FIGURES_DIR}
+
+    def report(ctx):
+        results = dict(ctx.results["analyze"])
+        results["market_statistics"] = ctx.results["markets"]
+        results["forecast"] = ctx.results["forecast"]
+        results["machine_learning"] = ctx.results["model"]
+        if profiling.is_enabled():
+            results["performance"] = profiling.performance_section()
+        ensure_dir(os.path.dirname(REPORT_PATH))
+        save_json(results, REPORT_PATH)
+        print("分析完成，结果已保存至:", REPORT_PATH)
+        return {"report": REPORT_PATH}
+
+    figures = ['price_over_time.png', 'city_avg_price.png', 'type_price_distribution.png',
+               'price_correlation.png', 'price_distribution.png']
+    stages = [
+        Stage("clean", clean, params={"output": PROCESSED_DATA_PATH},
+              artifacts=[PROCESSED_DATA_PATH, PROCESSED_CUBE_PATH],
+              code=["data_cleaning", "schema", "package_units", "vocabulary", "column_store", "cube"]),
+        Stage("analyze", analyze, deps=["clean"], code=["data_analysis", "column_store"]),
+        Stage("markets", markets, deps=["clean"], params={"output": PROCESSED_MARKETS_DIR},
+              artifacts=[PROCESSED_MARKETS_DIR], code=["market_stats", "column_store"]),
+        Stage("forecast", forecast, deps=["clean"], params={"output": PROCESSED_FORECASTS_DIR},
+              artifacts=[PROCESSED_FORECASTS_DIR], code=["forecast", "market_stats", "column_store"]),
+        Stage("model", model, deps=["clean"], params={"min_rows": 100, "model_dir": MODEL_DIR,
+                                                            "engine": engine, "max_rows": max_rows},
+              artifacts=[os.path.join(FIGURES_DIR, "price_predictions.png"),
+                         os.path.join(MODEL_DIR, "latest.json")],
+              code=["model", "schema", "vocabulary", "evaluate"]),
+        Stage("visualize", visualize, deps=["clean"], params={"figures_dir": FIGURES_DIR},
+              artifacts=[os.path.join(FIGURES_DIR, name) for name in figures],
+              code=["visualization", "cube", "histograms"]),
+        # 开启性能分析时报告多一个performance部分，开关变化后不复用缓存的报告
+        Stage("report", report, deps=["analyze", "markets", "forecast", "model"],
+              params={"report": REPORT_PATH, "profile": profiling.is_enabled()},
+              artifacts=[REPORT_PATH]),
+    ]
+    return Pipeline(stages, RAW_DATA_PATH, PIPELINE_CACHE_DIR)
+
+
+def run_pipeline(targets=None, force=False, chunksize=None, workers=1, engine='forest', max_rows=None):
+    def load():
+        from data_analysis import load_data, ANALYSIS_COLUMNS
+        return load_data(PROCESSED_DATA_PATH, ANALYSIS_COLUMNS)
+
+    pipeline = build_pipeline(chunksize, workers, engine, max_rows)
+    context = PipelineContext(load)
+    return pipeline.run(context, targets=targets, force=force)
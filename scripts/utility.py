@@ -1,9 +1,20 @@
 import os
 import json
+import hashlib
 
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
 def save_json(data, path):
     with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
\ No newline at end of file
+        json.dump(data, f, indent=4)
+
+def file_hash(path, block_size=1 << 20):
+    """
+    按块计算文件内容的SHA-256哈希
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -2,117 +2,307 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import json
+import hashlib
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from data_analysis import load_data, ANALYSIS_COLUMNS
+from cube import load_cube, cube_path_for
+from histograms import price_histogram, iter_chunks
+import profiling
+from profiling import step, profiled
 
-def visualize_data(data_path, figures_dir):
+PAYLOAD_HASH_FILE = ".payload_hashes.json"
+# 行数达到该值时，类型分布图和价格分布图改为先分箱汇总再绘图，绘图耗时只与桶数有关
+BINNED_MIN_ROWS = 1_000_000
+
+
+def binned_payloads(df, n_bins=30):
     """
-    生成南瓜价格数据的可视化图表
+    大数据的类型分布图和价格分布图：一次遍历按Type累积细粒度价格直方图（见histograms），
+    再由它得到前10类型的箱线图统计量、展示用直方图和分箱KDE（按计数缩放，与histplot的kde一致）
     """
-    # 读取处理后的数据
-    df = pd.read_csv(data_path)
+    histogram = price_histogram(iter_chunks(df), group='Type' if 'Type' in df.columns else None)
+    if not histogram.counts.sum():
+        # 没有有效价格（如空数据表）时与build_payloads一样给出空的绘图数据
+        payloads = {'price_distribution.png': (
+            'price_distribution_binned',
+            (pd.DataFrame({'left': [], 'right': [], 'count': []}), pd.Series([], dtype=np.float64)))}
+        if 'Type' in df.columns:
+            payloads['type_price_distribution.png'] = ('type_price_box_binned', pd.DataFrame())
+        return payloads
+    payloads = {}
+    if 'Type' in df.columns:
+        counts = histogram.group_counts()
+        top_types = [label for label in counts.index if label is not None and counts[label] > 0][:10]
+        payloads['type_price_distribution.png'] = (
+            'type_price_box_binned', pd.DataFrame(histogram.box_stats(top_types)))
+    edges, counts = histogram.histogram(n_bins)
+    x, density = histogram.kde()
+    bins = pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'count': counts})
+    kde = pd.Series(density * counts.sum() * (edges[1] - edges[0]), index=x)
+    payloads['price_distribution.png'] = ('price_distribution_binned', (bins, kde))
+    return payloads
 
-    # 确保输出目录存在
-    os.makedirs(figures_dir, exist_ok=True)
+
+def build_payloads(df, cube=None, binned=None):
+    """
+    为每张图准备绘图所需的小数据（按月重采样序列、城市均值、前10类型子集、相关矩阵、价格序列）
+    传入聚合立方体（cube.PriceCube）时，月度趋势和城市均值直接从立方体查询，不再扫描数据表
+    binned为True（为None时按行数是否达到BINNED_MIN_ROWS判断）时类型分布图和价格分布图使用分箱汇总，见binned_payloads
+    返回 {图片文件名: (绘图函数名, 数据)}，缺少列的图跳过并给出警告
+    """
+    payloads = {}
+    if binned is None:
+        binned = len(df) >= BINNED_MIN_ROWS
 
     # 1. 时间序列分析 - 所有城市的平均价格趋势
-    plt.figure(figsize=(12, 6))
-    # 确保日期列是日期类型
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
-        df.set_index('Date', inplace=True)
-        df['Avg Price'].resample('M').mean().plot()
-        plt.title('南瓜平均价格随时间变化')
-        plt.ylabel('平均价格')
-        plt.xlabel('日期')
-        plt.tight_layout()
-        plt.savefig(os.path.join(figures_dir, 'price_over_time.png'))
-        plt.close()
+    if cube is not None:
+        payloads['price_over_time.png'] = ('price_over_time', cube.monthly_mean())
+    elif 'Date' in df.columns:
+        monthly = pd.Series(df['Avg Price'].to_numpy(), index=pd.to_datetime(df['Date']))
+        payloads['price_over_time.png'] = ('price_over_time', monthly.resample('M').mean())
     else:
         print("警告: 缺少日期列，无法生成时间序列图")
 
-    #2 城市平均价格条形图
-    plt.figure(figsize=(10, 6))
-    if 'City' in df.columns and 'Avg Price' in df.columns:
-        city_avg = df.groupby('City')['Avg Price'].mean().sort_values(ascending=False)
-        sns.barplot(
-            x=city_avg.values,
-            y=city_avg.index,
-            palette='viridis'
-        )
-        plt.title('平均南瓜价格按城市排名')
-        plt.xlabel('平均价格')
-        plt.ylabel('城市')
-        plt.tight_layout()
-        plt.savefig(os.path.join(figures_dir, 'city_avg_price.png'))
-        plt.close()
+    # 2. 城市平均价格条形图
+    if cube is not None:
+        city_avg = cube.query(by='City')['mean'].sort_values(ascending=False)
+        payloads['city_avg_price.png'] = ('city_avg_price', city_avg)
+    elif 'City' in df.columns and 'Avg Price' in df.columns:
+        city_avg = df.groupby('City', observed=True)['Avg Price'].mean().sort_values(ascending=False)
+        # 类别索引会让seaborn按类别顺序而不是均值顺序画条形
+        city_avg.index = city_avg.index.astype(object)
+        payloads['city_avg_price.png'] = ('city_avg_price', city_avg)
 
     # 3. 南瓜类型价格分布
-    plt.figure(figsize=(10, 6))
-    if 'Type' in df.columns and 'Avg Price' in df.columns:
+    if binned and 'Avg Price' in df.columns:
+        payloads.update(binned_payloads(df))
+    elif 'Type' in df.columns and 'Avg Price' in df.columns:
         # 只显示数量最多的前10种类型
         top_types = df['Type'].value_counts().nlargest(10).index
-        df_top = df[df['Type'].isin(top_types)]
-
-        sns.boxplot(
-            x='Type',
-            y='Avg Price',
-            data=df_top,
-            palette='Set3'
-        )
-        plt.title('不同类型南瓜的价格分布')
-        plt.xlabel('南瓜类型')
-        plt.ylabel('平均价格')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(figures_dir, 'type_price_distribution.png'))
-        plt.close()
+        df_top = df.loc[df['Type'].isin(top_types), ['Type', 'Avg Price']]
+        if isinstance(df_top['Type'].dtype, pd.CategoricalDtype):
+            df_top = df_top.assign(Type=df_top['Type'].cat.remove_unused_categories())
+        payloads['type_price_distribution.png'] = ('type_price_distribution', df_top.reset_index(drop=True))
     else:
         print("警告: 缺少类型或平均价格列，无法生成类型分布图")
 
     # 4. 价格相关性热力图
-    plt.figure(figsize=(10, 8))
     if {'Low Price', 'High Price', 'Avg Price'}.issubset(df.columns):
         numeric_cols = ['Low Price', 'High Price', 'Avg Price']
-        corr = df[numeric_cols].corr()
-        sns.heatmap(
-            corr,
-            annot=True,
-            cmap='coolwarm',
-            fmt=".2f",
-            linewidths=.5
-        )
-        plt.title('价格相关性热力图')
-        plt.tight_layout()
-        plt.savefig(os.path.join(figures_dir, 'price_correlation.png'))
-        plt.close()
+        payloads['price_correlation.png'] = ('price_correlation', df[numeric_cols].corr())
     else:
         print("警告: 缺少价格列，无法生成相关性热力图")
 
-    # 5. 价格分布直方图
+    # 5. 价格分布直方图（KDE需要原始价格，只传这一列；分箱模式已在第3步生成）
+    if 'Avg Price' not in df.columns:
+        print("警告: 缺少平均价格列，无法生成价格分布图")
+    elif not binned:
+        payloads['price_distribution.png'] = ('price_distribution', df['Avg Price'].reset_index(drop=True))
+
+    return payloads
+
+
+def plot_price_over_time(monthly):
+    plt.figure(figsize=(12, 6))
+    monthly.plot()
+    plt.title('南瓜平均价格随时间变化')
+    plt.ylabel('平均价格')
+    plt.xlabel('日期')
+
+
+def plot_city_avg_price(city_avg):
+    plt.figure(figsize=(10, 6))
+    sns.barplot(
+        x=city_avg.values,
+        y=city_avg.index,
+        palette='viridis'
+    )
+    plt.title('平均南瓜价格按城市排名')
+    plt.xlabel('平均价格')
+    plt.ylabel('城市')
+
+
+def plot_type_price_distribution(df_top):
+    plt.figure(figsize=(10, 6))
+    sns.boxplot(
+        x='Type',
+        y='Avg Price',
+        data=df_top,
+        palette='Set3'
+    )
+    plt.title('不同类型南瓜的价格分布')
+    plt.xlabel('南瓜类型')
+    plt.ylabel('平均价格')
+    plt.xticks(rotation=45)
+
+
+def plot_price_correlation(corr):
+    plt.figure(figsize=(10, 8))
+    sns.heatmap(
+        corr,
+        annot=True,
+        cmap='coolwarm',
+        fmt=".2f",
+        linewidths=.5
+    )
+    plt.title('价格相关性热力图')
+
+
+def plot_price_distribution(prices):
     plt.figure(figsize=(10, 6))
-    if 'Avg Price' in df.columns:
-        sns.histplot(
-            df['Avg Price'],
-            bins=30,
-            kde=True,
-            color='skyblue'
-        )
-        plt.title('南瓜价格分布')
-        plt.xlabel('平均价格')
-        plt.ylabel('频率')
-        plt.tight_layout()
-        plt.savefig(os.path.join(figures_dir, 'price_distribution.png'))
-        plt.close()
+    sns.histplot(
+        prices,
+        bins=30,
+        kde=True,
+        color='skyblue'
+    )
+    plt.title('南瓜价格分布')
+    plt.xlabel('平均价格')
+    plt.ylabel('频率')
+
+
+def plot_type_price_box_binned(stats):
+    plt.figure(figsize=(10, 6))
+    ax = plt.gca()
+    # 没有数据时只画空的坐标轴（bxp不接受空列表）
+    if len(stats):
+        boxes = ax.bxp(stats.to_dict('records'), showfliers=False, patch_artist=True)
+        for box, color in zip(boxes['boxes'], sns.color_palette('Set3', len(stats))):
+            box.set_facecolor(color)
+    plt.title('不同类型南瓜的价格分布')
+    plt.xlabel('南瓜类型')
+    plt.ylabel('平均价格')
+    plt.xticks(rotation=45)
+
+
+def plot_price_distribution_binned(summary):
+    bins, kde = summary
+    plt.figure(figsize=(10, 6))
+    plt.bar(bins['left'], bins['count'], width=bins['right'] - bins['left'], align='edge',
+            color='skyblue', edgecolor='white', alpha=0.75)
+    plt.plot(kde.index, kde.to_numpy(), color='skyblue')
+    plt.title('南瓜价格分布')
+    plt.xlabel('平均价格')
+    plt.ylabel('频率')
+
+
+PLOTTERS = {
+    'price_over_time': plot_price_over_time,
+    'city_avg_price': plot_city_avg_price,
+    'type_price_distribution': plot_type_price_distribution,
+    'price_correlation': plot_price_correlation,
+    'price_distribution': plot_price_distribution,
+    'type_price_box_binned': plot_type_price_box_binned,
+    'price_distribution_binned': plot_price_distribution_binned,
+}
+
+
+def render_figure(kind, payload, path):
+    """
+    绘制单张图并保存，可在子进程中调用
+    """
+    PLOTTERS[kind](payload)
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+    return path
+
+
+def init_render_worker():
+    # 子进程无界面渲染
+    plt.switch_backend('Agg')
+
+
+def payload_hash(kind, payload):
+    """
+    绘图数据的内容哈希，用于判断图片是否需要重新生成
+    """
+    digest = hashlib.sha256(kind.encode())
+    if isinstance(payload, tuple):
+        for part in payload:
+            digest.update(payload_hash(kind, part).encode())
+    elif isinstance(payload, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(payload, index=True).to_numpy().tobytes())
+        digest.update(repr(list(payload.columns) if isinstance(payload, pd.DataFrame) else payload.name).encode())
     else:
-        print("警告: 缺少平均价格列，无法生成价格分布图")
+        digest.update(np.ascontiguousarray(payload).tobytes())
+    return digest.hexdigest()
+
 
-    print(f"可视化图表已保存至: {figures_dir}")
+def _load_hashes(figures_dir):
+    path = os.path.join(figures_dir, PAYLOAD_HASH_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@profiled()
+def visualize_data(data_path, figures_dir, df=None, workers=1, only_changed=False, cube=None, binned=None):
+    """
+    生成南瓜价格数据的可视化图表
+    传入df时直接使用该数据表，不再从data_path读取
+    传入cube时月度趋势图和城市均值图由聚合立方体查询得到
+    binned见build_payloads：大数据时分布图由分箱汇总绘制，不把整列价格交给seaborn
+    workers大于1时在进程池中并行渲染（Agg后端）；
+    only_changed为True时只重新生成绘图数据有变化或图片缺失的图
+    """
+    # 读取处理后的数据（优先使用列式存储，只读取绘图用到的列）
+    if df is None:
+        with step("load_data") as record:
+            df = load_data(data_path, ANALYSIS_COLUMNS)
+            record["rows_out"] = len(df)
+
+    # 确保输出目录存在
+    os.makedirs(figures_dir, exist_ok=True)
+
+    with step("build_payloads", rows_in=len(df)):
+        payloads = build_payloads(df, cube, binned)
+    hashes = {name: payload_hash(kind, payload) for name, (kind, payload) in payloads.items()}
+    previous = _load_hashes(figures_dir) if only_changed else {}
+    tasks = [
+        (kind, payload, os.path.join(figures_dir, name))
+        for name, (kind, payload) in payloads.items()
+        if not (previous.get(name) == hashes[name] and os.path.exists(os.path.join(figures_dir, name)))
+    ]
+
+    if workers and workers > 1 and len(tasks) > 1:
+        with step("render_parallel"):
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=init_render_worker) as pool:
+                list(pool.map(render_figure, *zip(*tasks)))
+    else:
+        for kind, payload, path in tasks:
+            with step(f"render:{os.path.basename(path)}"):
+                render_figure(kind, payload, path)
+
+    with open(os.path.join(figures_dir, PAYLOAD_HASH_FILE), 'w') as f:
+        json.dump(hashes, f, indent=4)
+
+    print(f"可视化图表已保存至: {figures_dir}（生成 {len(tasks)} 张，跳过 {len(payloads) - len(tasks)} 张）")
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成南瓜价格可视化图表")
+    parser.add_argument('--workers', type=int, default=1, help="并行渲染的进程数")
+    parser.add_argument('--only-changed', action='store_true', help="只重新生成数据有变化的图")
+    parser.add_argument('--binned', action=argparse.BooleanOptionalAction, default=None,
+                        help=f"分布图使用（--no-binned：不使用）分箱汇总绘制，默认在行数达到 {BINNED_MIN_ROWS:,} 时自动使用")
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.enable_from_args(args)
+
     # 路径设置
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_path = os.path.join(base_dir, 'data', 'processed_data.csv')
     figures_dir = os.path.join(base_dir, 'reports', 'figures')
 
-    visualize_data(data_path, figures_dir)
\ No newline at end of file
+    # 与处理后数据同时生成的聚合立方体（不存在或已过期时从数据表计算）
+    cube = load_cube(cube_path_for(data_path), data_path)
+    visualize_data(data_path, figures_dir, workers=args.workers, only_changed=args.only_changed, cube=cube,
+                   binned=args.binned)
+    if profiling.is_enabled():
+        profiling.print_summary()
@@ -0,0 +1,77 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# 保留编码：'Other'以及未知/缺失值统一编码为0
+OTHER = 'Other'
+OTHER_CODE = 0
+
+
+class Vocabulary:
+    """
+    单列的稳定类别字典：取值只追加不删除，已分配的编码永远不变
+    编码通过pd.Index的哈希查找向量化完成，不在字典中的值编码为OTHER_CODE
+    """
+
+    def __init__(self, values=None):
+        self.values = [OTHER]
+        self._known = {OTHER}
+        self._index = None
+        self.add(values if values is not None else [])
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, values):
+        """
+        追加新取值（忽略缺失值和已有取值），返回新增的个数
+        """
+        added = 0
+        for value in values:
+            if pd.isna(value) or value in self._known:
+                continue
+            self._known.add(value)
+            self.values.append(value)
+            added += 1
+        if added:
+            self._index = None
+        return added
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = pd.Index(self.values, dtype=object)
+        return self._index
+
+    def encode(self, values):
+        codes = self.index.get_indexer(pd.Index(np.asarray(values, dtype=object)))
+        codes[codes < 0] = OTHER_CODE
+        return codes.astype(np.int16)
+
+    def decode(self, codes):
+        return np.asarray(self.values, dtype=object)[np.asarray(codes)]
+
+
+def load_vocabularies(path):
+    """
+    读取类别字典文件，不存在时返回空字典
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {col: Vocabulary(values) for col, values in data.items()}
+
+
+def save_vocabularies(vocabularies, path):
+    """
+    原子地写出类别字典文件
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({col: vocabulary.values for col, vocabulary in vocabularies.items()}, f,
+                  indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# 与各脚本相同，以 scripts 目录中的模块名直接导入
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(ROOT_DIR, 'scripts')
+BENCH_DIR = os.path.join(ROOT_DIR, 'benchmarks')
+RAW_DATA_PATH = os.path.join(ROOT_DIR, 'data', 'US-pumpkins.csv')
+sys.path.insert(0, SCRIPTS_DIR)
+# 基准测试脚本（如run_benchmarks）中的比较逻辑同样按模块名导入
+sys.path.insert(0, BENCH_DIR)
@@ -0,0 +1,30 @@
+import json
+
+from conftest import RAW_DATA_PATH
+from analysis import perform_analysis
+from data_cleaning import clean_data
+from result_cache import ResultCache
+
+
+def _report(path):
+    with open(path) as f:
+        report = json.load(f)
+    # cache部分记录命中/未命中次数，两次运行本来就不同
+    return report, report.pop("cache")
+
+
+def test_cached_report_equals_recompute(tmp_path, capsys):
+    data_path, report_path = str(tmp_path / 'processed_data.csv'), str(tmp_path / 'reports' / 'report.json')
+    clean_data(RAW_DATA_PATH, data_path)
+    cache = ResultCache(str(tmp_path / 'cache'))
+
+    perform_analysis(data_path, report_path, cache=cache)
+    cold, cold_stats = _report(report_path)
+    assert cold_stats["hits"] == 0 and "machine_learning" in cold and not isinstance(cold["machine_learning"], str)
+
+    # 重新打开缓存，所有章节命中，报告与重新计算的结果完全一致
+    perform_analysis(data_path, report_path, cache=ResultCache(str(tmp_path / 'cache')))
+    warm, warm_stats = _report(report_path)
+    # machine_learning章节命中时不再读取price_model条目
+    assert warm_stats["misses"] == 0 and set(warm_stats["sections"].values()) == {"hit"}
+    assert warm == cold
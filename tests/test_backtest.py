@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+from backtest import make_folds
+from model import build_regressor
+
+
+def _dates(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 400, rows), unit='D')
+    return np.sort(dates.to_numpy())
+
+
+@pytest.mark.parametrize('window,min_train_periods', [(None, 1), (None, 3), (2, 1), (1, 4)])
+def test_make_folds_train_precedes_test(window, min_train_periods):
+    dates = _dates()
+    periods = pd.PeriodIndex(dates, freq='M')
+    folds = make_folds(dates, 'M', window, min_train_periods)
+
+    assert len(folds) == len(periods.unique()) - min_train_periods
+    for fold in folds:
+        (a, b), (c, d) = fold["train"], fold["test"]
+        # 训练集紧接在测试集之前，且时间上不重叠
+        assert a < b == c < d
+        assert dates[b - 1] < dates[c]
+        assert set(periods[c:d].astype(str)) == {fold["test_period"]}
+        assert periods[b - 1] < periods[c]
+        n_train_periods = len(periods[a:b].unique())
+        if window is None:
+            assert a == 0
+        else:
+            assert n_train_periods <= window
+    # 测试集依次覆盖训练期之后的所有行
+    assert folds[-1]["test"][1] == len(dates)
+    assert [f["test"][0] for f in folds[1:]] == [f["test"][1] for f in folds[:-1]]
+
+
+@pytest.mark.parametrize('kwargs', [{'min_train_periods': 0}, {'min_train_periods': -1},
+                                    {'window': 0}, {'window': -2}])
+def test_make_folds_rejects_invalid_counts(kwargs):
+    with pytest.raises(ValueError):
+        make_folds(_dates(), 'M', **kwargs)
+
+
+def test_make_folds_too_few_periods():
+    dates = _dates()
+    n_periods = len(pd.PeriodIndex(dates, freq='M').unique())
+    assert make_folds(dates, 'M', min_train_periods=n_periods) == []
+
+
+def test_make_folds_rejects_unsorted_dates():
+    with pytest.raises(ValueError):
+        make_folds(_dates()[::-1], 'M')
+
+
+def _prices(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 120, rows), unit='D'),
+        'City': rng.choice(['BOSTON', 'BALTIMORE'], rows),
+        'Type': rng.choice(['Organic', None], rows),
+        'Avg Price': rng.gamma(4, 40, rows),
+    })
+
+
+@pytest.mark.parametrize('workers,n_jobs', [(1, -1), (2, 1)])
+def test_backtest_uses_one_core_per_model_only_in_the_pool(monkeypatch, workers, n_jobs):
+    # 线程池中initializer设置的全局变量在主进程可见，记录各fold模型使用的核数
+    monkeypatch.setattr(backtest, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    cores = []
+    monkeypatch.setattr(backtest, 'build_regressor',
+                        lambda n_jobs: cores.append(n_jobs) or build_regressor(n_jobs=n_jobs))
+    report = backtest.backtest(_prices(), workers=workers)
+    assert report["aggregate"]["n_folds"] == len(cores) == 3
+    assert set(cores) == {n_jobs}
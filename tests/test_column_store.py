@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_store import (SCHEMA_FILE, ColumnStoreWriter, write_store, read_store, iter_store,
+                          store_is_fresh, load_processed)
+from schema import apply_schema
+
+
+def _frame():
+    return pd.DataFrame({
+        'Date': pd.to_datetime(['2016-09-24', '2017-01-02', None, '2016-10-01']),
+        'City': pd.Categorical(['BOSTON', np.nan, 'BALTIMORE', 'BOSTON']),
+        'Type': ['Organic', None, 'Organic', 'Organic'],
+        'Package': ['24 inch bins', '36 inch bins', '24 inch bins', None],
+        'Low Price': np.array([270.0, np.nan, 15.5, 0.25], dtype=np.float32),
+        'Price_per_L': [1.0, np.nan, 0.1, np.inf],
+        'Variety': np.array([1, 0, 3, 2], dtype=np.int16),
+    })
+
+
+def _as_object(df):
+    # 类别表的顺序与原表不同，按取值比较
+    return df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+
+
+def test_round_trip_keeps_dtypes_categories_and_missing_values(tmp_path):
+    df = _frame()
+    write_store(df, str(tmp_path / 'store'))
+    result = read_store(str(tmp_path / 'store'))
+
+    assert list(result.columns) == list(df.columns)
+    assert result['Date'].dtype == 'datetime64[ns]' and pd.isna(result['Date'][2])
+    assert result['Low Price'].dtype == np.float32 and result['Variety'].dtype == np.int16
+    for col in ['City', 'Type', 'Package']:
+        assert isinstance(result[col].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(_as_object(result), _as_object(df.astype({'Type': 'category',
+                                                                            'Package': 'category'})))
+    assert list(read_store(str(tmp_path / 'store'), ['Variety', 'missing']).columns) == ['Variety']
+
+
+def test_appended_chunks_match_single_write(tmp_path):
+    df = _frame()
+    writer = ColumnStoreWriter(str(tmp_path / 'chunked'))
+    writer.append(df.iloc[:1])
+    writer.append(df.iloc[1:])
+    writer.close()
+    write_store(df, str(tmp_path / 'whole'))
+
+    chunked = read_store(str(tmp_path / 'chunked'))
+    pd.testing.assert_frame_equal(chunked, read_store(str(tmp_path / 'whole')))
+    pd.testing.assert_frame_equal(pd.concat(iter_store(str(tmp_path / 'chunked'), chunk_rows=3),
+                                            ignore_index=True), chunked)
+
+
+def test_version_mismatch_is_rejected(tmp_path):
+    df = apply_schema(_frame())
+    csv_path = tmp_path / 'processed_data.csv'
+    df.to_csv(csv_path, index=False)
+    store_dir = str(tmp_path / 'processed_data_store')
+    write_store(df, store_dir)
+    assert store_is_fresh(store_dir, str(csv_path))
+
+    schema_path = os.path.join(store_dir, SCHEMA_FILE)
+    with open(schema_path) as f:
+        schema = json.load(f)
+    del schema["version"]
+    with open(schema_path, 'w') as f:
+        json.dump(schema, f)
+
+    with pytest.raises(ValueError):
+        read_store(store_dir)
+    with pytest.raises(ValueError):
+        next(iter_store(store_dir))
+    # load_processed不使用旧格式的存储，回退到解析CSV
+    assert not store_is_fresh(store_dir, str(csv_path))
+    pd.testing.assert_frame_equal(_as_object(load_processed(str(csv_path))), _as_object(df))
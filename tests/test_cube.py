@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import PriceCube, load_cube
+from vocabulary import Vocabulary, OTHER
+
+
+def _frame(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2016-07-01') + pd.to_timedelta(rng.integers(0, 500, rows), unit='D')
+    prices = rng.gamma(4, 40, rows)
+    prices[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'Date': dates,
+        'City': rng.choice(['BOSTON', 'BALTIMORE', 'CHICAGO', 'DETROIT'], rows),
+        'Type': rng.choice(['Organic', None], rows, p=[0.3, 0.7]),
+        'Variety': rng.integers(1, 4, rows).astype(np.int16),
+        'Avg Price': prices,
+    })
+
+
+def _cube(df):
+    vocabularies = {'City': Vocabulary(sorted(df['City'].unique())), 'Type': Vocabulary(['Organic']),
+                    'Variety': Vocabulary(['PIE TYPE', 'HOWDEN TYPE', 'MINIATURE'])}
+    return PriceCube.from_frame(df, vocabularies)
+
+
+def _grouped(df, by):
+    # 与立方体相同：缺失的Type归入'Other'，月份为Period
+    df = df.dropna(subset=['Avg Price']).assign(Type=lambda d: d['Type'].fillna(OTHER),
+                                                Month=lambda d: d['Date'].dt.to_period('M'))
+    return df.groupby(by)['Avg Price'].agg(['count', 'mean', 'std', 'min', 'max'])
+
+
+@pytest.mark.parametrize('by', [['City'], ['City', 'Month'], ['Month', 'Type']])
+def test_rollup_matches_pandas_groupby(by):
+    df = _frame()
+    result = _cube(df).query(by=by)
+    expected = _grouped(df, by)
+    result = result.sort_index()
+    assert list(result.index) == list(expected.index)
+    np.testing.assert_array_equal(result['count'], expected['count'])
+    for column in ('mean', 'std', 'min', 'max'):
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-9)
+
+
+def test_slice_and_month_range_match_filtered_frame():
+    df = _frame()
+    summary = _cube(df).query(city=['BOSTON', 'CHICAGO', 'UNKNOWN'], type_='Organic', start='2016-09', end='2016-10')
+    selected = df[df['City'].isin(['BOSTON', 'CHICAGO']) & (df['Type'] == 'Organic')
+                  & (df['Date'] >= '2016-09-01') & (df['Date'] < '2016-11-01')]['Avg Price'].dropna()
+    assert summary['count'] == len(selected)
+    assert summary['mean'] == pytest.approx(selected.mean(), rel=1e-12)
+    assert summary['std'] == pytest.approx(selected.std(), rel=1e-9)
+    assert (summary['min'], summary['max']) == (selected.min(), selected.max())
+
+    # 字典中没有的取值不匹配任何格子
+    assert _cube(df).query(city='UNKNOWN')['count'] == 0
+
+
+def test_monthly_mean_matches_resample():
+    df = _frame()
+    df = df[df['Date'].dt.month != 3]
+    series = _cube(df).monthly_mean(city='BOSTON')
+    boston = df[df['City'] == 'BOSTON'].dropna(subset=['Avg Price'])
+    expected = boston.set_index('Date')['Avg Price'].resample('M').mean()
+    # 没有数据的月份为NaN
+    assert series.isna().sum() == expected.isna().sum() > 0
+    pd.testing.assert_series_equal(series, expected, check_names=False, check_freq=False, rtol=1e-12)
+
+
+def test_merge_equals_cube_of_concatenated_frames():
+    df = _frame()
+    first, second = df.iloc[:700], df.iloc[700:]
+    merged = _cube(first).merge(_cube(second))
+    whole = _cube(df)
+    pd.testing.assert_frame_equal(merged.query(by=['City', 'Month']), whole.query(by=['City', 'Month']))
+
+
+def test_load_cube_rejects_cube_older_than_csv(tmp_path):
+    cube_path, csv_path = tmp_path / 'data_cube.npz', tmp_path / 'data.csv'
+    _cube(_frame(100)).save(str(cube_path))
+    csv_path.write_text('Date\n')
+    stamp = cube_path.stat().st_mtime
+    os.utime(csv_path, (stamp + 10, stamp + 10))
+    assert load_cube(str(cube_path), str(csv_path)) is None
+    assert load_cube(str(cube_path)).query()['count'] > 0
+
+
+def test_cube_stores_only_occupied_cells_as_vocabularies_grow(tmp_path):
+    df = _frame()
+    small = _cube(df)
+    # 字典只追加：大量新的城市和品种使完整形状成倍增长，但保存的格子数只取决于有数据的组合
+    vocabularies = {'City': Vocabulary(sorted(df['City'].unique()) + [f'CITY {i}' for i in range(100000)]),
+                    'Type': Vocabulary(['Organic']),
+                    'Variety': Vocabulary(['PIE TYPE', 'HOWDEN TYPE', 'MINIATURE'] + [f'V{i}' for i in range(1000)])}
+    large = PriceCube.from_frame(df, vocabularies)
+    assert np.prod(large.shape, dtype=np.int64) > 10 ** 9
+    assert len(large.cells) == len(small.cells) <= len(df)
+    pd.testing.assert_frame_equal(large.query(by=['City', 'Month']), small.query(by=['City', 'Month']))
+
+    # 与按旧字典构建的立方体合并时换算到新坐标系
+    merged = small.merge(PriceCube.from_frame(df.iloc[:10], vocabularies))
+    assert merged.shape == large.shape
+    assert merged.query()['count'] == small.query()['count'] + df['Avg Price'].iloc[:10].notna().sum()
+
+    path = str(tmp_path / 'cube.npz')
+    large.save(path)
+    pd.testing.assert_frame_equal(load_cube(path).query(by='Variety'), large.query(by='Variety'))
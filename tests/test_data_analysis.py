@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RAW_DATA_PATH
+from data_cleaning import clean_data
+from data_analysis import (compute_statistics, summarize_data, price_statistics, monthly_price_trend,
+                           price_correlation, PRICE_COLUMNS)
+
+
+# 原来逐项扫描数据表的实现，作为对照
+def _summarize(df):
+    return {
+        "total_records": len(df),
+        "start_date": str(df['Date'].min()),
+        "end_date": str(df['Date'].max()),
+        "unique_cities": df['City'].nunique(),
+        "unique_types": df['Type'].nunique(),
+    }
+
+
+def _price_statistics(df):
+    return {
+        "low_price_mean": df['Low Price'].mean(),
+        "high_price_mean": df['High Price'].mean(),
+        "avg_price_mean": df['Avg Price'].mean(),
+        "avg_price_std": df['Avg Price'].std(),
+        "avg_price_min": df['Avg Price'].min(),
+        "avg_price_max": df['Avg Price'].max(),
+    }
+
+
+def _monthly_price_trend(df):
+    df = df.assign(Date=pd.to_datetime(df['Date']))
+    monthly_avg = df.set_index('Date').resample('M')['Avg Price'].mean()
+    return {"months": monthly_avg.index.strftime('%Y-%m').tolist(), "prices": monthly_avg.values.tolist()}
+
+
+@pytest.fixture(scope='module')
+def processed(tmp_path_factory):
+    path = tmp_path_factory.mktemp('analysis') / 'processed_data.csv'
+    clean_data(RAW_DATA_PATH, str(path))
+    # 与原来的load_data相同，按默认类型读取CSV
+    return pd.read_csv(path)
+
+
+def _with_missing_prices(df, seed=0):
+    # 三列各自在不同的行上缺失，成对删除与整行删除的结果不同
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    for col in PRICE_COLUMNS:
+        df.loc[rng.random(len(df)) < 0.1, col] = np.nan
+    return df
+
+
+def _assert_matches_baseline(df):
+    statistics = compute_statistics(df)
+    assert statistics["overview"] == _summarize(df)
+    expected = _price_statistics(df)
+    assert statistics["price_statistics"] == pytest.approx(expected, rel=1e-12)
+
+    corr = df[PRICE_COLUMNS].corr().to_dict()
+    for col, row in corr.items():
+        assert statistics["price_correlation"][col] == pytest.approx(row, rel=1e-12)
+
+    trend = _monthly_price_trend(df)
+    assert statistics["monthly_price_trend"]["months"] == trend["months"]
+    np.testing.assert_allclose(statistics["monthly_price_trend"]["prices"], trend["prices"], rtol=1e-12)
+
+
+def test_statistics_match_baseline(processed):
+    _assert_matches_baseline(processed)
+
+
+def test_statistics_match_baseline_with_missing_prices(processed):
+    df = _with_missing_prices(processed)
+    _assert_matches_baseline(df)
+    # 整行删除会得到不同的相关系数
+    listwise = df[PRICE_COLUMNS].dropna().corr()
+    assert compute_statistics(df)["price_correlation"]['Low Price']['High Price'] != pytest.approx(
+        listwise.loc['Low Price', 'High Price'], rel=1e-9)
+
+
+def test_wrappers_reuse_precomputed_statistics(processed):
+    statistics = compute_statistics(processed)
+    # 传入结果时不再访问数据表
+    assert summarize_data(None, statistics) is statistics["overview"]
+    assert price_statistics(None, statistics) is statistics["price_statistics"]
+    assert monthly_price_trend(None, statistics) is statistics["monthly_price_trend"]
+    assert price_correlation(None, statistics) is statistics["price_correlation"]
+    assert price_statistics(processed) == statistics["price_statistics"]
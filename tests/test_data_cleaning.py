@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RAW_DATA_PATH
+from column_store import read_store
+from data_cleaning import convert_date, parse_dates, clean_data
+
+
+def _convert_rows(dates):
+    # 原来的逐行解析：convert_date无法解析时为None
+    return pd.to_datetime(dates.apply(convert_date))
+
+
+def test_parse_dates_matches_convert_date_on_raw_file():
+    dates = pd.read_csv(RAW_DATA_PATH, usecols=['Date'], dtype=object, encoding='utf-8-sig')['Date']
+    pd.testing.assert_series_equal(parse_dates(dates), _convert_rows(dates), check_names=False)
+
+
+def test_parse_dates_fallback_formats_and_malformed_values():
+    dates = pd.Series([
+        '2011/5/16', '9/24/16', '9/24/2016', '2011-05-16', '9-24-16', '9-24-2016',
+        ' 9/24/16 ', '2/29/2016', '2/30/2016', '13/45/2016', 'abc', '', None, np.nan, '9/24/16',
+    ], index=range(100, 115), name='Date')
+    result = parse_dates(dates)
+    pd.testing.assert_series_equal(result, _convert_rows(dates), check_names=False)
+    assert result.index.equals(dates.index)
+    assert result.iloc[:8].notna().all() and result.iloc[8:14].isna().all()
+
+
+def test_parse_dates_out_of_range_is_nat():
+    # convert_date能解析，但超出datetime64[ns]范围，清洗时视为无效
+    dates = pd.Series(['1/1/1500', '1/1/2016'])
+    assert convert_date(dates[0]) is not None
+    result = parse_dates(dates)
+    assert pd.isna(result[0]) and result[1] == pd.Timestamp('2016-01-01')
+
+
+def test_chunked_cleaning_matches_single_pass(tmp_path, capsys):
+    whole_dir, chunked_dir = tmp_path / 'whole', tmp_path / 'chunked'
+    whole_dir.mkdir()
+    chunked_dir.mkdir()
+    clean_data(RAW_DATA_PATH, str(whole_dir / 'processed_data.csv'), store_dir=str(whole_dir / 'store'))
+    clean_data(RAW_DATA_PATH, str(chunked_dir / 'processed_data.csv'), chunksize=97,
+               store_dir=str(chunked_dir / 'store'))
+
+    assert (whole_dir / 'vocabularies.json').read_text() == (chunked_dir / 'vocabularies.json').read_text()
+    pd.testing.assert_frame_equal(pd.read_csv(chunked_dir / 'processed_data.csv'),
+                                  pd.read_csv(whole_dir / 'processed_data.csv'))
+    pd.testing.assert_frame_equal(read_store(str(chunked_dir / 'store')), read_store(str(whole_dir / 'store')))
+
+
+def test_clean_data_keeps_rows_without_package_volume(tmp_path, capsys):
+    # 按重量、按个计价和未注明尺寸的箱无法换算容积，这些行保留，Package_L和Price_per_L为空
+    df = clean_data(RAW_DATA_PATH, str(tmp_path / 'processed_data.csv'))
+    assert len(df) == 1757
+    no_volume = df['Package_L'].isna()
+    assert no_volume.sum() == 128
+    assert set(df.loc[no_volume, 'Package_Unit']) == {'lb', 'each', 'bin'}
+    assert df.loc[no_volume, 'Price_per_L'].isna().all()
+    assert df.loc[~no_volume, 'Price_per_L'].notna().all()
+    assert df['Package_Unit'].value_counts().to_dict() == {
+        'inch bin': 1214, 'bushel': 415, 'lb': 98, 'each': 17, 'bin': 13}
+
+
+def _split_by_city(raw_dir):
+    # 每个城市一个原始文件，保留原始表头
+    raw = pd.read_csv(RAW_DATA_PATH, dtype=object, keep_default_na=False, encoding='utf-8-sig')
+    for i, (_, rows) in enumerate(raw.groupby('City Name', sort=True)):
+        rows.to_csv(raw_dir / f'city_{i:02d}.csv', index=False)
+    return raw['City Name'].nunique()
+
+
+def _sorted(df):
+    return df.sort_values(list(df.columns), ignore_index=True, na_position='first')
+
+
+@pytest.mark.parametrize('pattern', ['dir', 'glob'])
+def test_clean_files_matches_single_file(tmp_path, capsys, pattern):
+    raw_dir, single_dir, multi_dir = tmp_path / 'raw', tmp_path / 'single', tmp_path / 'multi'
+    for d in (raw_dir, single_dir, multi_dir):
+        d.mkdir()
+    n_files = _split_by_city(raw_dir)
+    # 表头不对的文件被跳过并记录，不影响其他文件
+    (raw_dir / 'city_zz.csv').write_text('foo,bar\n1,2\n', encoding='utf-8')
+
+    single = clean_data(RAW_DATA_PATH, str(single_dir / 'processed_data.csv'))
+    input_path = str(raw_dir) if pattern == 'dir' else str(raw_dir / 'city_*.csv')
+    multi = clean_data(input_path, str(multi_dir / 'processed_data.csv'), workers=2)
+
+    assert [os.path.basename(r["file"]) for r in multi.attrs["skipped_files"]] == ['city_zz.csv']
+    assert n_files + 1 == len(os.listdir(raw_dir))
+    assert (multi_dir / 'vocabularies.json').read_text() == (single_dir / 'vocabularies.json').read_text()
+    pd.testing.assert_frame_equal(_sorted(pd.read_csv(multi_dir / 'processed_data.csv')),
+                                  _sorted(pd.read_csv(single_dir / 'processed_data.csv')))
+    assert len(multi) == len(single)
+
+
+@pytest.mark.parametrize('rows', [0, 3])
+def test_chunked_cleaning_writes_header_without_valid_rows(tmp_path, capsys, rows):
+    # 只有表头，或所有行的日期都无效时，流式清洗与整表清洗一样写出表头
+    with open(RAW_DATA_PATH, encoding='utf-8-sig') as f:
+        header, line = f.readline(), f.readline()
+    raw_path = tmp_path / 'raw.csv'
+    raw_path.write_text(header + line.replace('4/29/17', 'not a date') * rows, encoding='utf-8')
+    whole_dir, chunked_dir = tmp_path / 'whole', tmp_path / 'chunked'
+    whole_dir.mkdir()
+    chunked_dir.mkdir()
+
+    clean_data(str(raw_path), str(whole_dir / 'processed_data.csv'), store_dir=str(whole_dir / 'store'))
+    clean_data(str(raw_path), str(chunked_dir / 'processed_data.csv'), chunksize=2,
+               store_dir=str(chunked_dir / 'store'))
+
+    assert (chunked_dir / 'processed_data.csv').read_text() == (whole_dir / 'processed_data.csv').read_text()
+    assert (whole_dir / 'processed_data.csv').read_text().startswith('Date,City,Type')
+    assert len(read_store(str(chunked_dir / 'store'))) == 0
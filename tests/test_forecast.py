@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecast import (backtest, forecast_markets, seasonal_naive, ridge_ar,
+                      MODELS, AR_LAGS, SEASON_WEEKS, HISTORY_WEEKS)
+
+
+def _periodic(n_series=6, history=HISTORY_WEEKS, seed=0):
+    # 每个序列重复一个随机的52周季节模式，没有趋势和噪声
+    rng = np.random.default_rng(seed)
+    profiles = rng.gamma(4, 40, (n_series, SEASON_WEEKS))
+    values = np.tile(profiles, (1, history // SEASON_WEEKS + 1))[:, :history]
+    # 只在最早的一年里留出缺失的周，回测用到的一年前的周都有数据
+    early = values[:, :history - 2 * SEASON_WEEKS]
+    early[rng.random(early.shape) < 0.1] = np.nan
+    return values
+
+
+def test_backtest_picks_seasonal_naive_on_periodic_series():
+    errors, best = backtest(_periodic(), horizon=4)
+    assert set(errors) == set(MODELS)
+    assert errors['seasonal_naive']['mae'] == pytest.approx(0.0, abs=1e-9)
+    assert errors['seasonal_naive']['mae'] < min(errors['ridge']['mae'], errors['ets']['mae'])
+    assert (best == 'seasonal_naive').all()
+
+
+def _frame(weeks, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2016-01-04') + pd.to_timedelta(np.arange(weeks) * 7, unit='D')
+    return pd.DataFrame({
+        'Date': np.tile(dates, 2),
+        'City': ['BOSTON'] * weeks + ['CHICAGO'] * weeks,
+        'Variety': np.ones(2 * weeks, dtype=np.int16),
+        'Avg Price': rng.gamma(4, 40, 2 * weeks),
+    })
+
+
+def test_forecast_markets_rejects_short_history():
+    df = _frame(30)
+    with pytest.raises(ValueError):
+        forecast_markets(df, horizon=4, history=4 + AR_LAGS)
+    with pytest.raises(ValueError):
+        forecast_markets(df, horizon=0)
+
+    # 最短的合法历史：训练区间恰好构造一个滞后样本
+    section = forecast_markets(df, horizon=4, history=4 + AR_LAGS + 1)
+    assert section["series"] == 2
+    assert all(np.isfinite(row["forecast"]) for row in section["next_week"])
+
+
+def test_ridge_ar_and_seasonal_naive_on_short_arrays():
+    values = np.arange(1.0, AR_LAGS + 2)[None, :]
+    assert ridge_ar(values, horizon=3).shape == (1, 3)
+    np.testing.assert_array_equal(seasonal_naive(values, horizon=3), [[AR_LAGS + 1] * 3])
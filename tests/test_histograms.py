@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from histograms import PriceHistogram, price_histogram, iter_chunks
+
+
+def _frame(rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.gamma(4, 40, rows)
+    prices[rng.random(rows) < 0.02] = np.nan
+    return pd.DataFrame({
+        'Avg Price': prices,
+        'Type': rng.choice(np.array(['Organic', None], dtype=object), rows, p=[0.2, 0.8]),
+    })
+
+
+def test_quantiles_within_bin_width():
+    df = _frame()
+    histogram = price_histogram(iter_chunks(df, 3000))
+    q = np.linspace(0, 1, 21)
+    for label in histogram.labels:
+        prices = df.loc[df['Type'].isna() if label is None else df['Type'] == label, 'Avg Price'].dropna()
+        exact = np.quantile(prices, q)
+        assert np.abs(histogram.quantiles(q, label) - exact).max() <= histogram.width
+
+
+def _assert_same(a, b):
+    assert a.width == b.width
+    assert set(a.labels) == set(b.labels)
+    for label in a.labels:
+        i, j = a.labels.index(label), b.labels.index(label)
+        np.testing.assert_array_equal(a.counts[i], b.counts[j])
+        assert a.min[i] == b.min[j] and a.max[i] == b.max[j]
+        assert a.total[i] == pytest.approx(b.total[j], rel=1e-12)
+        assert a.sumsq[i] == pytest.approx(b.sumsq[j], rel=1e-12)
+
+
+def test_merge_equals_fit_on_concatenated_data():
+    df = _frame()
+    # 两部分的价格范围和分组不同，合并时需要对齐桶宽并追加新分组
+    small = df.iloc[:8000].assign(**{'Avg Price': df['Avg Price'].iloc[:8000] / 50, 'Type': 'Organic'})
+    large = df.iloc[8000:]
+    whole = pd.concat([small, large])
+
+    expected = price_histogram([whole])
+    for first, second in [(small, large), (large, small)]:
+        merged = price_histogram([first]).merge(price_histogram([second]))
+        _assert_same(merged, expected)
+        assert merged.quantiles([0.1, 0.5, 0.9], 'Organic') == pytest.approx(
+            expected.quantiles([0.1, 0.5, 0.9], 'Organic'))
+
+    # 合并到空直方图
+    _assert_same(PriceHistogram().merge(expected), expected)
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SCRIPTS_DIR
+
+# 启动和解析参数时不允许加载的包；只检查加载了哪些模块，与机器快慢无关（耗时预算见benchmarks/bench_import_time.py）
+HEAVY = ['numpy', 'pandas', 'sklearn', 'joblib', 'matplotlib', 'seaborn']
+
+# 在新的解释器中运行code，之后输出已加载的顶层包
+REPORT = "\nimport json, sys\nprint(json.dumps(sorted({name.split('.')[0] for name in sys.modules})))"
+
+
+def loaded_packages(code):
+    result = subprocess.run([sys.executable, '-c', code + REPORT], cwd=SCRIPTS_DIR,
+                            capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def run_help(script_code):
+    # --help打印用法后以SystemExit退出，之后仍输出已加载的包
+    return f"import contextlib, io\ntry:\n    with contextlib.redirect_stdout(io.StringIO()):\n        {script_code}\nexcept SystemExit:\n    pass"
+
+
+@pytest.mark.parametrize('module', ['cli', 'configuration', 'main', 'stages', 'service'])
+def test_import_does_not_load_heavy_packages(module):
+    assert not set(HEAVY) & loaded_packages(f'import {module}')
+
+
+@pytest.mark.parametrize('command', ['all', 'analyze', 'model', 'plot'])
+def test_cli_help_does_not_load_heavy_packages(command):
+    loaded = loaded_packages(run_help(f"import cli; cli.main(['{command}', '--help'])"))
+    assert not set(HEAVY) & loaded
+
+
+def test_main_script_runs_once_without_heavy_packages():
+    code = run_help("import runpy; sys.argv = ['main.py', '--help']; runpy.run_path('main.py', run_name='__main__')")
+    loaded = loaded_packages('import sys\n' + code)
+    assert not set(HEAVY) & loaded
+    # cli.py all 从stages导入流水线，不会把main.py作为main模块再执行一次
+    assert 'main' not in loaded
+
+
+@pytest.mark.parametrize('module', ['data_analysis', 'analysis', 'result_cache'])
+def test_analysis_modules_do_not_load_sklearn_or_plotting(module):
+    assert not {'sklearn', 'joblib', 'matplotlib', 'seaborn'} & loaded_packages(f'import {module}')
@@ -0,0 +1,90 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import RAW_DATA_PATH
+from incremental import RunningStats, ingest
+from data_cleaning import clean_data
+from data_analysis import compute_statistics
+
+
+def _frame(cities, prices, dates):
+    prices = np.asarray(prices, dtype=np.float64)
+    return pd.DataFrame({
+        'Date': pd.to_datetime(dates),
+        'City': cities,
+        'Type': ['Organic'] * len(cities),
+        'Low Price': prices - 1,
+        'High Price': prices + 1,
+        'Avg Price': prices,
+    })
+
+
+def test_merge_into_empty_does_not_alias_source():
+    b = RunningStats.from_frame(_frame(['X', 'X', 'X'], [2.0, 2.5, 3.0], ['2020-01-01'] * 3))
+    c = RunningStats.from_frame(_frame(['Y', 'Y', 'Y'], [2.0, 2.5, 3.0], ['2020-01-15'] * 3))
+    before = b.to_dict()
+
+    a = RunningStats().merge(b).merge(c)
+
+    assert b.to_dict() == before
+    assert b.cities == {'X'}
+    assert a.count == 6 and a.cities == {'X', 'Y'}
+    assert list(a.monthly.values()) == [[15.0, 6]]
+
+
+def test_incremental_ingest_matches_full_recompute(tmp_path, capsys):
+    with open(RAW_DATA_PATH, encoding='utf-8') as f:
+        lines = f.readlines()
+    raw_path = tmp_path / 'raw.csv'
+    state_path, report_path = str(tmp_path / 'state.json'), str(tmp_path / 'report.json')
+
+    # 先处理前半部分，再追加其余行增量更新
+    half = len(lines) // 2
+    raw_path.write_text(''.join(lines[:half]), encoding='utf-8')
+    ingest([str(raw_path)], state_path, report_path)
+    with open(raw_path, 'a', encoding='utf-8') as f:
+        f.writelines(lines[half:])
+    report = ingest([str(raw_path)], state_path, report_path)
+
+    full = compute_statistics(clean_data(RAW_DATA_PATH, str(tmp_path / 'processed_data.csv')))
+    assert report["overview"] == full["overview"]
+    for key, value in full["price_statistics"].items():
+        assert report["price_statistics"][key] == pytest.approx(value, rel=1e-7)
+    for col, row in full["price_correlation"].items():
+        for key, value in row.items():
+            assert report["price_correlation"][col][key] == pytest.approx(value, rel=1e-9)
+    assert report["monthly_price_trend"]["months"] == full["monthly_price_trend"]["months"]
+    np.testing.assert_allclose(report["monthly_price_trend"]["prices"], full["monthly_price_trend"]["prices"],
+                               rtol=1e-9)
+
+
+def test_ingest_marks_unrecomputed_sections_stale(tmp_path, capsys):
+    with open(RAW_DATA_PATH, encoding='utf-8') as f:
+        lines = f.readlines()
+    raw_path = tmp_path / 'raw.csv'
+    state_path, report_path = str(tmp_path / 'state.json'), str(tmp_path / 'report.json')
+
+    half = len(lines) // 2
+    raw_path.write_text(''.join(lines[:half]), encoding='utf-8')
+    ingest([str(raw_path)], state_path, report_path)
+
+    # 模拟完整分析写入的章节
+    with open(report_path) as f:
+        report = json.load(f)
+    report["market_statistics"] = {"rolling": []}
+    report["forecast"] = {"markets": {}}
+    with open(report_path, 'w') as f:
+        json.dump(report, f)
+
+    # 没有新增数据时保持不变
+    unchanged = ingest([str(raw_path)], state_path, report_path)
+    assert unchanged["market_statistics"] == {"rolling": []}
+    assert unchanged["forecast"] == {"markets": {}}
+
+    with open(raw_path, 'a', encoding='utf-8') as f:
+        f.writelines(lines[half:])
+    report = ingest([str(raw_path)], state_path, report_path)
+    for section in ("market_statistics", "forecast", "machine_learning"):
+        assert isinstance(report[section], str) and "未重算" in report[section]
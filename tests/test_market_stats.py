@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from market_stats import weekly_prices, rolling_statistics, DEFAULT_WINDOW, DEFAULT_SPAN
+
+
+def _frame(rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    # 日期范围较长且稀疏，部分市场有没有数据的周
+    dates = pd.Timestamp('2016-07-01') + pd.to_timedelta(rng.integers(0, 400, rows), unit='D')
+    prices = rng.gamma(4, 40, rows)
+    prices[rng.random(rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        'Date': dates,
+        'City': rng.choice(['BOSTON', 'BALTIMORE', 'CHICAGO', 'DETROIT'], rows),
+        'Variety': rng.integers(1, 4, rows).astype(np.int16),
+        'Avg Price': prices,
+    })
+
+
+def test_weekly_prices_match_pandas_groupby():
+    df = _frame()
+    weekly = weekly_prices(df)
+    valid = df.dropna(subset=['Avg Price'])
+    expected = (valid.assign(Week=valid['Date'].dt.to_period('W-SUN').dt.start_time)
+                .groupby(['City', 'Variety', 'Week'])['Avg Price'].agg(['mean', 'size']))
+    assert len(weekly) == len(expected)
+    np.testing.assert_array_equal(weekly['City'].astype(str), expected.index.get_level_values('City'))
+    np.testing.assert_array_equal(weekly['Variety'], expected.index.get_level_values('Variety'))
+    np.testing.assert_array_equal(weekly['Week'], expected.index.get_level_values('Week'))
+    np.testing.assert_allclose(weekly['price'], expected['mean'], rtol=1e-12)
+    np.testing.assert_array_equal(weekly['rows'], expected['size'])
+
+
+def test_rolling_statistics_match_pandas_rolling():
+    rolling = rolling_statistics(weekly_prices(_frame()))
+
+    # 按日历计算的4周窗口 (t-28天, t]，每个 (City, Variety) 单独计算
+    expected = []
+    for _, group in rolling.groupby(['City', 'Variety'], observed=True, sort=False):
+        series = group.set_index('Week')['price']
+        window = series.rolling(f'{7 * DEFAULT_WINDOW}D')
+        expected.append(pd.DataFrame({
+            'count': window.count().to_numpy(),
+            'mean': window.mean().to_numpy(),
+            'std': window.std().to_numpy(),
+            'ewma': series.ewm(span=DEFAULT_SPAN).mean().to_numpy(),
+        }, index=group.index))
+    expected = pd.concat(expected).loc[rolling.index]
+
+    np.testing.assert_array_equal(rolling['rolling_weeks'], expected['count'])
+    np.testing.assert_allclose(rolling['rolling_mean'], expected['mean'], rtol=1e-9)
+    np.testing.assert_allclose(rolling['rolling_std'], expected['std'], rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(rolling['volatility'], expected['std'] / expected['mean'], rtol=1e-7, atol=1e-12)
+    np.testing.assert_allclose(rolling['ewma'], expected['ewma'], rtol=1e-12)
+    # 数据中确有缺周，否则日历窗口与按行数的窗口无法区分
+    gaps = rolling.groupby(['City', 'Variety'], observed=True)['Week'].diff() > pd.Timedelta(days=7)
+    assert gaps.sum() > 0
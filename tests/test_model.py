@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import (CellStatistics, FEATURES, build_model, compare_engines, holdout_mask, load_model,
+                   model_features, stratified_indices, train_and_evaluate, train_streaming)
+from vocabulary import Vocabulary
+
+
+def _frame(rows=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    # 城市和类型的频数差别很大，其中有只出现几次的组合
+    cities = rng.choice(['BOSTON', 'BALTIMORE', 'CHICAGO', 'DETROIT', 'MIAMI'], rows,
+                        p=[0.5, 0.3, 0.15, 0.049, 0.001])
+    types = rng.choice(np.array(['Organic', None], dtype=object), rows, p=[0.1, 0.9])
+    dates = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    prices = (100 + 20 * (cities == 'BOSTON') + 30 * pd.notna(types) + 5 * dates.month
+              + rng.normal(0, 10, rows))
+    return pd.DataFrame({'Date': dates, 'City': cities, 'Type': types, 'Avg Price': prices})
+
+
+def _vocabularies():
+    return {'City': Vocabulary(['BOSTON', 'BALTIMORE', 'CHICAGO']), 'Type': Vocabulary(['Organic'])}
+
+
+def _strata(df):
+    return set(zip(df['City'], df['Type'].fillna('<NA>')))
+
+
+@pytest.mark.parametrize('max_rows', [20, 100, 1000])
+def test_stratified_indices_respects_budget_and_keeps_strata(max_rows):
+    df = _frame()
+    sample = stratified_indices(df, max_rows)
+    assert len(sample) <= max_rows
+    assert np.all(np.diff(sample) > 0)
+    assert _strata(df.iloc[sample]) == _strata(df)
+    # 大的层按比例保留
+    if max_rows >= 100:
+        share = (df['City'].iloc[sample] == 'BOSTON').mean()
+        assert share == pytest.approx((df['City'] == 'BOSTON').mean(), abs=0.05)
+
+
+def test_stratified_indices_without_budget_keeps_all_rows():
+    df = _frame(200)
+    np.testing.assert_array_equal(stratified_indices(df, None), np.arange(200))
+    np.testing.assert_array_equal(stratified_indices(df, 500), np.arange(200))
+
+
+def test_train_and_evaluate_hist_and_max_rows():
+    df = _frame()
+    mask = holdout_mask(len(df))
+    full = train_and_evaluate(df, _vocabularies(), engine='hist')
+    sampled = train_and_evaluate(df, _vocabularies(), engine='hist', max_rows=500)
+
+    assert full["model_type"] == sampled["model_type"] == 'HistGradientBoostingRegressor'
+    assert full["train_size"] == (~mask).sum() and full["test_size"] == mask.sum()
+    assert sampled["train_size"] <= 500 and sampled["test_size"] == mask.sum()
+    assert full["r2_score"] > 0.5 and sampled["r2_score"] > 0.3
+
+
+def test_cell_statistics_match_groupby():
+    df = _frame()
+    X, y = model_features(df), df['Avg Price'].to_numpy()
+    cells = CellStatistics(compact_every=2)
+    for start in range(0, len(df), 700):
+        cells.partial_fit(X.iloc[start:start + 700], y[start:start + 700])
+    table = cells.table()
+
+    expected = (X.assign(sum=y, sumsq=y * y, count=1)
+                .groupby(FEATURES, dropna=False, observed=True)[['sum', 'sumsq', 'count']].sum().reset_index())
+    assert table['count'].sum() == len(df)
+
+    def normalized(cells):
+        # 缺失的类型统一为同一个键，再按特征排序比较
+        cells = cells.assign(City=cells['City'].astype(str), Type=cells['Type'].fillna('<NA>').astype(str))
+        return cells.sort_values(FEATURES, ignore_index=True)
+
+    table, expected = normalized(table), normalized(expected)
+    pd.testing.assert_frame_equal(table[FEATURES], expected[FEATURES], check_dtype=False)
+    np.testing.assert_array_equal(table['count'], expected['count'])
+    np.testing.assert_allclose(table['sum'], expected['sum'], rtol=1e-12)
+    np.testing.assert_allclose(table['sumsq'], expected['sumsq'], rtol=1e-12)
+
+
+def test_streaming_matches_row_level_hist(tmp_path):
+    df = _frame()
+    mask = holdout_mask(len(df))
+    chunks = (df.iloc[start:start + 700] for start in range(0, len(df), 700))
+    streamed = train_streaming(chunks, _vocabularies(), model_dir=str(tmp_path), test_mask=mask)
+    streamed_model, _ = load_model(str(tmp_path))
+
+    # 在原始行上以相同设置拟合：序数编码、min_samples_leaf=1、同一测试集
+    X, y = model_features(df), df['Avg Price'].to_numpy()
+    model = build_model(_vocabularies(), 'hist', native_categories=False)
+    model.set_params(regressor__min_samples_leaf=1)
+    model.fit(X[~mask], y[~mask])
+    pred = model.predict(X[mask])
+
+    np.testing.assert_allclose(streamed_model.predict(X[mask]), pred, rtol=1e-9, atol=1e-9)
+    mse = np.mean((y[mask] - pred) ** 2)
+    r2 = 1 - mse * mask.sum() / ((y[mask] - y[mask].mean()) ** 2).sum()
+    assert streamed["train_size"] == (~mask).sum() and streamed["test_size"] == mask.sum()
+    assert streamed["mean_squared_error"] == pytest.approx(mse, rel=1e-9)
+    assert streamed["r2_score"] == pytest.approx(r2, rel=1e-9)
+
+
+def test_compare_engines_use_one_test_set():
+    df = _frame()
+    table = compare_engines(df, _vocabularies(), max_rows=500, chunk_rows=700)
+    assert [row["engine"] for row in table] == ['forest', 'hist', 'hist_sampled', 'hist_streaming']
+    results = {row["engine"]: row for row in table}
+    # 各方式在同一组测试行上评估，整表的hist与流式hist的训练行数相同
+    assert results['hist']["train_size"] == results['hist_streaming']["train_size"]
+    assert {row["test_size"] for row in table} == {holdout_mask(len(df)).sum()}
+    assert results['hist_sampled']["train_size"] <= 500
+    assert all(np.isfinite(row["mean_squared_error"]) for row in table)
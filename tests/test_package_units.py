@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from package_units import (BUSHEL_LITERS, BIN_FOOTPRINT_SQ_IN, CUBIC_INCH_LITERS, parse_package,
+                           parse_quantity, normalize_packages)
+
+
+@pytest.mark.parametrize('package, quantity, unit, liters', [
+    ('bushel cartons', 1.0, 'bushel', BUSHEL_LITERS),
+    ('1 1/9 bushel cartons', 10 / 9, 'bushel', 10 / 9 * BUSHEL_LITERS),
+    ('1 1/9 bushel crates', 10 / 9, 'bushel', 10 / 9 * BUSHEL_LITERS),
+    ('1/2 bushel cartons', 0.5, 'bushel', 0.5 * BUSHEL_LITERS),
+    ('  Bushel   Baskets ', 1.0, 'bushel', BUSHEL_LITERS),
+    ('24 inch bins', 24.0, 'inch bin', 24 * BIN_FOOTPRINT_SQ_IN * CUBIC_INCH_LITERS),
+    ('36 inch bins', 36.0, 'inch bin', 36 * BIN_FOOTPRINT_SQ_IN * CUBIC_INCH_LITERS),
+    ('35 lb cartons', 35.0, 'lb', np.nan),
+    ('bins', 1.0, 'bin', np.nan),
+    ('each', 1.0, 'each', np.nan),
+])
+def test_rule_table(package, quantity, unit, liters):
+    result = parse_package(package)
+    assert result[0] == pytest.approx(quantity)
+    assert result[1] == unit
+    assert result[2] == pytest.approx(liters, nan_ok=True)
+
+
+@pytest.mark.parametrize('package', ['crate of pumpkins', '', None, np.nan, 'x/0 bushel cartons'])
+def test_unparseable_package_is_nan(package):
+    quantity, unit, liters = parse_package(package)
+    assert np.isnan(quantity) and unit is None and np.isnan(liters)
+
+
+def test_parse_quantity():
+    assert parse_quantity('') == 1.0
+    assert parse_quantity('1 1/9') == pytest.approx(10 / 9)
+    assert parse_quantity('2.5') == 2.5
+    assert np.isnan(parse_quantity('1/0'))
+
+
+def test_normalize_packages_matches_per_row_parse():
+    packages = pd.Series(['24 inch bins', None, 'each', '1/2 bushel cartons', 'unknown', '24 inch bins'],
+                         index=range(10, 16))
+    result = normalize_packages(packages)
+    assert result.index.equals(packages.index)
+    expected = pd.DataFrame([parse_package(value) for value in packages], index=packages.index,
+                            columns=['Package_Qty', 'Package_Unit', 'Package_L'])
+    pd.testing.assert_frame_equal(result, expected)
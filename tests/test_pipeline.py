@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from pipeline import Stage, Pipeline, PipelineContext
+
+
+def _pipeline(tmp_path, func):
+    input_path = tmp_path / 'raw.csv'
+    input_path.write_text('a,b\n1,2\n')
+    return Pipeline([Stage("model", func)], str(input_path), str(tmp_path / 'cache'))
+
+
+def test_failed_stage_is_not_cached(tmp_path, capsys):
+    def fail(ctx):
+        raise RuntimeError("训练失败")
+
+    with pytest.raises(RuntimeError):
+        _pipeline(tmp_path, fail).run(PipelineContext(lambda: None))
+    assert not (tmp_path / 'cache' / 'model.json').exists()
+
+    # 下次运行重新执行该阶段，而不是复用失败的结果
+    calls = []
+    results = _pipeline(tmp_path, lambda ctx: calls.append(1) or "缺少必要列或数据量不足").run(PipelineContext(None))
+    assert calls == [1] and results["model"] == "缺少必要列或数据量不足"
+    with open(tmp_path / 'cache' / 'manifest.json') as f:
+        assert "model" in json.load(f)
+
+    results = _pipeline(tmp_path, lambda ctx: calls.append(1)).run(PipelineContext(None))
+    assert calls == [1] and results["model"] == "缺少必要列或数据量不足"
+
+
+def test_stage_reruns_after_code_change(tmp_path, monkeypatch, capsys):
+    module = tmp_path / 'stage_helpers.py'
+    module.write_text('VERSION = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    input_path = tmp_path / 'raw.csv'
+    input_path.write_text('a,b\n1,2\n')
+    calls = []
+
+    def run():
+        stage = Stage("model", lambda ctx: calls.append(1) or len(calls), code=["stage_helpers"])
+        return Pipeline([stage], str(input_path), str(tmp_path / 'cache')).run(PipelineContext(None))
+
+    assert run()["model"] == 1
+    assert run()["model"] == 1 and calls == [1]
+    # 阶段依赖的模块源码改动后缓存键改变，重新运行
+    module.write_text('VERSION = 2\n')
+    assert run()["model"] == 2
+
+
+def test_report_stage_key_depends_on_profiling(monkeypatch):
+    import profiling
+    from stages import build_pipeline
+
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: False)
+    assert build_pipeline().stages["report"].params["profile"] is False
+    monkeypatch.setattr(profiling, 'is_enabled', lambda: True)
+    assert build_pipeline().stages["report"].params["profile"] is True
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import train_and_evaluate
+from predict import PricePredictor
+from vocabulary import Vocabulary
+
+
+def _frame(rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = rng.choice(['BOSTON', 'BALTIMORE', 'CHICAGO'], rows)
+    types = rng.choice(['Organic', None], rows, p=[0.3, 0.7])
+    dates = pd.Timestamp('2016-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    prices = 100 + 20 * (cities == 'BOSTON') + 30 * pd.notna(types) + 5 * dates.month + rng.normal(0, 5, rows)
+    return pd.DataFrame({'Date': dates, 'City': cities, 'Type': types, 'Avg Price': prices})
+
+
+@pytest.mark.parametrize('engine', ['forest', 'hist'])
+def test_predict_one_matches_predict_batch(tmp_path, engine):
+    vocabularies = {'City': Vocabulary(['BOSTON', 'BALTIMORE']), 'Type': Vocabulary(['Organic'])}
+    train_and_evaluate(_frame(), vocabularies, model_dir=str(tmp_path), engine=engine)
+
+    # 包含训练集外的城市和类型，它们不在预测表中，需要调用模型
+    records = pd.DataFrame({
+        'City': ['BOSTON', 'BALTIMORE', 'CHICAGO', 'DENVER', 'BOSTON', 'CHICAGO'],
+        'Type': ['Organic', None, 'Organic', None, 'Conventional', np.nan],
+        'Date': pd.to_datetime(['2016-01-05', '2016-03-10', '2016-07-01', '2016-10-20', '2016-12-31', '2016-05-15']),
+    })
+    predictor = PricePredictor(str(tmp_path))
+    lazy = PricePredictor(str(tmp_path), precompute=False)
+    batch = predictor.predict_batch(records)
+
+    for row, expected in zip(records.itertuples(index=False), batch):
+        assert predictor.predict_one(row.City, row.Type, date=row.Date) == pytest.approx(expected, rel=1e-12)
+        assert lazy.predict_one(row.City, row.Type, month=row.Date.month) == pytest.approx(expected, rel=1e-12)
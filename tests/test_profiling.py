@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import profiling
+from profiling import step, profiled, performance_section
+from conftest import SCRIPTS_DIR
+
+
+@pytest.fixture
+def profiler():
+    # 每个测试从空记录开始，结束后恢复原来的开关
+    was_enabled = profiling.is_enabled()
+    profiling.reset()
+    yield profiling
+    profiling.reset()
+    if not was_enabled:
+        profiling.disable()
+
+
+@profiled()
+def _double(x):
+    with step("inner", rows_in=x) as record:
+        record["rows_out"] = 2 * x
+    return 2 * x
+
+
+@pytest.mark.parametrize('value,enabled', [('1', True), ('', False), ('0', False), (None, False)])
+def test_environment_variable_enables_profiling(value, enabled):
+    env = {k: v for k, v in os.environ.items() if k not in (profiling.PROFILE_ENV, profiling.PROFILE_DUMP_ENV)}
+    if value is not None:
+        env[profiling.PROFILE_ENV] = value
+    code = ("import json, profiling\n"
+            "from profiling import profiled, step\n"
+            "f = profiled('work')(lambda: 1)\n"
+            "f()\n"
+            "print(json.dumps([profiling.is_enabled(), len(profiling.performance_section()['steps'])]))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [enabled, 1 if enabled else 0]
+
+
+def test_enabled_records_nested_steps(profiler):
+    profiler.enable()
+    assert _double(3) == 6
+    section = performance_section()
+
+    assert [r["step"] for r in section["steps"]] == ["_double", "_double/inner"]
+    inner = section["steps"][1]
+    assert inner["rows_in"] == 3 and inner["rows_out"] == 6
+    for r in section["steps"]:
+        assert r["wall_seconds"] >= 0 and r["cpu_seconds"] >= 0
+        assert r["peak_rss_mb"] > 0 and r["peak_rss_growth_mb"] >= 0
+    # 总耗时只计最外层步骤
+    assert section["total_wall_seconds"] == section["steps"][0]["wall_seconds"]
+    assert section["peak_rss_mb"] == max(r["peak_rss_mb"] for r in section["steps"])
+
+
+def test_disabled_is_pass_through(profiler):
+    profiler.disable()
+    assert _double(3) == 6
+    with step("outer") as record:
+        record["rows_out"] = 1
+    assert performance_section() == {"total_wall_seconds": 0, "peak_rss_mb": None, "steps": []}
+    # 装饰器保留原函数的名称
+    assert _double.__name__ == "_double"
+
+
+def test_performance_section_is_json_serializable(profiler):
+    profiler.enable()
+    with step("outer"):
+        _double(1)
+        # 外层步骤尚未结束时，只包含已完成的步骤
+        section = performance_section()
+    assert [r["step"] for r in section["steps"]] == ["outer/_double", "outer/_double/inner"]
+    assert section["total_wall_seconds"] == section["steps"][0]["wall_seconds"]
+
+    section = json.loads(json.dumps(performance_section()))
+    assert set(section) == {"total_wall_seconds", "peak_rss_mb", "steps"}
+    assert [r["step"] for r in section["steps"]] == ["outer", "outer/_double", "outer/_double/inner"]
+    assert set(section["steps"][0]) == {"step", "rows_in", "rows_out", "wall_seconds", "cpu_seconds",
+                                        "peak_rss_mb", "peak_rss_growth_mb"}
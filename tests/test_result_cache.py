@@ -0,0 +1,77 @@
+import os
+
+from result_cache import ResultCache
+
+
+def _count(calls, value):
+    def compute():
+        calls.append(value)
+        return value
+    return compute
+
+
+def test_hit_and_miss_on_changed_input_params_or_code(tmp_path, monkeypatch):
+    module = tmp_path / 'cached_module.py'
+    module.write_text('VALUE = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    cache = ResultCache(str(tmp_path / 'cache'))
+    calls = []
+
+    def get(value, input_hash='a', params=None):
+        return cache.get_or_compute('statistics', _count(calls, value), input_hash, params or {'n': 1},
+                                    ('cached_module',))
+
+    assert get({'x': 1}) == {'x': 1}
+    assert get({'x': 2}) == {'x': 1} and calls == [{'x': 1}]
+    assert cache.sections['statistics'] == 'hit'
+
+    # 输入哈希、参数或代码指纹改变时重新计算
+    assert get({'x': 3}, input_hash='b') == {'x': 3}
+    assert get({'x': 4}, params={'n': 2}) == {'x': 4}
+    module.write_text('VALUE = 2\n')
+    assert get({'x': 5}) == {'x': 5}
+    assert len(calls) == 4 and (cache.hits, cache.misses) == (1, 4)
+
+    # 索引写在磁盘上，重新打开后仍命中
+    reopened = ResultCache(str(tmp_path / 'cache'))
+    assert reopened.get_or_compute('statistics', _count(calls, None), 'a', {'n': 1}, ('cached_module',)) == {'x': 5}
+
+
+def test_joblib_entry_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    value = {'weights': [1.0, 2.0]}
+    assert cache.get_or_compute('price_model', lambda: value, 'a', kind='joblib') == value
+    assert cache.get_or_compute('price_model', lambda: None, 'a', kind='joblib') == value
+    assert cache.stats()['sections'] == {'price_model': 'hit'}
+
+
+def test_missing_artifact_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    artifact = tmp_path / 'figure.png'
+    artifact.write_bytes(b'png')
+    cache.get_or_compute('machine_learning', lambda: 1, 'a', artifacts=[str(artifact)])
+    os.remove(artifact)
+    assert cache.get_or_compute('machine_learning', lambda: 2, 'a', artifacts=[str(artifact)]) == 2
+
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 6)
+    payload = 'x' * 400
+
+    for section in ('a', 'b'):
+        cache.get_or_compute(section, lambda: payload, 'h')
+    entry_bytes = max(entry['bytes'] for entry in cache.index['entries'].values())
+    cache.max_bytes = 2 * entry_bytes
+
+    # 访问a后写入c，超出上限时淘汰最久未访问的b
+    cache.get_or_compute('a', lambda: None, 'h')
+    cache.get_or_compute('c', lambda: payload, 'h')
+    assert sorted(entry['section'] for entry in cache.index['entries'].values()) == ['a', 'c']
+    assert cache.evictions == 1
+    assert cache.get_or_compute('b', lambda: 'recomputed', 'h') == 'recomputed'
+
+    # 上限调小后重新打开时按新上限淘汰，只留下最近写入的b
+    reopened = ResultCache(str(tmp_path), max_bytes=entry_bytes)
+    assert [entry['section'] for entry in reopened.index['entries'].values()] == ['b']
+
+    assert reopened.invalidate() == 1 and reopened.stats()['entries'] == 0
@@ -0,0 +1,41 @@
+import pytest
+
+from run_benchmarks import compare
+
+
+def _result(seconds, peak_rss_mb, error=None):
+    return {"seconds": seconds, "cpu_seconds": seconds, "peak_rss_mb": peak_rss_mb, "error": error}
+
+
+BASELINES = {"clean@10000": _result(2.0, 100.0), "analysis@10000": _result(1.0, 200.0)}
+
+
+@pytest.mark.parametrize('seconds,peak,expected', [
+    (2.4, 120.0, []),                  # 两项都在25%容差内
+    (2.5, 125.0, []),                  # 恰好等于容差上限
+    (2.6, 100.0, ['耗时']),
+    (1.0, 126.0, ['峰值内存']),
+    (3.0, 200.0, ['耗时', '峰值内存']),
+])
+def test_compare_time_and_memory_tolerances(seconds, peak, expected):
+    regressions = compare({"clean@10000": _result(seconds, peak)}, BASELINES, 0.25, 0.25)
+    assert len(regressions) == len(expected)
+    for line, kind in zip(regressions, expected):
+        assert line.startswith("clean@10000") and kind in line
+
+
+def test_compare_tolerances_are_independent():
+    results = {"clean@10000": _result(2.9, 100.0)}
+    assert compare(results, BASELINES, 0.5, 0.0) == []
+    assert len(compare(results, BASELINES, 0.25, 0.0)) == 1
+    assert len(compare({"clean@10000": _result(2.0, 101.0)}, BASELINES, 0.5, 0.0)) == 1
+
+
+def test_missing_baselines_fail_only_when_required():
+    results = {"clean@10000": _result(2.0, 100.0), "train@10000": _result(5.0, 300.0),
+               "visualize@10000": _result(1.0, 100.0, error="RuntimeError: boom")}
+    assert compare(results, BASELINES, 0.25, 0.25) == []
+    assert compare(results, {}, 0.25, 0.25) == []
+    # 失败的阶段单独报告，不算作缺少基线
+    assert compare(results, BASELINES, 0.25, 0.25, require_baselines=True) == ["train@10000: 没有基线"]
+    assert len(compare(results, {}, 0.25, 0.25, require_baselines=True)) == 2
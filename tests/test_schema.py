@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_store import write_store, store_path_for, load_processed, iter_processed
+from schema import PROCESSED_DTYPES, DATE_COLUMN, apply_schema, read_processed_csv, legacy_frame
+
+
+def _frame(rows=50, seed=0):
+    # 清洗前的列类型：字符串为object，数值为float64/int64，日期为datetime64
+    rng = np.random.default_rng(seed)
+    low = rng.uniform(10, 300, rows).round(2)
+    frame = pd.DataFrame({
+        'Date': pd.Timestamp('2016-09-01') + pd.to_timedelta(rng.integers(0, 300, rows), unit='D'),
+        'City': rng.choice(['BOSTON', 'BALTIMORE', None], rows),
+        'Type': rng.choice(['Organic', None], rows),
+        'Package': rng.choice(['24 inch bins', '1/2 bushel cartons', '50 lb sacks'], rows),
+        'Low Price': low,
+        'High Price': low + 10,
+        'Grade': rng.integers(0, 3, rows),
+        'Variety': rng.integers(0, 5, rows),
+        'Color': rng.integers(0, 4, rows),
+        'Origin': rng.integers(0, 20, rows),
+        'Package_Qty': rng.choice([24.0, 0.5, np.nan], rows),
+        'Package_Unit': rng.choice(['inch bin', 'bushel', 'lb'], rows),
+        'Package_L': rng.choice([1000.0, 17.6, np.nan], rows),
+    })
+    frame['Avg Price'] = (frame['Low Price'] + frame['High Price']) / 2
+    frame['Price_per_L'] = frame['Avg Price'] / frame['Package_L']
+    return frame
+
+
+def _assert_schema(df):
+    for col, dtype in PROCESSED_DTYPES.items():
+        if col in df.columns:
+            assert df[col].dtype == dtype, col
+    if DATE_COLUMN in df.columns:
+        assert df[DATE_COLUMN].dtype == 'datetime64[ns]'
+
+
+def test_apply_schema_sets_compact_dtypes():
+    df = apply_schema(_frame())
+    assert set(PROCESSED_DTYPES) <= set(df.columns)
+    _assert_schema(df)
+    assert df['Low Price'].dtype == np.float32 and df['Variety'].dtype == np.int16
+    assert isinstance(df['City'].dtype, pd.CategoricalDtype)
+    # 已是目标类型时不再复制
+    assert apply_schema(df) is df
+    # legacy_frame还原为旧类型后再次转换，结果相同
+    pd.testing.assert_frame_equal(apply_schema(legacy_frame(df)), df)
+
+
+@pytest.mark.parametrize('dropped', [[], ['Package_Qty', 'Package_Unit', 'Package_L', 'Price_per_L'],
+                                     ['Type', 'Grade', 'Color', 'Origin']])
+def test_processed_round_trip_with_missing_optional_columns(tmp_path, dropped):
+    df = apply_schema(_frame().drop(columns=dropped))
+    csv_path = str(tmp_path / 'processed_data.csv')
+    df.to_csv(csv_path, index=False)
+
+    from_csv = read_processed_csv(csv_path)
+    _assert_schema(from_csv)
+    assert list(from_csv.columns) == list(df.columns)
+    pd.testing.assert_frame_equal(from_csv, df, check_categorical=False)
+
+    # 请求的列中有文件里没有的列时只返回已有的列（按文件中的顺序）
+    requested = ['Date', 'Avg Price', 'Package_L']
+    subset = read_processed_csv(csv_path, requested)
+    assert list(subset.columns) == [col for col in df.columns if col in requested]
+
+    # 列式存储和分块读取返回同样的类型
+    write_store(df, store_path_for(csv_path))
+    from_store = load_processed(csv_path)
+    _assert_schema(from_store)
+    pd.testing.assert_frame_equal(from_store, df, check_categorical=False)
+    chunks = list(iter_processed(csv_path, chunk_rows=20))
+    assert len(chunks) == 3
+    for chunk in chunks:
+        _assert_schema(chunk)
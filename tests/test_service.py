@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import service
+from service import ReportService, REPORT_FILE, MANIFEST_FILE
+
+
+def _service(tmp_path, **kwargs):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir(exist_ok=True)
+    return ReportService(str(raw_dir), str(tmp_path / 'service'), **kwargs)
+
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def _release(svc, name, files=None):
+    # 在版本目录中写入报告，返回publish所需的清单
+    release_dir = os.path.join(svc.releases_dir, name)
+    os.makedirs(release_dir, exist_ok=True)
+    with open(os.path.join(release_dir, REPORT_FILE), 'w') as f:
+        json.dump({"release": name}, f)
+    return {"release": name, "rows": 1, "build_seconds": 0.0, "inputs": [],
+            "files": files or {REPORT_FILE: "ab" * 32}}
+
+
+def test_scan_queues_only_stable_files_and_removals(tmp_path):
+    svc = _service(tmp_path)
+
+    async def scenario():
+        svc.queue = asyncio.Queue()
+        path = tmp_path / 'raw' / 'week1.csv'
+        path.write_text('a\n')
+        previous = await svc.scan_once({})
+        # 第一次扫描时文件可能仍在写入，不排队
+        assert _drain(svc.queue) == []
+
+        path.write_text('a\nb\n')
+        previous = await svc.scan_once(previous)
+        assert _drain(svc.queue) == []
+
+        previous = await svc.scan_once(previous)
+        assert _drain(svc.queue) == [str(path)]
+        # 已处理且未变化的文件不再排队
+        previous = await svc.scan_once(previous)
+        assert _drain(svc.queue) == []
+
+        path.unlink()
+        await svc.scan_once(previous)
+        assert _drain(svc.queue) == [str(path)]
+        assert svc.seen == {}
+
+    asyncio.run(scenario())
+
+
+def test_respond_status_codes_and_etag(tmp_path):
+    svc = _service(tmp_path)
+
+    async def get(target, headers=None, method='GET'):
+        return await svc.respond(method, target, headers or {})
+
+    code, headers, _ = asyncio.run(get('/report'))
+    assert code == 503 and 'Retry-After' in headers
+    assert asyncio.run(get('/status'))[0] == 200
+
+    svc.publish(_release(svc, 'r1'), 0)
+    code, headers, body = asyncio.run(get('/report'))
+    assert code == 200 and json.loads(body) == {"release": "r1"}
+    assert headers['X-Release'] == 'r1'
+
+    etag = headers['ETag']
+    code, _, body = asyncio.run(get('/report', {'if-none-match': f'"other", {etag}'}))
+    assert code == 304 and body == b''
+    assert asyncio.run(get('/report', {'if-none-match': '"other"'}))[0] == 200
+
+    assert asyncio.run(get('/missing'))[0] == 404
+    assert asyncio.run(get('/figures/missing.png'))[0] == 404
+    assert asyncio.run(get('/report', method='POST'))[0] == 405
+
+
+def test_older_build_finishing_last_is_not_published(tmp_path, monkeypatch):
+    # 进程池换成线程池，build_release换成按版本名控制完成顺序的假实现
+    monkeypatch.setattr(service, 'ProcessPoolExecutor',
+                        lambda max_workers, mp_context, initializer: ThreadPoolExecutor(max_workers))
+    first_may_finish = threading.Event()
+    cores = []
+
+    def build_release(input_paths, release_dir, vocab_seed=None, n_jobs=-1):
+        cores.append(n_jobs)
+        if release_dir.endswith('-0000'):
+            first_may_finish.wait(10)
+        manifest = _release(svc, os.path.basename(release_dir))
+        with open(os.path.join(release_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f)
+        return manifest
+
+    monkeypatch.setattr(service, 'build_release', build_release)
+    svc = _service(tmp_path, workers=2)
+    svc.seen = {str(tmp_path / 'raw' / 'week1.csv'): (1, 1)}
+
+    async def scenario():
+        svc.start()
+        try:
+            await svc.slots.acquire()
+            older = asyncio.create_task(svc.rebuild(['week1.csv']))
+            await asyncio.sleep(0)
+            await svc.slots.acquire()
+            newer = await svc.rebuild(['week1.csv'])
+            assert svc.current['release'] == newer['release'] and svc.published_sequence == 1
+            first_may_finish.set()
+            stale = await older
+            return stale, newer
+        finally:
+            svc.close()
+
+    stale, newer = asyncio.run(scenario())
+    assert stale['release'].endswith('-0000')
+    assert svc.published_sequence == 1 and svc.current['release'] == newer['release']
+    with open(svc.current_path) as f:
+        assert json.load(f)['release'] == newer['release']
+    assert svc.builds == 2
+    # 两个工作进程并行时，模型训练只使用单核
+    assert cores == [1, 1]
+
+
+def test_removing_every_input_withdraws_the_release(tmp_path):
+    svc = _service(tmp_path)
+    svc.publish(_release(svc, 'r1'), 0)
+    svc.sequence = 1
+
+    async def scenario():
+        svc.slots = asyncio.Semaphore(1)
+        await svc.slots.acquire()
+        return await svc.rebuild(['week1.csv'])
+
+    assert asyncio.run(scenario()) is None
+    assert svc.current is None and not os.path.exists(svc.current_path)
+    assert svc.published_sequence == 1
+    assert asyncio.run(svc.respond('GET', '/report', {}))[0] == 503
+
+
+def test_prune_keeps_current_release(tmp_path):
+    svc = _service(tmp_path, keep_releases=2)
+    names = ['r1', 'r2', 'r3', 'r4', 'r5']
+    for name in names:
+        _release(svc, name)
+    os.makedirs(os.path.join(svc.releases_dir, 'r6.tmp'))
+    # 当前版本即使是最旧的也不删除；仍在生成的临时目录不删除
+    svc.publish(_release(svc, 'r1'), 0)
+    svc.prune()
+    assert sorted(os.listdir(svc.releases_dir)) == ['r1', 'r4', 'r5', 'r6.tmp']
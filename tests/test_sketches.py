@@ -0,0 +1,39 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from sketches import StatisticsSketch
+
+
+def _chunk(n_cities, rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(10, 200, rows)
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+        'City': [f"CITY {i}" for i in rng.integers(0, n_cities, rows)],
+        'Type': 'Organic',
+        'Variety': rng.integers(0, 5, rows).astype(np.int16),
+        'Low Price': prices - 1,
+        'High Price': prices + 1,
+        'Avg Price': prices,
+    })
+
+
+def test_sketch_keeps_no_category_sets(tmp_path):
+    sketch = StatisticsSketch().update(_chunk(1500))
+    path = str(tmp_path / 'sketch.npz')
+    sketch.save(path)
+    with np.load(path) as data:
+        stats = json.loads(str(data['meta']))["stats"]
+    assert not hasattr(sketch.stats, 'cities')
+    assert 'cities' not in stats and 'types' not in stats
+
+
+def test_unique_counts_come_from_hyperloglog():
+    first, second = _chunk(1500, seed=1), _chunk(1500, seed=2)
+    sketch = StatisticsSketch().update(first).merge(StatisticsSketch().update(second))
+    overview = sketch.report_sections()["overview"]
+    exact = pd.concat([first['City'], second['City']]).nunique()
+    assert overview["unique_cities"] == int(round(sketch.distinct['City'].estimate()))
+    assert abs(overview["unique_cities"] - exact) < exact * 0.05
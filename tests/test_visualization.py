@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import visualization
+from visualization import visualize_data
+
+
+def _frame(rows=400, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = rng.gamma(4, 40, rows)
+    return pd.DataFrame({
+        'Date': pd.Timestamp('2016-07-01') + pd.to_timedelta(rng.integers(0, 300, rows), unit='D'),
+        'City': rng.choice(['BOSTON', 'BALTIMORE', 'CHICAGO'], rows),
+        'Type': rng.choice(['Organic', 'Conventional'], rows),
+        'Low Price': prices - rng.uniform(0, 10, rows),
+        'High Price': prices + rng.uniform(0, 10, rows),
+        'Avg Price': prices,
+    })
+
+
+def _render(monkeypatch, df, figures_dir):
+    # 只记录需要渲染的图，不真正绘图
+    rendered = []
+
+    def render(kind, payload, path):
+        rendered.append(os.path.basename(path))
+        open(path, 'wb').close()
+        return path
+
+    monkeypatch.setattr(visualization, 'render_figure', render)
+    visualize_data(None, str(figures_dir), df=df, only_changed=True)
+    return sorted(rendered)
+
+
+def test_only_changed_skips_unchanged_figures(tmp_path, monkeypatch, capsys):
+    df = _frame()
+    figures = _render(monkeypatch, df, tmp_path)
+    assert figures == sorted(['price_over_time.png', 'city_avg_price.png', 'type_price_distribution.png',
+                              'price_correlation.png', 'price_distribution.png'])
+
+    # 数据未变化时不重新生成任何图
+    assert _render(monkeypatch, df, tmp_path) == []
+
+    # 只改动最低价：只有相关性热力图的绘图数据变化
+    changed = df.copy()
+    changed.loc[0, 'Low Price'] -= 50
+    assert _render(monkeypatch, changed, tmp_path) == ['price_correlation.png']
+
+    # 图片被删除时即使数据未变化也重新生成
+    (tmp_path / 'city_avg_price.png').unlink()
+    assert _render(monkeypatch, changed, tmp_path) == ['city_avg_price.png']
+
+
+def test_binned_payloads_on_empty_frame(tmp_path):
+    df = _frame().iloc[:0]
+    payloads = visualization.binned_payloads(df)
+    assert set(payloads) == {'type_price_distribution.png', 'price_distribution.png'}
+    # 与build_payloads一样，空数据也能渲染
+    visualization.init_render_worker()
+    for name, (kind, payload) in payloads.items():
+        visualization.render_figure(kind, payload, str(tmp_path / name))
+        assert (tmp_path / name).exists()
+    assert set(visualization.build_payloads(df, binned=True)) == set(visualization.build_payloads(df, binned=False))